@@ -7,12 +7,14 @@ import path from 'path';
 import { exec } from 'child_process';
 import { promisify } from 'util';
 import { withHttp } from '../_lib/withHttp.js';
-import { withLogging } from '../_lib/logger.js';
+import { logger, withLogging } from '../_lib/logger.js';
 import { authRequired } from '../_lib/authRequired.js';
 import { badRequest, ok } from '../_lib/response.js';
 import { requireDispenseExceptionPrepAccess } from '../_lib/dispenseExceptionPrepAccess.js';
 
 const MAX_FILE_SIZE_BYTES = 50 * 1024 * 1024;
+// Runs slower than this (from the summary's phase timings) are logged and flagged to the client.
+const SLOW_RUN_SECONDS = Number(process.env.DISPENSE_EXCEPTION_PREP_SLOW_SECONDS) || 120;
 const execAsync = promisify(exec);
 
 async function saveUploadedFile(file, info, dir, timestamp, label) {
@@ -232,6 +234,23 @@ async function handler(req, res) {
             }
         }
 
+        const performance = summary.performance || null;
+        const slowRun = !!performance && performance.total_seconds >= SLOW_RUN_SECONDS;
+        if (slowRun) {
+            logger.warn(
+                {
+                    id: req.id,
+                    sourceFileName: workbookName,
+                    transactionCount: summary.transaction_count,
+                    totalSeconds: performance.total_seconds,
+                    slowestPhase: performance.slowest_phase,
+                    peakRssMb: performance.peak_rss_mb,
+                    phases: performance.phases,
+                },
+                'dispense exception prep slow run'
+            );
+        }
+
         for (const cleanupPath of [
             workbookPath,
             assetLookupPath,
@@ -257,6 +276,8 @@ async function handler(req, res) {
             hasAvrSyncLookup: !!avrSyncLookupPath,
             hasPriorPrepared: !!priorPreparedPath,
             prepExitCode: exitCode,
+            performance,
+            slowRun,
             stdout: stdout.slice(-2000),
         });
     } catch (error) {
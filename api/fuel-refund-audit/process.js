@@ -24,7 +24,8 @@ async function handler(req, res) {
         const inputDir = path.join(rootDir, 'uploads', 'fuel-refund-audit-inputs');
         const outputDir = path.join(rootDir, 'uploads', 'fuel-refund-audit-outputs');
         const auditDir = path.join(rootDir, 'scripts', 'fuel-refund-report-audit');
-        [inputDir, outputDir, auditDir].forEach((dir) => {
+        const indexDir = path.join(rootDir, 'uploads', 'fuel-refund-audit-index');
+        [inputDir, outputDir, auditDir, indexDir].forEach((dir) => {
             if (!fs.existsSync(dir)) fs.mkdirSync(dir, { recursive: true });
         });
 
@@ -41,7 +42,7 @@ async function handler(req, res) {
         let requirePumpReadings = false;
         let requireTankReadings = false;
         let requireConsumptionAssessment = false;
-        let requireRefundRateCheck = false;
+        let requireRefundRateCheck = true;
         let requireOperatorCheck = false;
         let requireLocationCheck = false;
         let fileReceived = false;
@@ -113,8 +114,8 @@ async function handler(req, res) {
                 if (name === 'requireConsumptionAssessment' && (value === 'true' || value === '1')) {
                     requireConsumptionAssessment = true;
                 }
-                if (name === 'requireRefundRateCheck' && (value === 'true' || value === '1')) {
-                    requireRefundRateCheck = true;
+                if (name === 'requireRefundRateCheck' && (value === 'false' || value === '0')) {
+                    requireRefundRateCheck = false;
                 }
                 if (name === 'requireOperatorCheck' && (value === 'true' || value === '1')) {
                     requireOperatorCheck = true;
@@ -153,9 +154,11 @@ async function handler(req, res) {
         if (requirePumpReadings) args.push('--require-pump-readings');
         if (requireTankReadings) args.push('--require-tank-readings');
         if (requireConsumptionAssessment) args.push('--require-consumption-assessment');
-        if (requireRefundRateCheck) args.push('--require-refund-rate-check');
+        if (!requireRefundRateCheck) args.push('--skip-refund-rate-check');
         if (requireOperatorCheck) args.push('--require-operator-check');
         if (requireLocationCheck) args.push('--require-location-check');
+        args.push('--fingerprint-index', path.join(indexDir, 'fingerprints.sqlite'));
+        args.push('--source-name', fileName);
 
         const quoted = args.map((arg) => `"${String(arg).replace(/"/g, '\\"')}"`).join(' ');
         const cmd = `${pythonExec} ${quoted} 2>&1`;
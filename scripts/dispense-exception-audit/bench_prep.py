@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""Benchmark the prep pipeline on a synthetic exception export against a stored baseline.
+
+Times parsing, ``compute_all``, enrichment and the prepared-workbook write on an export from
+``synthetic_workbook`` and reports rows per second and peak RSS for each phase. Results are
+compared with the baseline recorded for the same export size; a phase whose throughput drops,
+or peak RSS rises, by more than ``--tolerance`` is reported as a regression (exit code 1).
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+if str(SCRIPT_DIR) not in sys.path:
+    sys.path.insert(0, str(SCRIPT_DIR))
+
+from enrichment import build_possible_cause_summary, build_summary_per_asset, enrich_transactions, is_mining_eligible
+from exception_rules import compute_all
+from instrumentation import PhaseTimer
+from parse_workbook import load_workbook, parse_asset_lookup, parse_avr_sync_lookup
+from prepare_workbook import write_prepared_workbook
+from synthetic_workbook import generate_synthetic_export
+
+DEFAULT_BASELINE = SCRIPT_DIR / "bench_baseline.json"
+DEFAULT_TOLERANCE = 0.3
+
+
+def size_key(assets: int, dispenses_per_asset: int) -> str:
+    return f"{assets}x{dispenses_per_asset}"
+
+
+def run_benchmark(export: dict[str, Any], output_dir: str | Path) -> dict[str, Any]:
+    """Run every prep phase once on a generated export; phases carry rows per second."""
+    timer = PhaseTimer()
+    with timer.phase("load_workbook") as phase:
+        parsed = load_workbook(export["input"])
+        phase["rows"] = len(parsed["transactions"])
+    with timer.phase("parse_asset_lookup") as phase:
+        asset_lookup = parse_asset_lookup(export["asset_lookup"])
+        phase["rows"] = len(asset_lookup)
+    with timer.phase("parse_avr_sync_lookup") as phase:
+        avr_rows = parse_avr_sync_lookup(export["avr_sync_lookup"])
+        phase["rows"] = len(avr_rows)
+
+    mining = [row for row in parsed["transactions"] if is_mining_eligible(row)]
+    with timer.phase("compute_all", rows=len(mining)):
+        compute_all(mining)
+    with timer.phase("enrich_transactions", rows=len(parsed["transactions"])):
+        enriched = enrich_transactions(parsed["transactions"], asset_lookup, avr_rows)
+    review_queue = enriched["review_queue"]
+    with timer.phase("review_summaries", rows=len(review_queue)):
+        possible_causes = build_possible_cause_summary(review_queue)
+        summary_per_asset = build_summary_per_asset(review_queue)
+    transactions = enriched["transactions"]
+    with timer.phase("write_prepared_workbook", rows=len(transactions) + len(review_queue)):
+        write_prepared_workbook(
+            input_path=export["input"],
+            output_path=str(Path(output_dir) / "prepared.xlsx"),
+            transactions=transactions,
+            review_queue=review_queue,
+            possible_causes=possible_causes,
+            summary_per_asset=summary_per_asset,
+            excluded_non_mining_rows=enriched["excluded_non_mining_rows"],
+            asset_lookup_path=export["asset_lookup"],
+            avr_sync_path=export["avr_sync_lookup"],
+            site_name="Synthetic",
+        )
+
+    report = timer.report()
+    for phase in report["phases"]:
+        seconds, rows = phase["seconds"], phase["rows"]
+        phase["rows_per_second"] = round(rows / seconds) if rows and seconds else None
+    return {
+        "transactions": len(parsed["transactions"]),
+        "review_queue_count": len(review_queue),
+        "avr_sync_count": enriched["avr_sync_count"],
+        **report,
+    }
+
+
+def compare_to_baseline(
+    result: dict[str, Any],
+    baseline: dict[str, Any] | None,
+    tolerance: float = DEFAULT_TOLERANCE,
+) -> list[str]:
+    """Phases slower, or with higher peak RSS, than the baseline by more than ``tolerance``."""
+    if not baseline:
+        return []
+    regressions: list[str] = []
+    previous = {p["phase"]: p for p in baseline.get("phases") or []}
+    for phase in result["phases"]:
+        before = previous.get(phase["phase"]) or {}
+        rate, base_rate = phase.get("rows_per_second"), before.get("rows_per_second")
+        if rate and base_rate and rate < base_rate * (1 - tolerance):
+            regressions.append(f"{phase['phase']}: {rate} rows/s, baseline {base_rate} rows/s")
+        rss, base_rss = phase.get("peak_rss_mb"), before.get("peak_rss_mb")
+        if rss and base_rss and rss > base_rss * (1 + tolerance):
+            regressions.append(f"{phase['phase']}: peak RSS {rss} MB, baseline {base_rss} MB")
+    return regressions
+
+
+def load_baselines(path: str | Path) -> dict[str, Any]:
+    path = Path(path)
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark dispense exception prep on a synthetic export")
+    parser.add_argument("--assets", type=int, default=200, help="Assets in the export (default 200)")
+    parser.add_argument("--dispenses-per-asset", type=int, default=50, help="Dispenses per asset (default 50)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--workdir", help="Keep the export and prepared workbook here (default: temp folder)")
+    parser.add_argument(
+        "--baseline",
+        default=str(DEFAULT_BASELINE),
+        help="Baseline JSON keyed by export size (default: bench_baseline.json)",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=DEFAULT_TOLERANCE,
+        help=f"Allowed throughput drop / RSS rise as a fraction (default {DEFAULT_TOLERANCE})",
+    )
+    parser.add_argument("--update-baseline", action="store_true", help="Store this run as the size's baseline")
+    parser.add_argument("--json", "-j", help="Also write the result to this path")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(args.workdir or tmp)
+        export = generate_synthetic_export(
+            workdir, assets=args.assets, dispenses_per_asset=args.dispenses_per_asset, seed=args.seed
+        )
+        result = run_benchmark(export, workdir)
+
+    key = size_key(args.assets, args.dispenses_per_asset)
+    baselines = load_baselines(args.baseline)
+    result["size"] = key
+    result["regressions"] = compare_to_baseline(result, baselines.get(key), args.tolerance)
+    if args.update_baseline:
+        baselines[key] = {
+            "transactions": result["transactions"],
+            "phases": [
+                {key: p[key] for key in ("phase", "rows_per_second", "peak_rss_mb")} for p in result["phases"]
+            ],
+        }
+        Path(args.baseline).write_text(json.dumps(baselines, indent=2) + "\n", encoding="utf-8")
+    if args.json:
+        Path(args.json).write_text(json.dumps(result, indent=2), encoding="utf-8")
+
+    print(json.dumps(result, indent=2))
+    for line in result["regressions"]:
+        print(f"REGRESSION {line}", file=sys.stderr)
+    return 1 if result["regressions"] and not args.update_baseline else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""Benchmark the exception rule engine (split-fill chains) or enrichment (exception export)."""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+if str(SCRIPT_DIR) not in sys.path:
+    sys.path.insert(0, str(SCRIPT_DIR))
+
+from enrichment import build_possible_cause_summary, enrich_transactions
+from exception_rules import compute_all
+from synthetic_workbook import build_chain_transactions, build_exception_export
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--assets", type=int, default=20, help="Number of assets (default 20)")
+    parser.add_argument("--chain-length", type=int, default=500, help="Dispenses per chain (default 500)")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs; best is reported")
+    parser.add_argument(
+        "--stage",
+        choices=("rules", "enrich"),
+        default="rules",
+        help="rules: compute_all on chains; enrich: enrichment + possible causes on an exception export",
+    )
+    parser.add_argument("--rows", type=int, default=100_000, help="Exception export rows for --stage enrich")
+    parser.add_argument(
+        "--workers", type=int, default=None, help="Enrichment worker processes for --stage enrich"
+    )
+    args = parser.parse_args(argv)
+
+    if args.stage == "enrich":
+        return _bench_enrich(args.rows, args.repeat, args.workers)
+
+    rows = build_chain_transactions(args.assets, args.chain_length)
+    timings: list[float] = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        computed = compute_all(rows)
+        timings.append(time.perf_counter() - started)
+
+    over_tank = sum(1 for c in computed.values() if c.flags.over_tank_cumulative)
+    print(
+        json.dumps(
+            {
+                "assets": args.assets,
+                "chain_length": args.chain_length,
+                "transactions": len(rows),
+                "best_seconds": round(min(timings), 4),
+                "over_tank_flagged": over_tank,
+            },
+            indent=2,
+        )
+    )
+    return 0
+
+
+def _bench_enrich(row_count: int, repeat: int, workers: int | None = None) -> int:
+    timings: list[float] = []
+    for _ in range(repeat):
+        rows = build_exception_export(row_count)
+        started = time.perf_counter()
+        enriched = enrich_transactions(rows, {}, [], workers=workers)
+        causes = build_possible_cause_summary(enriched["review_queue"])
+        timings.append(time.perf_counter() - started)
+    print(
+        json.dumps(
+            {
+                "transactions": row_count,
+                "workers": workers or 1,
+                "best_seconds": round(min(timings), 4),
+                "review_queue_count": len(enriched["review_queue"]),
+                "possible_cause_groups": len(causes),
+            },
+            indent=2,
+        )
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,154 @@
+"""Economy stage: economy, 180-day average economy and % variance for every row at once.
+
+The per-row helpers keep the single-row rules; ``apply_economy_stage`` evaluates the same
+rules column-wise. Rows whose average economy is not in the workbook or Asset Info Lookup
+can take a per-asset baseline derived from earlier runs (see ``ReviewHistory``).
+"""
+from __future__ import annotations
+
+from typing import Any
+
+import numpy as np
+
+ECONOMY_BASELINE_DAYS = 180
+# Fewer dispenses than this in the window gives no history baseline for the asset.
+MIN_BASELINE_DISPENSES = 5
+
+
+def _economy_type(meter_type: str | None) -> str | None:
+    if not meter_type:
+        return None
+    text = str(meter_type).lower()
+    if "hr" in text:
+        return "L/hr"
+    if "km" in text:
+        return "L/km"
+    return str(meter_type)
+
+
+def is_km_meter(meter_type: Any) -> bool:
+    return "km" in str(meter_type or "").lower()
+
+
+def _compute_economy(row: dict[str, Any]) -> float | None:
+    litres = row.get("litres")
+    usage = row.get("total_usage_num")
+    if litres is None or usage is None or usage <= 0:
+        return None
+    if is_km_meter(row.get("meter_type")):
+        return usage / litres if litres else None
+    return litres / usage
+
+
+def _parse_avg_economy(value: Any) -> float | None:
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value).strip().replace(",", "")
+    for token in text.split():
+        try:
+            return float(token)
+        except ValueError:
+            continue
+    return None
+
+
+def _pct_variance(economy: float | None, avg: float | None) -> float | None:
+    if economy is None or avg is None or avg == 0:
+        return None
+    return (economy - avg) / avg
+
+
+def _present(value: Any) -> bool:
+    return value is not None and value != ""
+
+
+def apply_economy_fields(row: dict[str, Any]) -> None:
+    row["economy_type"] = _economy_type(row.get("meter_type"))
+
+    has_source_economy = _present(row.get("economy"))
+    has_source_variance = _present(row.get("pct_variance"))
+
+    if not has_source_economy:
+        row["economy"] = _compute_economy(row)
+
+    avg = _parse_avg_economy(row.get("avg_economy_180d"))
+    if avg is not None:
+        row["avg_economy_180d"] = avg
+
+    if not has_source_variance:
+        row["pct_variance"] = _pct_variance(row.get("economy"), avg)
+
+
+def baseline_economy(litres: float, usage: float, km: bool) -> float | None:
+    """Average economy over a window from summed litres and usage (km/L or L/hr)."""
+    if km:
+        return usage / litres if litres else None
+    return litres / usage if usage else None
+
+
+def _float_column(values: Any) -> np.ndarray:
+    return np.array([np.nan if v is None else v for v in values], dtype=float)
+
+
+def apply_economy_stage(
+    rows: list[dict[str, Any]],
+    baselines: dict[tuple[str, bool], float] | None = None,
+) -> dict[str, int]:
+    """``apply_economy_fields`` for every row, with economy and variance computed as arrays.
+
+    ``baselines`` maps (asset number, km meter) to a history average used where the row has
+    no average economy of its own. Source economy / variance values are kept as-is. Returns
+    how many rows, and distinct assets among them, took a history baseline.
+    """
+    n = len(rows)
+    stats = {"history_baseline_rows": 0, "history_baseline_assets": 0}
+    if not n:
+        return stats
+
+    meters = [row.get("meter_type") for row in rows]
+    economy_types = {meter: _economy_type(meter) for meter in set(meters)}
+    km_meters = {meter: is_km_meter(meter) for meter in economy_types}
+    km = np.array([km_meters[meter] for meter in meters], dtype=bool)
+    litres = _float_column(row.get("litres") for row in rows)
+    usage = _float_column(row.get("total_usage_num") for row in rows)
+
+    raw_avgs = [row.get("avg_economy_180d") for row in rows]
+    parsed_avgs = {value: _parse_avg_economy(value) for value in set(raw_avgs)}
+    avgs = [parsed_avgs[value] for value in raw_avgs]
+    if baselines:
+        baseline_assets: set[str] = set()
+        for i, row in enumerate(rows):
+            if avgs[i] is None:
+                asset = str(row.get("asset_number") or "UNKNOWN")
+                avgs[i] = baselines.get((asset, bool(km[i])))
+                if avgs[i] is not None:
+                    stats["history_baseline_rows"] += 1
+                    baseline_assets.add(asset)
+        stats["history_baseline_assets"] = len(baseline_assets)
+    avg = _float_column(avgs)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        valid = ~np.isnan(litres) & ~np.isnan(usage) & (usage > 0)
+        valid &= ~km | (litres != 0)
+        economy = np.where(km, usage / litres, litres / usage)
+        variance = (economy - avg) / avg
+    has_variance = valid & ~np.isnan(avg) & (avg != 0)
+
+    for row, meter, row_avg, row_economy, ok, row_variance, ok_variance in zip(
+        rows, meters, avgs, economy.tolist(), valid.tolist(), variance.tolist(), has_variance.tolist()
+    ):
+        row["economy_type"] = economy_types[meter]
+        if row_avg is not None:
+            row["avg_economy_180d"] = row_avg
+        if _present(row.get("pct_variance")):
+            if not _present(row.get("economy")):
+                row["economy"] = row_economy if ok else None
+            continue
+        if _present(row.get("economy")):
+            row["pct_variance"] = _pct_variance(row["economy"], row_avg)
+            continue
+        row["economy"] = row_economy if ok else None
+        row["pct_variance"] = row_variance if ok_variance else None
+    return stats
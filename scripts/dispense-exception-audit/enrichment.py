@@ -1,17 +1,60 @@
 """Enrich dispense exception transactions with lookups, economy, and review flags."""
 from __future__ import annotations
 
+import os
 import re
+from array import array
+from collections.abc import Iterable, Iterator, Sequence
+from dataclasses import dataclass, fields
 from datetime import datetime
+from functools import lru_cache
 from typing import Any
 
-from exception_rules import ComputedTransaction, compute_all
+from economy import apply_economy_stage
+from exception_rules import ComputedTransaction, RuleFlags
 from site_rules import SiteRuleProfile, get_site_profile
+from vectorized_rules import compute_with_engine
+from worker_pool import shared_state_pool, worker_state
 
 DEFAULT_ECONOMY_VARIANCE_THRESHOLD = 0.6
 MINING_NON_ELIGIBLE_MARKERS = ("non mining", "non-eligible")
 
 
+class RowView(Sequence):
+    """Read-only view of ``rows`` at ``indices``; shares the row dicts instead of copying them."""
+
+    __slots__ = ("rows", "indices")
+
+    def __init__(self, rows: Sequence[dict[str, Any]], indices: Iterable[int] = ()) -> None:
+        self.rows = rows
+        self.indices = indices if isinstance(indices, array) else array("I", indices)
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    def __getitem__(self, key: int | slice) -> Any:
+        if isinstance(key, slice):
+            return RowView(self.rows, self.indices[key])
+        return self.rows[self.indices[key]]
+
+    def __iter__(self) -> Iterator[dict[str, Any]]:
+        rows = self.rows
+        for idx in self.indices:
+            yield rows[idx]
+
+
+def asset_groups(rows: Sequence[dict[str, Any]]) -> dict[str, RowView]:
+    """Rows per asset number (first-appearance order), as index views over ``rows``."""
+    groups: dict[str, array] = {}
+    for idx, row in enumerate(rows):
+        asset = str(row.get("asset_number") or "UNKNOWN")
+        group = groups.get(asset)
+        if group is None:
+            group = groups[asset] = array("I")
+        group.append(idx)
+    return {asset: RowView(rows, indices) for asset, indices in groups.items()}
+
+
 def is_mining_eligible(row: dict[str, Any]) -> bool:
     group = str(row.get("asset_group") or "").lower()
     eligibility = str(row.get("refund_eligibility") or "").strip()
@@ -22,48 +65,6 @@ def is_mining_eligible(row: dict[str, Any]) -> bool:
     return True
 
 
-def _economy_type(meter_type: str | None) -> str | None:
-    if not meter_type:
-        return None
-    text = str(meter_type).lower()
-    if "hr" in text:
-        return "L/hr"
-    if "km" in text:
-        return "L/km"
-    return str(meter_type)
-
-
-def _compute_economy(row: dict[str, Any]) -> float | None:
-    litres = row.get("litres")
-    usage = row.get("total_usage_num")
-    if litres is None or usage is None or usage <= 0:
-        return None
-    meter = str(row.get("meter_type") or "").lower()
-    if "km" in meter:
-        return usage / litres if litres else None
-    return litres / usage
-
-
-def _parse_avg_economy(value: Any) -> float | None:
-    if value is None or value == "":
-        return None
-    if isinstance(value, (int, float)):
-        return float(value)
-    text = str(value).strip().replace(",", "")
-    for token in text.split():
-        try:
-            return float(token)
-        except ValueError:
-            continue
-    return None
-
-
-def _pct_variance(economy: float | None, avg: float | None) -> float | None:
-    if economy is None or avg is None or avg == 0:
-        return None
-    return (economy - avg) / avg
-
-
 def apply_asset_lookup(
     row: dict[str, Any], lookup: dict[str, dict[str, Any]]
 ) -> None:
@@ -93,45 +94,50 @@ def _tag_digits(tag: Any) -> str | None:
     return digits or None
 
 
-def build_avr_match_index(avr_rows: list[dict[str, Any]]) -> dict[str, set[str]]:
-    """Map transaction id suffix / PAN digits / asset+date keys to AVR sync hits."""
-    by_suffix: dict[str, set[str]] = {}
+def _avr_date_key(asset: Any, when: Any) -> tuple[str, str] | None:
+    asset = str(asset or "").strip()
+    if not asset or not isinstance(when, datetime):
+        return None
+    return (asset, when.date().isoformat())
+
+
+def build_avr_match_index(avr_rows: list[dict[str, Any]]) -> dict[Any, set[str]]:
+    """Map transaction id suffix / PAN digits / (asset code, date) keys to AVR sync hits."""
+    by_key: dict[Any, set[str]] = {}
     for avr in avr_rows:
         avr_id = avr.get("avr_id")
         if avr_id:
-            by_suffix.setdefault(avr_id, set()).add(avr_id)
+            by_key.setdefault(avr_id, set()).add(avr_id)
         trans_num = avr.get("trans_num")
         if trans_num:
-            by_suffix.setdefault(trans_num, set()).add(avr_id or trans_num)
+            by_key.setdefault(trans_num, set()).add(avr_id or trans_num)
         pan_digits = _tag_digits(avr.get("pan"))
         if pan_digits:
-            by_suffix.setdefault(pan_digits, set()).add(avr_id or pan_digits)
-    return by_suffix
+            by_key.setdefault(pan_digits, set()).add(avr_id or pan_digits)
+        asset_date = _avr_date_key(avr.get("asset_code"), avr.get("date"))
+        if asset_date:
+            by_key.setdefault(asset_date, set()).add(avr_id or trans_num or asset_date[0])
+    return by_key
 
 
-def match_avr_sync(
-    row: dict[str, Any], avr_index: dict[str, set[str]], avr_rows: list[dict[str, Any]]
-) -> bool:
+def avr_match_key(row: dict[str, Any], avr_index: dict[Any, set[str]]) -> str | None:
+    """Which index key matched the row to AVR sync, e.g. ``transaction_id:12345``."""
     txn_id = str(row.get("transaction_id") or "")
     if not txn_id:
-        return False
+        return None
 
     for part in txn_id.replace("-CONSEC", "").split("-"):
         if part.isdigit() and part in avr_index:
-            return True
+            return f"transaction_id:{part}"
 
     tag_digits = _tag_digits(row.get("asset_tag"))
     if tag_digits and tag_digits in avr_index:
-        return True
+        return f"asset_tag:{tag_digits}"
 
-    asset = str(row.get("asset_number") or "").strip()
-    dt = row.get("date_time")
-    if asset and dt:
-        for avr in avr_rows:
-            if avr.get("asset_code") == asset and avr.get("date"):
-                if avr["date"].date() == dt.date():
-                    return True
-    return False
+    asset_date = _avr_date_key(row.get("asset_number"), row.get("date_time"))
+    if asset_date and asset_date in avr_index:
+        return f"asset_date:{asset_date[0]}@{asset_date[1]}"
+    return None
 
 
 def apply_exception_split(
@@ -157,66 +163,64 @@ def _normalize_exception_text(text: str | None) -> str:
     return normalized.replace("fill outside of 1 hour", "fill outside of one hour")
 
 
-def _exception_60_parts(text: str | None) -> set[str]:
-    normalized = _normalize_exception_text(text)
-    if not normalized:
-        return set()
-    return {part.strip() for part in normalized.split(",") if part.strip()}
-
-
-def _is_exact_odo_le_zero(parts: set[str]) -> bool:
-    return parts == {"odo difference <= 0"}
-
+# Exception-reason categories read by escalation, review reasons and possible causes.
+EXC_FILL_OUTSIDE = 1 << 0
+EXC_ODO_GT_50 = 1 << 1
+EXC_ODO_LE_ZERO = 1 << 2
+EXC_ODO_LE_ZERO_ONLY = 1 << 3
+EXC_CONSEC_60 = 1 << 4
+EXC_ROUTINE_SPLIT = 1 << 5
+EXC_CHAIN_ACTIVE = EXC_ODO_LE_ZERO_ONLY | EXC_ROUTINE_SPLIT
 
-def _has_odo_gt_50(parts: set[str]) -> bool:
-    return any("odo difference > 50" in part for part in parts)
 
+@dataclass(frozen=True)
+class ExceptionDescriptor:
+    """Normalized comma-separated exception parts plus a bitmask of their categories."""
 
-def _has_fill_outside(parts: set[str]) -> bool:
-    return any("fill outside" in part for part in parts)
+    parts: frozenset[str]
+    mask: int
 
+    def __bool__(self) -> bool:
+        return bool(self.parts)
 
-def _is_routine_split_exception(parts: set[str]) -> bool:
-    return (
-        "odo difference <= 0" in parts
-        and any("consecutive dispenses within 60" in part for part in parts)
-        and not _has_fill_outside(parts)
-    )
 
-
-def _review_chain_stays_active(parts: set[str]) -> bool:
-    return (
-        _is_exact_odo_le_zero(parts)
-        or _is_routine_split_exception(parts)
-    )
+NO_EXCEPTION = ExceptionDescriptor(frozenset(), 0)
 
 
-def _effective_exception_60_parts(
+@lru_cache(maxsize=8192)
+def exception_descriptor(text: str | None) -> ExceptionDescriptor:
+    """Parse an exception reason once; exports repeat a handful of reason strings."""
+    normalized = _normalize_exception_text(text)
+    if not normalized:
+        return NO_EXCEPTION
+    parts = frozenset(part.strip() for part in normalized.split(",") if part.strip())
+    if not parts:
+        return NO_EXCEPTION
+    mask = 0
+    for part in parts:
+        if "fill outside" in part:
+            mask |= EXC_FILL_OUTSIDE
+        if "odo difference > 50" in part:
+            mask |= EXC_ODO_GT_50
+        if "consecutive dispenses within 60" in part:
+            mask |= EXC_CONSEC_60
+    if "odo difference <= 0" in parts:
+        mask |= EXC_ODO_LE_ZERO
+        if len(parts) == 1:
+            mask |= EXC_ODO_LE_ZERO_ONLY
+        if mask & EXC_CONSEC_60 and not mask & EXC_FILL_OUTSIDE:
+            mask |= EXC_ROUTINE_SPLIT
+    return ExceptionDescriptor(parts, mask)
+
+
+def effective_exception_descriptor(
     row: dict[str, Any], comp: ComputedTransaction | None
-) -> set[str]:
-    parts = _exception_60_parts(row.get("exception_60"))
-    if parts:
-        return parts
-    if comp:
-        return _exception_60_parts(comp.flags.reason_60())
-    return set()
-
-
-def apply_economy_fields(row: dict[str, Any]) -> None:
-    row["economy_type"] = _economy_type(row.get("meter_type"))
-
-    has_source_economy = row.get("economy") is not None and row.get("economy") != ""
-    has_source_variance = row.get("pct_variance") is not None and row.get("pct_variance") != ""
-
-    if not has_source_economy:
-        row["economy"] = _compute_economy(row)
-
-    avg = _parse_avg_economy(row.get("avg_economy_180d"))
-    if avg is not None:
-        row["avg_economy_180d"] = avg
-
-    if not has_source_variance:
-        row["pct_variance"] = _pct_variance(row.get("economy"), avg)
+) -> ExceptionDescriptor:
+    """Descriptor of the row's Exception 60 text, falling back to the computed reason."""
+    exc = exception_descriptor(row.get("exception_60"))
+    if exc or not comp:
+        return exc
+    return exception_descriptor(comp.flags.reason_60())
 
 
 def review_reason(
@@ -228,20 +232,19 @@ def review_reason(
 ) -> str | None:
     if row.get("_avr_sync"):
         return "AVR sync match"
-    parts = _effective_exception_60_parts(row, comp)
-    if not parts:
+    exc = effective_exception_descriptor(row, comp)
+    if not exc:
         return None
-    if _has_fill_outside(parts):
+    mask = exc.mask
+    if mask & EXC_FILL_OUTSIDE:
         return "Fill outside one hour"
-    if _is_exact_odo_le_zero(parts):
+    if mask & EXC_ODO_LE_ZERO_ONLY:
         return "Odo difference <= 0"
-    if _has_odo_gt_50(parts):
+    if mask & EXC_ODO_GT_50:
         return "Odo difference > 50 hrs"
-    if _is_routine_split_exception(parts):
-        prev_parts = _exception_60_parts(
-            prev_row.get("exception_60") if prev_row else None
-        )
-        if _is_exact_odo_le_zero(prev_parts):
+    if mask & EXC_ROUTINE_SPLIT:
+        prev = exception_descriptor(prev_row.get("exception_60") if prev_row else None)
+        if prev.mask & EXC_ODO_LE_ZERO_ONLY:
             return "Split fill after odo <= 0"
         if review_chain_active:
             return "Split fill chain"
@@ -255,27 +258,26 @@ def suggested_abco_comment(row: dict[str, Any], comp: ComputedTransaction | None
         return "AVR Sync"
     if comp and comp.flags.initial_dispense:
         return "Initial Dispense"
-    parts = _effective_exception_60_parts(row, comp)
-    if _has_fill_outside(parts):
+    mask = effective_exception_descriptor(row, comp).mask
+    if mask & EXC_FILL_OUTSIDE:
         return "Check 120 min"
-    if _has_odo_gt_50(parts):
+    if mask & EXC_ODO_GT_50:
         variance = row.get("pct_variance")
         if variance is not None and float(variance) < -0.6:
             return "Economy too low"
     return None
 
 
-def should_escalate(
+def _escalates(
     row: dict[str, Any],
-    comp: ComputedTransaction | None,
+    exc: ExceptionDescriptor,
+    prev_exc: ExceptionDescriptor,
     *,
-    prev_row: dict[str, Any] | None = None,
-    review_chain_active: bool = False,
-    economy_threshold: float = DEFAULT_ECONOMY_VARIANCE_THRESHOLD,
-    profile: SiteRuleProfile | None = None,
+    review_chain_active: bool,
+    economy_threshold: float,
+    rules: SiteRuleProfile,
 ) -> bool:
-    rules = profile or get_site_profile()
-
+    """``should_escalate`` on precomputed effective / previous-row exception descriptors."""
     if rules.escalate_avr_sync and row.get("_avr_sync"):
         return True
 
@@ -284,8 +286,7 @@ def should_escalate(
         if comment in {"just ok", "ok"}:
             return False
 
-    parts = _effective_exception_60_parts(row, comp)
-    if not parts:
+    if not exc:
         if rules.economy_escalation:
             variance = row.get("pct_variance")
             usage = row.get("total_usage_num")
@@ -300,65 +301,185 @@ def should_escalate(
                 return True
         return False
 
-    if rules.escalate_fill_outside and _has_fill_outside(parts):
+    mask = exc.mask
+    if rules.escalate_fill_outside and mask & EXC_FILL_OUTSIDE:
         return True
-    if rules.escalate_odo_le_zero and _is_exact_odo_le_zero(parts):
+    if rules.escalate_odo_le_zero and mask & EXC_ODO_LE_ZERO_ONLY:
         return True
-    if rules.escalate_odo_gt_50 and _has_odo_gt_50(parts):
+    if rules.escalate_odo_gt_50 and mask & EXC_ODO_GT_50:
         return True
-    if rules.escalate_split_fill_chain and _is_routine_split_exception(parts):
-        prev_parts = _exception_60_parts(
-            prev_row.get("exception_60") if prev_row else None
-        )
-        if _is_exact_odo_le_zero(prev_parts):
+    if rules.escalate_split_fill_chain and mask & EXC_ROUTINE_SPLIT:
+        if prev_exc.mask & EXC_ODO_LE_ZERO_ONLY:
             return True
         if review_chain_active:
             return True
     return False
 
 
+def should_escalate(
+    row: dict[str, Any],
+    comp: ComputedTransaction | None,
+    *,
+    prev_row: dict[str, Any] | None = None,
+    review_chain_active: bool = False,
+    economy_threshold: float = DEFAULT_ECONOMY_VARIANCE_THRESHOLD,
+    profile: SiteRuleProfile | None = None,
+) -> bool:
+    return _escalates(
+        row,
+        effective_exception_descriptor(row, comp),
+        exception_descriptor(prev_row.get("exception_60") if prev_row else None),
+        review_chain_active=review_chain_active,
+        economy_threshold=economy_threshold,
+        rules=profile or get_site_profile(),
+    )
+
+
+EscalationStep = tuple[int, dict[str, Any], ExceptionDescriptor, ExceptionDescriptor]
+
+
+def _escalation_sequences(mining_rows: list[dict[str, Any]]) -> list[list[EscalationStep]]:
+    """Per-asset (index, row, effective, raw exception descriptor) in date order."""
+    sequences = []
+    for group in asset_groups(mining_rows).values():
+        order = sorted(group.indices, key=lambda i: mining_rows[i].get("date_time") or datetime.min)
+        sequences.append(
+            [
+                (
+                    idx,
+                    row,
+                    effective_exception_descriptor(row, row.get("_computed")),
+                    exception_descriptor(row.get("exception_60")),
+                )
+                for idx, row in ((i, mining_rows[i]) for i in order)
+            ]
+        )
+    return sequences
+
+
+# (row index, previous row index in the asset's chain or None, review_chain_active)
+Escalation = tuple[int, int | None, bool]
+
+
+def _escalation_pass(
+    sequences: list[list[EscalationStep]],
+    rules: SiteRuleProfile,
+    economy_threshold: float,
+) -> list[Escalation]:
+    """Indices escalated under ``rules`` with the previous row and chain state they were seen with."""
+    escalated = []
+    for sequence in sequences:
+        review_chain_active = False
+        prev_idx: int | None = None
+        prev_exc = NO_EXCEPTION
+        for idx, row, exc, raw_exc in sequence:
+            if _escalates(
+                row,
+                exc,
+                prev_exc,
+                review_chain_active=review_chain_active,
+                economy_threshold=economy_threshold,
+                rules=rules,
+            ):
+                escalated.append((idx, prev_idx, review_chain_active))
+                review_chain_active = bool(exc.mask & EXC_CHAIN_ACTIVE)
+            else:
+                review_chain_active = False
+            prev_idx, prev_exc = idx, raw_exc
+    return escalated
+
+
+def _what_if_summary(
+    rules: SiteRuleProfile,
+    mining_rows: list[dict[str, Any]],
+    escalated: list[Escalation],
+    selected: set[int],
+) -> dict[str, Any]:
+    """Review-queue size, litres and reasons for a profile, diffed against the selected one."""
+    picked = {idx for idx, _, _ in escalated}
+    reasons: dict[str, int] = {}
+    for idx, prev_idx, chain_active in escalated:
+        row = mining_rows[idx]
+        reason = review_reason(
+            row,
+            row.get("_computed"),
+            prev_row=mining_rows[prev_idx] if prev_idx is not None else None,
+            review_chain_active=chain_active,
+        ) or "Review"
+        reasons[reason] = reasons.get(reason, 0) + 1
+    added = RowView(mining_rows, sorted(picked - selected))
+    removed = RowView(mining_rows, sorted(selected - picked))
+
+    def litres(group: Any) -> float:
+        return round(sum(float(row.get("litres") or 0) for row in group), 2)
+
+    def ids(group: Iterable[dict[str, Any]]) -> list[str]:
+        return sorted(str(row.get("transaction_id") or "") for row in group)[:25]
+
+    return {
+        "rule_profile": rules.key,
+        "rule_profile_label": rules.label,
+        "review_queue_count": len(picked),
+        "review_queue_litres": litres(RowView(mining_rows, (idx for idx, _, _ in escalated))),
+        "review_reasons": reasons,
+        "added_vs_selected_count": len(added),
+        "added_vs_selected_litres": litres(added),
+        "added_vs_selected_ids": ids(added),
+        "removed_vs_selected_count": len(removed),
+        "removed_vs_selected_litres": litres(removed),
+        "removed_vs_selected_ids": ids(removed),
+    }
+
+
 def suggested_possible_cause(row: dict[str, Any], comp: ComputedTransaction | None) -> str | None:
     if row.get("_avr_sync") or (row.get("abco_comment") or "").lower() == "avr sync":
         return "AVR"
-    parts = _effective_exception_60_parts(row, comp)
-    if _has_fill_outside(parts):
+    exc = effective_exception_descriptor(row, comp)
+    if exc.mask & EXC_FILL_OUTSIDE:
         return "Dispensing Point Error?"
-    if parts and (
-        _is_exact_odo_le_zero(parts)
-        or _is_routine_split_exception(parts)
-        or _has_odo_gt_50(parts)
-        or any("consecutive dispenses within 60" in part for part in parts)
+    if exc and (
+        exc.mask & (EXC_ODO_LE_ZERO_ONLY | EXC_ROUTINE_SPLIT | EXC_ODO_GT_50 | EXC_CONSEC_60)
         or (comp and (comp.flags.odo_non_positive or comp.flags.consec_60))
     ):
         return "AVR?"
     return None
 
 
-def enrich_transactions(
-    transactions: list[dict[str, Any]],
+def _enrich_mining_rows(
+    mining_rows: list[dict[str, Any]],
     asset_lookup: dict[str, dict[str, Any]],
-    avr_rows: list[dict[str, Any]],
-    economy_threshold: float = DEFAULT_ECONOMY_VARIANCE_THRESHOLD,
-    profile: SiteRuleProfile | None = None,
+    avr_index: dict[Any, set[str]],
+    *,
+    rules: SiteRuleProfile,
+    economy_threshold: float,
+    rule_engine: str,
+    what_if_profiles: list[SiteRuleProfile] | None,
+    economy_baselines: dict[tuple[str, bool], float] | None,
 ) -> dict[str, Any]:
-    rules = profile or get_site_profile()
-    mining_rows = [t for t in transactions if is_mining_eligible(t)]
-    excluded_non_mining = [t for t in transactions if not is_mining_eligible(t)]
-    computed = compute_all(mining_rows)
-    avr_index = build_avr_match_index(avr_rows)
+    """Every enrichment stage on mining rows, in place; escalations index into ``mining_rows``.
 
+    Each stage is per row or per asset chain, so any set of whole assets can be enriched
+    on its own (see ``enrich_transactions_parallel``).
+    """
+    computed = compute_with_engine(mining_rows, rule_engine)
     flagged_count = 0
     avr_sync_count = 0
+    avr_match_kinds: dict[str, int] = {}
 
     for row in mining_rows:
         apply_asset_lookup(row, asset_lookup)
-        apply_exception_split([row], computed)
-        comp = computed.get(str(row.get("transaction_id") or ""))
-        apply_economy_fields(row)
+    apply_exception_split(mining_rows, computed)
+    economy = apply_economy_stage(mining_rows, economy_baselines)
 
-        if match_avr_sync(row, avr_index, avr_rows):
+    for row in mining_rows:
+        comp = computed.get(str(row.get("transaction_id") or ""))
+        match_key = avr_match_key(row, avr_index)
+        if match_key:
             row["_avr_sync"] = True
+            row["avr_match_key"] = match_key
             avr_sync_count += 1
+            kind = match_key.split(":", 1)[0]
+            avr_match_kinds[kind] = avr_match_kinds.get(kind, 0) + 1
 
         suggestion = suggested_abco_comment(row, comp)
         if suggestion:
@@ -369,53 +490,276 @@ def enrich_transactions(
         if row.get("exception_60") or row.get("exception_120"):
             flagged_count += 1
 
-    by_asset: dict[str, list[dict[str, Any]]] = {}
-    for row in mining_rows:
-        asset = str(row.get("asset_number") or "UNKNOWN")
-        by_asset.setdefault(asset, []).append(row)
-
-    review_queue: list[dict[str, Any]] = []
-    for asset_rows in by_asset.values():
-        asset_rows.sort(key=lambda r: r.get("date_time") or datetime.min)
-        review_chain_active = False
-        for index, row in enumerate(asset_rows):
-            prev_row = asset_rows[index - 1] if index > 0 else None
-            comp = row.get("_computed")
-            if should_escalate(
-                row,
-                comp,
-                prev_row=prev_row,
-                review_chain_active=review_chain_active,
-                economy_threshold=economy_threshold,
-                profile=rules,
-            ):
-                row["_review"] = True
-                row["review_reason"] = review_reason(
-                    row,
-                    comp,
-                    prev_row=prev_row,
-                    review_chain_active=review_chain_active,
-                )
-                review_queue.append(dict(row))
-                review_chain_active = _review_chain_stays_active(
-                    _effective_exception_60_parts(row, comp)
-                )
-            else:
-                review_chain_active = False
+    sequences = _escalation_sequences(mining_rows)
+    escalated = _escalation_pass(sequences, rules, economy_threshold)
+    for idx, prev_idx, review_chain_active in escalated:
+        row = mining_rows[idx]
+        row["_review"] = True
+        row["review_reason"] = review_reason(
+            row,
+            row.get("_computed"),
+            prev_row=mining_rows[prev_idx] if prev_idx is not None else None,
+            review_chain_active=review_chain_active,
+        )
 
+    what_if_escalated = None
+    if what_if_profiles:
+        what_if_escalated = {
+            candidate.key: escalated
+            if candidate.key == rules.key
+            else _escalation_pass(sequences, candidate, economy_threshold)
+            for candidate in what_if_profiles
+        }
     return {
-        "transactions": mining_rows,
-        "excluded_non_mining_rows": excluded_non_mining,
         "computed": computed,
-        "review_queue": review_queue,
         "flagged_count": flagged_count,
         "avr_sync_count": avr_sync_count,
+        "avr_match_kinds": avr_match_kinds,
+        "economy": economy,
+        "escalated": escalated,
+        "what_if_escalated": what_if_escalated,
+    }
+
+
+def _split_mining(transactions: list[dict[str, Any]]) -> tuple[array, array]:
+    eligible, excluded = array("I"), array("I")
+    for idx, row in enumerate(transactions):
+        (eligible if is_mining_eligible(row) else excluded).append(idx)
+    return eligible, excluded
+
+
+def _enrichment_result(
+    transactions: list[dict[str, Any]],
+    mining_rows: list[dict[str, Any]],
+    excluded: array,
+    stage: dict[str, Any],
+    *,
+    rules: SiteRuleProfile,
+    economy_threshold: float,
+    rule_engine: str,
+    what_if_profiles: list[SiteRuleProfile] | None,
+    economy_baselines: dict[tuple[str, bool], float] | None,
+) -> dict[str, Any]:
+    escalated = stage["escalated"]
+    excluded_non_mining = RowView(transactions, excluded)
+    what_if = None
+    if what_if_profiles:
+        selected = {idx for idx, _, _ in escalated}
+        what_if = [
+            _what_if_summary(candidate, mining_rows, stage["what_if_escalated"][candidate.key], selected)
+            for candidate in what_if_profiles
+        ]
+
+    return {
+        "transactions": mining_rows,
+        "excluded_non_mining_rows": excluded_non_mining,
+        "computed": stage["computed"],
+        "review_queue": RowView(mining_rows, (idx for idx, _, _ in escalated)),
+        "flagged_count": stage["flagged_count"],
+        "avr_sync_count": stage["avr_sync_count"],
+        "avr_match_kinds": stage["avr_match_kinds"],
         "excluded_non_mining": len(excluded_non_mining),
         "rule_profile": rules.key,
         "rule_profile_label": rules.label,
+        "rule_engine": rule_engine,
+        "what_if": what_if,
+        "economy_baselines": stage["economy"] if economy_baselines is not None else None,
     }
 
 
+def enrich_transactions(
+    transactions: list[dict[str, Any]],
+    asset_lookup: dict[str, dict[str, Any]],
+    avr_rows: list[dict[str, Any]],
+    economy_threshold: float = DEFAULT_ECONOMY_VARIANCE_THRESHOLD,
+    profile: SiteRuleProfile | None = None,
+    rule_engine: str = "row",
+    avr_index: dict[Any, set[str]] | None = None,
+    what_if_profiles: list[SiteRuleProfile] | None = None,
+    economy_baselines: dict[tuple[str, bool], float] | None = None,
+    workers: int | None = None,
+) -> dict[str, Any]:
+    """Enrich mining rows and pick the review queue; ``workers`` > 1 shards assets across processes."""
+    if workers and workers > 1:
+        return enrich_transactions_parallel(
+            transactions,
+            asset_lookup,
+            avr_rows,
+            economy_threshold=economy_threshold,
+            profile=profile,
+            rule_engine=rule_engine,
+            avr_index=avr_index,
+            what_if_profiles=what_if_profiles,
+            economy_baselines=economy_baselines,
+            workers=workers,
+        )
+    rules = profile or get_site_profile()
+    eligible, excluded = _split_mining(transactions)
+    mining_rows = [transactions[idx] for idx in eligible]
+    if avr_index is None:
+        avr_index = build_avr_match_index(avr_rows)
+    options = {
+        "rules": rules,
+        "economy_threshold": economy_threshold,
+        "rule_engine": rule_engine,
+        "what_if_profiles": what_if_profiles,
+        "economy_baselines": economy_baselines,
+    }
+    stage = _enrich_mining_rows(mining_rows, asset_lookup, avr_index, **options)
+    return _enrichment_result(transactions, mining_rows, excluded, stage, **options)
+
+
+def shard_assets(mining_rows: list[dict[str, Any]], shards: int) -> list[array]:
+    """Split rows into up to ``shards`` runs of whole assets with about equal row counts.
+
+    Assets keep first-appearance order across shards and rows keep their order within a
+    shard, so concatenating per-shard results in shard order reproduces a serial run.
+    """
+    groups = list(asset_groups(mining_rows).values())
+    shards = max(1, min(shards, len(groups)))
+    target = len(mining_rows) / shards
+    out: list[array] = []
+    current: list[int] = []
+    for position, group in enumerate(groups):
+        current.extend(group.indices)
+        remaining_groups = len(groups) - position - 1
+        remaining_shards = shards - len(out) - 1
+        if remaining_shards and (len(current) >= target or remaining_groups == remaining_shards):
+            out.append(array("I", sorted(current)))
+            current = []
+    if current:
+        out.append(array("I", sorted(current)))
+    return out
+
+
+# Row fields written by _enrich_mining_rows, besides "_computed".
+ENRICHED_FIELDS = (
+    "asset_tag",
+    "department",
+    "avg_economy_180d",
+    "tank_size_l",
+    "meter_type",
+    "exception_60",
+    "exception_120",
+    "economy_type",
+    "economy",
+    "pct_variance",
+    "_avr_sync",
+    "avr_match_key",
+    "suggested_abco_comment",
+    "abco_comment",
+    "_review",
+    "review_reason",
+)
+_FLAG_FIELDS = tuple(f.name for f in fields(RuleFlags))
+
+
+def _enrich_shard(rows: list[dict[str, Any]]) -> tuple[list[dict[str, Any]], list[tuple], dict[str, Any]]:
+    """Enrich one shard; returns only the written fields and computed flags as plain tuples.
+
+    Pickling dataclasses and whole rows back to the parent cost about as much as the
+    enrichment itself.
+    """
+    shared = worker_state()
+    stage = _enrich_mining_rows(rows, shared["asset_lookup"], shared["avr_index"], **shared["options"])
+    updates = [{key: row[key] for key in ENRICHED_FIELDS if key in row} for row in rows]
+    computed = [
+        (
+            comp.transaction_id,
+            comp.asset_number,
+            comp.date_time,
+            tuple(getattr(comp.flags, name) for name in _FLAG_FIELDS),
+            comp.minutes_since_previous,
+            comp.minutes_since_batch_start,
+            comp.batch_start_time,
+            comp.cumulative_litres_in_batch,
+        )
+        for comp in stage.pop("computed").values()
+    ]
+    return updates, computed, stage
+
+
+def enrich_transactions_parallel(
+    transactions: list[dict[str, Any]],
+    asset_lookup: dict[str, dict[str, Any]],
+    avr_rows: list[dict[str, Any]],
+    economy_threshold: float = DEFAULT_ECONOMY_VARIANCE_THRESHOLD,
+    profile: SiteRuleProfile | None = None,
+    rule_engine: str = "row",
+    avr_index: dict[Any, set[str]] | None = None,
+    what_if_profiles: list[SiteRuleProfile] | None = None,
+    economy_baselines: dict[tuple[str, bool], float] | None = None,
+    workers: int | None = None,
+) -> dict[str, Any]:
+    """``enrich_transactions`` with mining rows sharded by asset across worker processes.
+
+    Lookups, the AVR index and rule options are handed to each worker once. Shards come
+    back in submission order and are written into the caller's row dicts, so the result
+    (review queue order included) is the same as a serial run.
+    """
+    rules = profile or get_site_profile()
+    eligible, excluded = _split_mining(transactions)
+    mining_rows = [transactions[idx] for idx in eligible]
+    if avr_index is None:
+        avr_index = build_avr_match_index(avr_rows)
+    options = {
+        "rules": rules,
+        "economy_threshold": economy_threshold,
+        "rule_engine": rule_engine,
+        "what_if_profiles": what_if_profiles,
+        "economy_baselines": economy_baselines,
+    }
+    shards = shard_assets(mining_rows, workers or os.cpu_count() or 1)
+    if len(shards) < 2:
+        stage = _enrich_mining_rows(mining_rows, asset_lookup, avr_index, **options)
+        return _enrichment_result(transactions, mining_rows, excluded, stage, **options)
+    shared = {"asset_lookup": asset_lookup, "avr_index": avr_index, "options": options}
+    with shared_state_pool(len(shards), shared) as pool:
+        results = list(pool.map(_enrich_shard, ([mining_rows[i] for i in shard] for shard in shards)))
+
+    merged: dict[str, Any] = {
+        "computed": {},
+        "flagged_count": 0,
+        "avr_sync_count": 0,
+        "avr_match_kinds": {},
+        "economy": {"history_baseline_rows": 0, "history_baseline_assets": 0},
+        "escalated": [],
+        "what_if_escalated": {c.key: [] for c in what_if_profiles} if what_if_profiles else None,
+    }
+    computed = merged["computed"]
+
+    def to_global(escalated: list[Escalation], shard: array) -> list[Escalation]:
+        return [
+            (shard[idx], shard[prev_idx] if prev_idx is not None else None, chain_active)
+            for idx, prev_idx, chain_active in escalated
+        ]
+
+    for shard, (updates, shard_computed, stage) in zip(shards, results):
+        for txn_id, asset, when, flags, since_prev, since_batch, batch_start, cumulative in shard_computed:
+            computed[txn_id] = ComputedTransaction(
+                txn_id, asset, when, RuleFlags(*flags), since_prev, since_batch, batch_start, cumulative
+            )
+        for idx, update in zip(shard, updates):
+            mining_rows[idx].update(update)
+        merged["flagged_count"] += stage["flagged_count"]
+        merged["avr_sync_count"] += stage["avr_sync_count"]
+        for kind, count in stage["avr_match_kinds"].items():
+            merged["avr_match_kinds"][kind] = merged["avr_match_kinds"].get(kind, 0) + count
+        # Shards hold whole assets, so per-shard asset counts add up to the distinct total.
+        for key, count in stage["economy"].items():
+            merged["economy"][key] += count
+        merged["escalated"].extend(to_global(stage["escalated"], shard))
+        for key, escalated in (stage["what_if_escalated"] or {}).items():
+            merged["what_if_escalated"][key].extend(to_global(escalated, shard))
+
+    # Same rows get a computed entry as in apply_exception_split.
+    for row in mining_rows:
+        comp = computed.get(str(row.get("transaction_id") or ""))
+        if comp:
+            row["_computed"] = comp
+    return _enrichment_result(transactions, mining_rows, excluded, merged, **options)
+
+
 def build_possible_cause_summary(
     review_queue: list[dict[str, Any]],
 ) -> list[dict[str, Any]]:
@@ -441,11 +785,11 @@ def build_possible_cause_summary(
         bucket["litres"] += float(row.get("litres") or 0)
 
     rows = list(buckets.values())
-    rows.sort(key=_possible_cause_sort_key)
+    rows.sort(key=possible_cause_sort_key)
     return rows
 
 
-def _possible_cause_sort_key(row: dict[str, Any]) -> tuple[int, str]:
+def possible_cause_sort_key(row: dict[str, Any]) -> tuple[int, str]:
     exc = str(row.get("exception_reason") or "").lower()
     if "fill outside" in exc:
         rank = 0
@@ -137,9 +137,13 @@ def _usage_value(record: dict[str, Any]) -> float | None:
 def compute_flags_for_asset(asset_rows: list[dict[str, Any]]) -> list[ComputedTransaction]:
     """Apply exception rules to chronologically sorted rows for one asset."""
     rows = sorted(asset_rows, key=lambda r: r.get("date_time") or datetime.min)
+    litres = [float(r.get("litres") or 0) for r in rows]
     results: list[ComputedTransaction] = []
     batch_start_idx: int | None = None
     batch_start_time: datetime | None = None
+    # Running litres for rows[batch_start_idx : i + 1]; restarted when the batch start moves.
+    batch_litres = 0.0
+    batch_litres_start: int | None = None
 
     for i, row in enumerate(rows):
         txn_id = str(row.get("transaction_id") or "")
@@ -193,6 +197,12 @@ def compute_flags_for_asset(asset_rows: list[dict[str, Any]]) -> list[ComputedTr
                 flags.consec_60 = True
                 flags.consec_120 = True
 
+        if batch_start_idx != batch_litres_start:
+            batch_litres_start = batch_start_idx
+            batch_litres = sum(litres[batch_start_idx : i + 1])
+        else:
+            batch_litres += litres[i]
+
         minutes_since_batch = _minutes_between(batch_start_time, dt)
 
         if prev and minutes_since_prev is not None:
@@ -212,8 +222,7 @@ def compute_flags_for_asset(asset_rows: list[dict[str, Any]]) -> list[ComputedTr
         tank = row.get("tank_size_l")
         cumulative: float | None = None
         if tank and batch_start_idx is not None and flags.consec_60:
-            batch_rows = rows[batch_start_idx : i + 1]
-            cumulative = sum(float(r.get("litres") or 0) for r in batch_rows)
+            cumulative = batch_litres
             if cumulative > float(tank) and flags.odo_non_positive:
                 flags.over_tank_cumulative = True
                 flags.over_tank_detail = (
@@ -273,7 +282,9 @@ def match_rate(
     transactions: list[dict[str, Any]],
     computed: dict[str, ComputedTransaction],
     column: str,
+    limit: int | None = 50,
 ) -> dict[str, Any]:
+    """Agreement of the workbook's ``column`` reasons with ours; ``limit=None`` keeps every mismatch."""
     mismatches: list[dict[str, Any]] = []
     matched = 0
     total_flagged = 0
@@ -299,5 +310,5 @@ def match_rate(
         "total_flagged": total_flagged,
         "matched": matched,
         "match_pct": pct,
-        "mismatches": mismatches[:50],
+        "mismatches": mismatches[:limit],
     }
@@ -0,0 +1,51 @@
+"""Phase timings, row counts and peak memory for prep runs (``performance`` in the summary)."""
+from __future__ import annotations
+
+import sys
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import Any
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_mb() -> float | None:
+    """Peak resident set size of this process so far, in MB (None where unavailable)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, kilobytes on Linux.
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+class PhaseTimer:
+    """Wall-clock seconds, row counts and peak RSS at the end of each named phase, in run order."""
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.phases: list[dict[str, Any]] = []
+
+    @contextmanager
+    def phase(self, name: str, rows: int | None = None) -> Iterator[dict[str, Any]]:
+        """Time the block; set ``entry["rows"]`` inside it when the count is only known there."""
+        entry: dict[str, Any] = {"phase": name, "seconds": 0.0, "rows": rows}
+        started = time.perf_counter()
+        try:
+            yield entry
+        finally:
+            entry["seconds"] = round(time.perf_counter() - started, 3)
+            entry["peak_rss_mb"] = peak_rss_mb()
+            self.phases.append(entry)
+
+    def report(self) -> dict[str, Any]:
+        slowest = max(self.phases, key=lambda p: p["seconds"], default=None)
+        return {
+            "total_seconds": round(time.perf_counter() - self.started, 3),
+            "slowest_phase": slowest["phase"] if slowest else None,
+            "phases": list(self.phases),
+            "peak_rss_mb": peak_rss_mb(),
+        }
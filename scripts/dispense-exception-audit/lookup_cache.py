@@ -0,0 +1,206 @@
+"""Persistent cache of parsed Asset Info Lookup / AVR Sync uploads across prep runs.
+
+Entries are keyed on a hash of the uploaded file's bytes, so re-uploading the same workbook
+for another site or month skips the Excel parse. Payloads (lookup dict, AVR rows + match
+index) are stored as zlib-compressed pickles in SQLite. Least-recently-used entries are
+evicted past ``max_bytes``; a lookup pinned as a site's "current" one is never evicted and
+can be reused when a run does not upload that lookup. The pin records the uploaded file's
+path, so the prepared workbook can still copy the lookup sheet while that file is unchanged.
+"""
+from __future__ import annotations
+
+import hashlib
+import pickle
+import sqlite3
+import time
+import zlib
+from pathlib import Path
+from typing import Any
+
+from enrichment import build_avr_match_index
+from parse_workbook import parse_asset_lookup, parse_avr_sync_lookup
+
+ASSET_LOOKUP = "asset_lookup"
+AVR_SYNC = "avr_sync"
+# Bump when the parsers or the AVR index change shape so old payloads are ignored.
+CACHE_VERSION = 1
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def file_digest(path: str | Path) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def site_key(site: str) -> str:
+    return " ".join(str(site or "").split()).lower()
+
+
+class LookupCache:
+    """SQLite-backed store of parsed lookups keyed on (content hash, kind)."""
+
+    def __init__(self, path: str | Path, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        # Several worker processes may share one cache file.
+        self.conn = sqlite3.connect(str(self.path), timeout=30)
+        self.conn.executescript(
+            """
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            CREATE TABLE IF NOT EXISTS lookups (
+                digest TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                version INTEGER NOT NULL,
+                source_name TEXT,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL,
+                payload BLOB NOT NULL,
+                PRIMARY KEY (digest, kind)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS pins (
+                site TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                digest TEXT NOT NULL,
+                source_path TEXT,
+                PRIMARY KEY (site, kind)
+            ) WITHOUT ROWID;
+            """
+        )
+        pin_columns = {row[1] for row in self.conn.execute("PRAGMA table_info(pins)")}
+        if "source_path" not in pin_columns:
+            with self.conn:
+                self.conn.execute("ALTER TABLE pins ADD COLUMN source_path TEXT")
+
+    def get(self, digest: str, kind: str) -> Any | None:
+        row = self.conn.execute(
+            "SELECT payload FROM lookups WHERE digest = ? AND kind = ? AND version = ?",
+            (digest, kind, CACHE_VERSION),
+        ).fetchone()
+        if not row:
+            return None
+        with self.conn:
+            self.conn.execute(
+                "UPDATE lookups SET last_used = ? WHERE digest = ? AND kind = ?",
+                (time.time(), digest, kind),
+            )
+        return pickle.loads(zlib.decompress(row[0]))
+
+    def put(self, digest: str, kind: str, value: Any, source_name: str | None = None) -> None:
+        payload = zlib.compress(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO lookups (digest, kind, version, source_name, size, last_used, payload) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (digest, kind, CACHE_VERSION, source_name, len(payload), time.time(), payload),
+            )
+        self.evict()
+
+    def evict(self) -> list[tuple[str, str]]:
+        """Drop least-recently-used unpinned entries until the cache fits ``max_bytes``."""
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM lookups").fetchone()[0]
+        if total <= self.max_bytes:
+            return []
+        candidates = self.conn.execute(
+            "SELECT digest, kind, size FROM lookups l WHERE NOT EXISTS "
+            "(SELECT 1 FROM pins p WHERE p.digest = l.digest AND p.kind = l.kind) "
+            "ORDER BY last_used"
+        ).fetchall()
+        evicted: list[tuple[str, str]] = []
+        for digest, kind, size in candidates:
+            if total <= self.max_bytes:
+                break
+            evicted.append((digest, kind))
+            total -= size
+        with self.conn:
+            self.conn.executemany("DELETE FROM lookups WHERE digest = ? AND kind = ?", evicted)
+        return evicted
+
+    def pin(self, site: str, kind: str, digest: str, source_path: str | None = None) -> None:
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO pins (site, kind, digest, source_path) VALUES (?, ?, ?, ?)",
+                (site_key(site), kind, digest, source_path),
+            )
+
+    def pinned(self, site: str, kind: str) -> tuple[str, str | None] | None:
+        """(digest, source path) of the site's pinned lookup."""
+        row = self.conn.execute(
+            "SELECT digest, source_path FROM pins WHERE site = ? AND kind = ?", (site_key(site), kind)
+        ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> LookupCache:
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+def _parse(kind: str, path: str) -> Any:
+    if kind == ASSET_LOOKUP:
+        return parse_asset_lookup(path)
+    avr_rows = parse_avr_sync_lookup(path)
+    return {"rows": avr_rows, "index": build_avr_match_index(avr_rows)}
+
+
+def _load_one(
+    cache: LookupCache, kind: str, path: str | None, site: str | None, pin: bool
+) -> tuple[Any | None, str | None, str | None]:
+    """Parsed lookup, how it was obtained (``hit``, ``miss``, ``pinned`` or None) and its workbook.
+
+    A pinned lookup's workbook is the path recorded with the pin, or None once that file is
+    gone or no longer holds the pinned content.
+    """
+    if path:
+        digest = file_digest(path)
+        value = cache.get(digest, kind)
+        status = "hit"
+        if value is None:
+            value = _parse(kind, path)
+            cache.put(digest, kind, value, Path(path).name)
+            status = "miss"
+        if pin and site:
+            cache.pin(site, kind, digest, str(Path(path).resolve()))
+        return value, status, path
+    entry = cache.pinned(site, kind) if site else None
+    if not entry:
+        return None, None, None
+    digest, source_path = entry
+    value = cache.get(digest, kind)
+    if value is None:
+        return None, None, None
+    if source_path and not (Path(source_path).is_file() and file_digest(source_path) == digest):
+        source_path = None
+    return value, "pinned", source_path
+
+
+def load_lookups(
+    cache: LookupCache,
+    asset_lookup_path: str | None,
+    avr_sync_path: str | None,
+    site: str | None = None,
+    pin: bool = False,
+) -> dict[str, Any]:
+    """Asset lookup, AVR rows and AVR match index, parsing only uploads not seen before.
+
+    Uploaded files are pinned as the site's current lookups when ``pin`` is set; a lookup
+    that is not uploaded falls back to the site's pinned one. ``sources`` holds the workbook
+    each lookup came from, for copying its sheet into the prepared workbook.
+    """
+    asset_lookup, asset_status, asset_source = _load_one(cache, ASSET_LOOKUP, asset_lookup_path, site, pin)
+    avr, avr_status, avr_source = _load_one(cache, AVR_SYNC, avr_sync_path, site, pin)
+    return {
+        "asset_lookup": asset_lookup or {},
+        "avr_rows": avr["rows"] if avr else [],
+        "avr_index": avr["index"] if avr else None,
+        "status": {ASSET_LOOKUP: asset_status, AVR_SYNC: avr_status},
+        "sources": {ASSET_LOOKUP: asset_source, AVR_SYNC: avr_source},
+    }
@@ -6,13 +6,15 @@ from typing import Any
 import openpyxl
 
 
-def _review_ids_from_workbook(path: str) -> set[str]:
+def _review_rows_from_workbook(path: str) -> tuple[set[str], set[str]]:
+    """Transaction IDs and asset numbers on the prior "Transactions deemed ineligible" sheet."""
     wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
     if "Transactions deemed ineligible" not in wb.sheetnames:
-        return set()
+        return set(), set()
     ws = wb["Transactions deemed ineligible"]
     headers: dict[str, int] = {}
     ids: set[str] = set()
+    assets: set[str] = set()
     for row in ws.iter_rows(values_only=True):
         if not row:
             continue
@@ -30,39 +32,31 @@ def _review_ids_from_workbook(path: str) -> set[str]:
         if txn_id and txn_id.lower() not in {"transaction id", "total", "uploaded"}:
             if not txn_id.lower().startswith("uploaded"):
                 ids.add(txn_id)
-    return ids
+                asset_idx = headers.get("asset number")
+                if asset_idx is not None and asset_idx < len(row):
+                    assets.add(str(row[asset_idx] or "UNKNOWN").strip())
+    return ids, assets
 
 
-def compare_month_over_month(
+def diff_review_queue(
     review_queue: list[dict[str, Any]],
-    prior_path: str | None,
-) -> dict[str, Any] | None:
-    if not prior_path:
-        return None
-
-    prior_ids = _review_ids_from_workbook(prior_path)
-    current_ids = {str(row.get("transaction_id") or "") for row in review_queue}
-    current_ids.discard("")
-
-    current_assets: dict[str, float] = {}
-    prior_assets: dict[str, float] = {}
+    prior_ids: set[str],
+    prior_assets: set[str],
+) -> dict[str, Any]:
+    """New / repeat / dropped transactions and new assets versus a prior review set."""
+    current_litres: dict[str, float] = {}
+    current_assets: set[str] = set()
     for row in review_queue:
-        asset = str(row.get("asset_number") or "UNKNOWN")
-        current_assets[asset] = current_assets.get(asset, 0.0) + float(row.get("litres") or 0)
+        txn_id = str(row.get("transaction_id") or "")
+        current_assets.add(str(row.get("asset_number") or "UNKNOWN"))
+        if txn_id:
+            current_litres[txn_id] = current_litres.get(txn_id, 0.0) + float(row.get("litres") or 0)
+    current_ids = set(current_litres)
 
     new_ids = sorted(current_ids - prior_ids)
     repeat_ids = sorted(current_ids & prior_ids)
     dropped_ids = sorted(prior_ids - current_ids)
-    new_assets = sorted(set(current_assets) - set(prior_assets))
-
-    repeat_litres = round(
-        sum(float(row.get("litres") or 0) for row in review_queue if str(row.get("transaction_id")) in repeat_ids),
-        2,
-    )
-    new_litres = round(
-        sum(float(row.get("litres") or 0) for row in review_queue if str(row.get("transaction_id")) in new_ids),
-        2,
-    )
+    new_assets = sorted(current_assets - prior_assets)
 
     return {
         "prior_review_count": len(prior_ids),
@@ -74,6 +68,16 @@ def compare_month_over_month(
         "repeat_in_review_ids": repeat_ids[:25],
         "dropped_from_review_ids": dropped_ids[:25],
         "new_assets_in_review": new_assets[:25],
-        "new_review_litres": new_litres,
-        "repeat_review_litres": repeat_litres,
+        "new_review_litres": round(sum(current_litres[t] for t in new_ids), 2),
+        "repeat_review_litres": round(sum(current_litres[t] for t in repeat_ids), 2),
     }
+
+
+def compare_month_over_month(
+    review_queue: list[dict[str, Any]],
+    prior_path: str | None,
+) -> dict[str, Any] | None:
+    if not prior_path:
+        return None
+    prior_ids, prior_assets = _review_rows_from_workbook(prior_path)
+    return diff_review_queue(review_queue, prior_ids, prior_assets)
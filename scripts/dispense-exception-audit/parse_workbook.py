@@ -3,8 +3,10 @@ from __future__ import annotations
 
 import re
 from datetime import datetime
+from functools import lru_cache
 from typing import Any
 
+import numpy as np
 import pandas as pd
 
 REQUIRED_SHEETS = ["Details as Assets"]
@@ -81,17 +83,33 @@ def normalize_header(value: Any) -> str | None:
     return text or None
 
 
+def _alias_index() -> dict[str, str]:
+    index: dict[str, str] = {}
+    for field, aliases in HEADER_ALIASES.items():
+        for alias in aliases:
+            # First field listing an alias wins, as the per-field scan did.
+            index.setdefault(normalize_header(alias), field)
+    return index
+
+
+# Normalized header text -> field, built once from HEADER_ALIASES.
+HEADER_FIELDS = _alias_index()
+
+
+def header_field(value: Any) -> str | None:
+    """Field named by one header cell, or None."""
+    norm = normalize_header(value)
+    return HEADER_FIELDS.get(norm) if norm else None
+
+
+@lru_cache(maxsize=1024)
+def resolve_header_row(values: tuple[Any, ...]) -> tuple[tuple[int, str], ...]:
+    """(0-based column, field) for each known header cell; repeated sub-headers hit the cache."""
+    return tuple((idx, field) for idx, value in enumerate(values) if (field := header_field(value)))
+
+
 def map_header_row(values: list[Any]) -> dict[int, str]:
-    col_map: dict[int, str] = {}
-    for idx, value in enumerate(values):
-        norm = normalize_header(value)
-        if not norm:
-            continue
-        for field, aliases in HEADER_ALIASES.items():
-            if norm in aliases:
-                col_map[idx] = field
-                break
-    return col_map
+    return dict(resolve_header_row(tuple(values)))
 
 
 def parse_odo(value: Any) -> float | None:
@@ -194,44 +212,220 @@ def row_to_record(
     return record
 
 
-def parse_details_sheet(df: pd.DataFrame) -> list[dict[str, Any]]:
-    transactions: list[dict[str, Any]] = []
-    col_map: dict[int, str] = {}
-    current_asset: str | None = None
+_NUMBER_TYPES = (int, float)
+_ODO_NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
 
-    for _, row in df.iterrows():
-        values = [None if pd.isna(v) else v for v in row.tolist()]
-
-        if is_column_header_row(values):
-            new_map = map_header_row(values)
-            if col_map:
-                # Repeated asset sub-headers often omit exception columns (None cells).
-                for idx, field in col_map.items():
-                    if idx not in new_map:
-                        new_map[idx] = field
-            col_map = new_map
-            continue
 
-        if is_asset_header_row(values):
-            current_asset = str(values[0] or "").strip() or current_asset
-            continue
+def _falsy(col: np.ndarray) -> np.ndarray:
+    """Column-wise ``not value`` for the cell types a sheet yields (None, "", 0)."""
+    return pd.isna(col) | (col == "") | (col == 0)
+
+
+def _text(col: np.ndarray) -> pd.Series:
+    """Column-wise ``str(value or "")``."""
+    return pd.Series(np.where(_falsy(col), "", col).astype(str), dtype=object)
+
+
+def _contains_text(col: np.ndarray, needle: str) -> np.ndarray:
+    """Text cells whose lower-cased value contains ``needle`` (other cell types never match)."""
+    return np.fromiter(
+        (isinstance(v, str) and needle in v.lower() for v in col), dtype=bool, count=len(col)
+    )
+
+
+def _column_header_mask(values: np.ndarray) -> np.ndarray:
+    lead = values[:, :6]
+    has_txn = np.zeros(len(values), dtype=bool)
+    for i in range(lead.shape[1]):
+        has_txn |= _contains_text(lead[:, i], "transaction")
+    # "date" is only looked for on the handful of rows that mention a transaction.
+    rows = np.flatnonzero(has_txn)
+    has_date = np.zeros(len(rows), dtype=bool)
+    for i in range(lead.shape[1]):
+        has_date |= _contains_text(lead[rows, i], "date")
+    mask = np.zeros(len(values), dtype=bool)
+    mask[rows[has_date]] = True
+    return mask
 
-        if not is_transaction_row(values, col_map):
+
+def _asset_banner_text(values: np.ndarray) -> np.ndarray:
+    """Stripped first-cell text on asset banner rows (vectorized ``is_asset_header_row``), else None."""
+    first = values[:, 0]
+    if values.shape[1] > 1:
+        second_blank = _falsy(values[:, 1])
+        second_text = _text(values[:, 1]).str.strip()
+        second_label = ((second_text == "") | (second_text.str.lower() == "transaction id")).to_numpy()
+    else:
+        second_blank = second_label = np.ones(len(values), dtype=bool)
+    mentions_asset = _contains_text(first, "asset")
+    candidates = np.flatnonzero(~_falsy(first) & (second_blank | (mentions_asset & second_label)))
+
+    out = np.full(len(values), None, dtype=object)
+    for i in candidates:
+        text = str(first[i]).strip()
+        if not text:
             continue
+        if second_blank[i] and re.match(r"^[A-Z0-9]", text):
+            out[i] = text
+        elif second_label[i] and "asset" in text.lower() and not parse_datetime(text):
+            out[i] = text
+    return out
+
+
+def _number_mask(col: np.ndarray, types: tuple[type, ...]) -> np.ndarray:
+    return np.fromiter((type(v) in types for v in col), dtype=bool, count=len(col))
+
+
+def _parse_odo_column(col: np.ndarray) -> np.ndarray:
+    """Vectorized ``parse_odo``: numbers pass through, text takes its first numeric token."""
+    out = np.full(len(col), None, dtype=object)
+    numeric = _number_mask(col, (*_NUMBER_TYPES, bool))
+    out[numeric] = col[numeric].astype(float)
+    text = ~pd.isna(col) & ~numeric & (col != "")
+    if text.any():
+        matches = (_ODO_NUMBER.search(str(v).replace(",", "")) for v in col[text])
+        out[text] = [float(m.group(0)) if m else None for m in matches]
+    return out
+
+
+def _float_column(col: np.ndarray) -> np.ndarray:
+    """``float(str(value).replace(",", ""))`` per cell, None when that raises."""
+    out = np.full(len(col), None, dtype=object)
+    numeric = _number_mask(col, _NUMBER_TYPES)
+    out[numeric] = col[numeric].astype(float)
+    cache: dict[str, float | None] = {}
+    for i in np.flatnonzero(~pd.isna(col) & ~numeric):
+        text = str(col[i]).replace(",", "")
+        if text not in cache:
+            try:
+                cache[text] = float(text)
+            except ValueError:
+                cache[text] = None
+        out[i] = cache[text]
+    return out
+
+
+def _datetime_column(col: np.ndarray) -> np.ndarray:
+    """``parse_datetime`` per cell, parsing each distinct non-datetime value once."""
+    out = col.copy()
+    pending = np.fromiter(
+        (v is not None and not isinstance(v, datetime) for v in col), dtype=bool, count=len(col)
+    )
+    if pending.any():
+        parsed = {v: parse_datetime(v) for v in set(col[pending])}
+        out[pending] = [parsed[v] for v in col[pending]]
+    return out
+
+
+def _block_records(
+    rows: np.ndarray,
+    labels: np.ndarray,
+    col_map: dict[int, str],
+    current_asset: np.ndarray,
+) -> list[tuple[int, dict[str, Any]]]:
+    """(row position, record) for every transaction row read with one column map."""
+    txn_idx = next((i for i, f in col_map.items() if f == "transaction_id"), None)
+    if txn_idx is None or not len(rows):
+        return []
+    txn = _text(rows[:, txn_idx]).str.strip()
+    keep = ((txn != "") & (txn.str.lower() != "transaction id")).to_numpy()
+    rows, labels, current_asset = rows[keep], labels[keep], current_asset[keep]
+    if not len(rows):
+        return []
 
-        record = row_to_record(values, col_map, current_asset)
-        if record.get("transaction_id"):
-            transactions.append(record)
+    blank = np.full(len(rows), None, dtype=object)
+    fields: dict[str, np.ndarray] = {key: blank for key in DETAIL_COLUMNS}
+    for idx, field in col_map.items():
+        if idx < rows.shape[1]:
+            fields[field] = rows[:, idx]
+
+    asset = fields["asset_number"]
+    fill = _falsy(asset) & ~pd.isna(current_asset)
+    asset = np.where(fill, current_asset, asset)
+    present = ~pd.isna(asset)
+    asset[present] = pd.Series(asset[present].astype(str)).str.strip().to_numpy()
+
+    fields["date_time"] = _datetime_column(fields["date_time"])
+    fields["opening_odo_num"] = _parse_odo_column(fields["opening_odo"])
+    fields["closing_odo_num"] = _parse_odo_column(fields["closing_odo"])
+    fields["total_usage_num"] = _parse_odo_column(fields["total_usage"])
+    fields["litres"] = _float_column(fields["litres"])
+    fields["tank_size_l"] = _float_column(fields["tank_size_l"])
+    fields["asset_number"] = asset
 
-    return transactions
+    # Raw export single exception column → 120 min column until split
+    if "exception_reason" in fields:
+        split = ~_falsy(fields["exception_reason"]) & _falsy(fields["exception_120"])
+        fields["exception_120"] = np.where(split, fields["exception_reason"], fields["exception_120"])
 
+    has_id = ~_falsy(fields["transaction_id"])
+    keys = list(fields)
+    columns = [fields[key][has_id].tolist() for key in keys]
+    return [
+        (label, dict(zip(keys, values)))
+        for label, values in zip(labels[has_id].tolist(), zip(*columns))
+    ]
 
-def parse_flat_sheet(path: str, sheet_name: str) -> pd.DataFrame:
-    return pd.read_excel(path, sheet_name=sheet_name, header=None, engine="openpyxl")
 
+def parse_details_sheet(df: pd.DataFrame) -> list[dict[str, Any]]:
+    """Parse the Details as Assets layout: column-header rows, asset banners, transactions.
 
-def detect_workbook(path: str) -> dict[str, Any]:
-    xl = pd.ExcelFile(path, engine="openpyxl")
+    Rows are classified column-wise and the current asset is forward-filled from banner
+    rows. Each column-header row starts a block; blocks that resolve to the same column map
+    (the usual repeated per-asset sub-header) are converted together in bulk.
+    """
+    if df.empty:
+        return []
+    values = df.to_numpy(dtype=object, copy=True)
+    values[pd.isna(values)] = None
+
+    header_rows = _column_header_mask(values)
+    banner_text = _asset_banner_text(values)
+    banner_text[header_rows] = None
+    banners = ~pd.isna(banner_text)
+    current_asset = pd.Series(banner_text, dtype=object).ffill().to_numpy(dtype=object, copy=True)
+    current_asset[pd.isna(current_asset)] = None
+
+    # Column map per block (block 0 = rows above the first column-header row).
+    block_maps: list[tuple[tuple[int, str], ...]] = [()]
+    col_map: dict[int, str] = {}
+    for start in np.flatnonzero(header_rows):
+        new_map = map_header_row(values[start].tolist())
+        if col_map:
+            # Repeated asset sub-headers often omit exception columns (None cells).
+            for idx, field in col_map.items():
+                if idx not in new_map:
+                    new_map[idx] = field
+        col_map = new_map
+        block_maps.append(tuple(col_map.items()))
+
+    map_ids: dict[tuple[tuple[int, str], ...], int] = {}
+    block_map_id = np.array([map_ids.setdefault(m, len(map_ids)) for m in block_maps])
+    row_map_id = block_map_id[np.cumsum(header_rows)]
+
+    body = ~header_rows & ~banners
+    positions = np.arange(len(values))
+    labelled: list[tuple[int, dict[str, Any]]] = []
+    for items, map_id in map_ids.items():
+        if not items:
+            continue
+        mask = body & (row_map_id == map_id)
+        labelled.extend(
+            _block_records(values[mask], positions[mask], dict(items), current_asset[mask])
+        )
+    labelled.sort(key=lambda pair: pair[0])
+    return [record for _, record in labelled]
+
+
+def parse_flat_sheet(source: str | pd.ExcelFile, sheet_name: str) -> pd.DataFrame:
+    """Read a sheet without header inference; pass an open ``pd.ExcelFile`` to reuse its handle."""
+    if isinstance(source, pd.ExcelFile):
+        return source.parse(sheet_name=sheet_name, header=None)
+    return pd.read_excel(source, sheet_name=sheet_name, header=None, engine="openpyxl")
+
+
+def detect_workbook(source: str | pd.ExcelFile) -> dict[str, Any]:
+    xl = source if isinstance(source, pd.ExcelFile) else pd.ExcelFile(source, engine="openpyxl")
     sheet_names = xl.sheet_names
     missing = [s for s in REQUIRED_SHEETS if s not in sheet_names]
     return {
@@ -244,7 +438,13 @@ def detect_workbook(path: str) -> dict[str, Any]:
 
 
 def load_workbook(path: str) -> dict[str, Any]:
-    detection = detect_workbook(path)
+    """Parse every InsightWare sheet we use from a single open of the xlsx."""
+    with pd.ExcelFile(path, engine="openpyxl") as xl:
+        return _load_from_excel(xl)
+
+
+def _load_from_excel(xl: pd.ExcelFile) -> dict[str, Any]:
+    detection = detect_workbook(xl)
     if not detection["valid"]:
         return {
             "detection": detection,
@@ -254,17 +454,17 @@ def load_workbook(path: str) -> dict[str, Any]:
             "summary_per_asset": [],
         }
 
-    df = parse_flat_sheet(path, "Details as Assets")
+    df = parse_flat_sheet(xl, "Details as Assets")
     transactions = parse_details_sheet(df)
 
     review_queue: list[dict[str, Any]] = []
     if "Transactions deemed ineligible" in detection["sheet_names"]:
-        rq_df = parse_flat_sheet(path, "Transactions deemed ineligible")
+        rq_df = parse_flat_sheet(xl, "Transactions deemed ineligible")
         review_queue = parse_details_sheet(rq_df)
 
     possible_causes: list[dict[str, Any]] = []
     if "Possible Cause Summary" in detection["sheet_names"]:
-        pcs = parse_flat_sheet(path, "Possible Cause Summary")
+        pcs = parse_flat_sheet(xl, "Possible Cause Summary")
         for _, row in pcs.iterrows():
             if str(row.iloc[0] or "").strip().lower() == "exception reason":
                 continue
@@ -282,7 +482,7 @@ def load_workbook(path: str) -> dict[str, Any]:
 
     summary_per_asset: list[dict[str, Any]] = []
     if "Summary Per Asset" in detection["sheet_names"]:
-        spa = parse_flat_sheet(path, "Summary Per Asset")
+        spa = parse_flat_sheet(xl, "Summary Per Asset")
         for _, row in spa.iterrows():
             if str(row.iloc[0] or "").strip().lower() == "asset number":
                 continue
@@ -307,13 +507,18 @@ def load_workbook(path: str) -> dict[str, Any]:
     }
 
 
+def _probe_headers(xl: pd.ExcelFile, sheet: str) -> set[str | None]:
+    """Normalized header cells of a sheet, reading only its first row."""
+    head = xl.parse(sheet_name=sheet, header=0, nrows=0)
+    return {normalize_header(c) for c in head.columns}
+
+
 def _sheet_with_headers(path: str, required: set[str]) -> tuple[str, pd.DataFrame] | tuple[None, None]:
-    xl = pd.ExcelFile(path, engine="openpyxl")
-    for sheet in xl.sheet_names:
-        df = pd.read_excel(path, sheet_name=sheet, header=0, engine="openpyxl")
-        headers = {normalize_header(c) for c in df.columns}
-        if required.issubset(headers):
-            return sheet, df
+    """Pick the first sheet whose header row has ``required`` and load only that sheet."""
+    with pd.ExcelFile(path, engine="openpyxl") as xl:
+        for sheet in xl.sheet_names:
+            if required.issubset(_probe_headers(xl, sheet)):
+                return sheet, xl.parse(sheet_name=sheet, header=0)
     return None, None
 
 
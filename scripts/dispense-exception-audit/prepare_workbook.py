@@ -11,9 +11,10 @@ from typing import Any
 import openpyxl
 from openpyxl.formatting.rule import CellIsRule, FormulaRule
 from openpyxl.styles import Font, PatternFill
+from openpyxl.styles.cell_style import StyleArray
 from openpyxl.utils import get_column_letter
 
-from parse_workbook import HEADER_ALIASES, normalize_header
+from parse_workbook import header_field, resolve_header_row
 
 DETAILS_SHEET = "Details as Assets"
 
@@ -140,16 +141,8 @@ def _row_highlight(row: dict[str, Any]) -> PatternFill | None:
 
 
 def _map_header_row(values: list[Any]) -> dict[str, int]:
-    col_map: dict[str, int] = {}
-    for idx, value in enumerate(values):
-        norm = normalize_header(value)
-        if not norm:
-            continue
-        for field, aliases in HEADER_ALIASES.items():
-            if norm in aliases:
-                col_map[field] = idx + 1
-                break
-    return col_map
+    """Field -> 1-based column; a field named twice keeps its last column."""
+    return {field: idx + 1 for idx, field in resolve_header_row(tuple(values))}
 
 
 def _is_column_header_row(values: list[Any]) -> bool:
@@ -164,26 +157,34 @@ def _merge_col_maps(previous: dict[str, int], new_map: dict[str, int]) -> dict[s
 
 
 def _apply_light_touch_details(ws, txn_by_id: dict[str, dict[str, Any]]) -> None:
-    """Preserve InsightWare layout; apply highlights and exception updates only."""
+    """Preserve InsightWare layout; apply highlights and exception updates only.
+
+    One pass over the sheet's rows: only the exception / Abco cell values change, and a
+    highlighted row gets the fill id swapped into each cell's existing style array.
+    """
     ws.conditional_formatting._cf_rules.clear()
     max_col = ws.max_column
     col_map: dict[str, int] = {}
+    header_cells: tuple = ()
 
-    for row_idx in range(1, ws.max_row + 1):
-        values = [ws.cell(row_idx, col).value for col in range(1, max_col + 1)]
+    for cells in ws.iter_rows(min_row=1, max_row=ws.max_row, max_col=max_col):
+        row_idx = cells[0].row
+        if row_idx == 1:
+            header_cells = cells
+        values = [cell.value for cell in cells]
 
         if _is_column_header_row(values):
             new_map = _map_header_row(values)
             if new_map:
                 col_map = _merge_col_maps(col_map, new_map)
             if row_idx == 1 and col_map.get("exception_60"):
-                ws.cell(row_idx, col_map["exception_60"]).value = "Exception Reason"
+                cells[col_map["exception_60"] - 1].value = "Exception Reason"
             continue
 
         txn_col = col_map.get("transaction_id")
         if not txn_col:
             continue
-        txn_id = str(ws.cell(row_idx, txn_col).value or "").strip()
+        txn_id = str(values[txn_col - 1] or "").strip()
         if not txn_id or txn_id.lower() == "transaction id":
             continue
 
@@ -193,23 +194,26 @@ def _apply_light_touch_details(ws, txn_by_id: dict[str, dict[str, Any]]) -> None
 
         fill = _row_highlight(record)
         if fill:
-            for col in range(1, max_col + 1):
-                ws.cell(row_idx, col).fill = fill
+            fill_id = ws.parent._fills.add(fill)
+            for cell in cells:
+                style = StyleArray(cell._style) if cell._style else StyleArray()
+                style.fillId = fill_id
+                cell._style = style
 
         exc_col = col_map.get("exception_60")
         if exc_col and record.get("exception_60"):
-            ws.cell(row_idx, exc_col).value = record["exception_60"]
+            cells[exc_col - 1].value = record["exception_60"]
 
         abco_col = col_map.get("abco_comment")
-        if abco_col and not ws.cell(row_idx, abco_col).value:
+        if abco_col and not cells[abco_col - 1].value:
             suggestion = record.get("suggested_abco_comment") or record.get("abco_comment")
             if suggestion:
-                ws.cell(row_idx, abco_col).value = suggestion
+                cells[abco_col - 1].value = suggestion
 
     last_row = ws.max_row
-    for col_idx in range(1, max_col + 1):
-        header = normalize_header(ws.cell(1, col_idx).value)
-        if header in {"% variance", "% varinace"}:
+    for col_idx, cell in enumerate(header_cells, start=1):
+        field = header_field(cell.value)
+        if field == "pct_variance":
             var_col = get_column_letter(col_idx)
             ws.conditional_formatting.add(
                 f"{var_col}2:{var_col}{last_row}",
@@ -219,11 +223,7 @@ def _apply_light_touch_details(ws, txn_by_id: dict[str, dict[str, Any]]) -> None
                 f"{var_col}2:{var_col}{last_row}",
                 CellIsRule(operator="lessThan", formula=['"-60%"'], fill=PatternFill("solid", fgColor="FFF2CC")),
             )
-        if header in {
-            "exception reason",
-            "exception reason (60 min)",
-            "exception reason (60 mins)",
-        }:
+        if field in {"exception_reason", "exception_60"}:
             exc_col = get_column_letter(col_idx)
             ws.conditional_formatting.add(
                 f"{exc_col}2:{exc_col}{last_row}",
@@ -371,42 +371,63 @@ def _write_glossary_sheet(ws) -> None:
         ws.column_dimensions[get_column_letter(col)].width = 28
 
 
-def _copy_lookup_sheet(
-    source_path: str | None,
-    wb: openpyxl.Workbook,
-    sheet_name: str,
-    required_headers: set[str] | None = None,
-) -> None:
-    if not source_path:
-        return
-    src = openpyxl.load_workbook(source_path, data_only=False)
-    src_ws = None
-    if sheet_name in src.sheetnames:
-        src_ws = src[sheet_name]
-    elif required_headers:
-        for name in src.sheetnames:
-            ws = src[name]
-            headers = {
-                str(ws.cell(1, c).value or "").strip().lower()
-                for c in range(1, ws.max_column + 1)
-            }
-            if required_headers.issubset(headers):
-                src_ws = ws
-                break
-    if src_ws is None:
-        src_ws = src[src.sheetnames[0]]
-    if sheet_name in wb.sheetnames:
-        del wb[sheet_name]
-    tgt = wb.create_sheet(sheet_name)
+def _first_row_headers(ws) -> set[str]:
+    first = next(ws.iter_rows(max_row=1, values_only=True), ())
+    return {str(value or "").strip().lower() for value in first}
+
+
+def _copy_cells(src_ws, tgt) -> None:
+    """Copy values; each distinct source style is registered once and its style array reused."""
+    styles: dict[int, StyleArray] = {}
     for row in src_ws.iter_rows():
         for cell in row:
+            has_style = getattr(cell, "has_style", False)
+            if cell.value is None and not has_style:
+                continue
             tgt_cell = tgt.cell(row=cell.row, column=cell.column, value=cell.value)
-            if cell.has_style:
+            if not has_style:
+                continue
+            style = styles.get(cell._style_id)
+            if style is None:
                 tgt_cell.font = copy(cell.font)
                 tgt_cell.fill = copy(cell.fill)
                 tgt_cell.border = copy(cell.border)
                 tgt_cell.alignment = copy(cell.alignment)
                 tgt_cell.number_format = cell.number_format
+                styles[cell._style_id] = StyleArray(tgt_cell._style)
+            else:
+                tgt_cell._style = StyleArray(style)
+
+
+def _copy_lookup_sheet(
+    source_path: str | None,
+    wb: openpyxl.Workbook,
+    sheet_name: str,
+    required_headers: set[str] | None = None,
+) -> None:
+    if not source_path:
+        return
+    src = openpyxl.load_workbook(source_path, read_only=True, data_only=False)
+    try:
+        src_ws = None
+        if sheet_name in src.sheetnames:
+            src_ws = src[sheet_name]
+        elif required_headers:
+            for name in src.sheetnames:
+                ws = src[name]
+                ws.reset_dimensions()
+                if required_headers.issubset(_first_row_headers(ws)):
+                    src_ws = ws
+                    break
+        if src_ws is None:
+            src_ws = src[src.sheetnames[0]]
+        # Exporters do not always write a correct <dimension>; read every row and column.
+        src_ws.reset_dimensions()
+        if sheet_name in wb.sheetnames:
+            del wb[sheet_name]
+        _copy_cells(src_ws, wb.create_sheet(sheet_name))
+    finally:
+        src.close()
 
 
 def _reorder_sheets(wb: openpyxl.Workbook) -> None:
@@ -427,9 +448,18 @@ def build_summary_json(
     flagged_count: int,
     avr_sync_count: int,
     site_name: str,
+    avr_match_kinds: dict[str, int] | None = None,
     rule_profile: str | None = None,
     rule_profile_label: str | None = None,
+    rule_engine: str | None = None,
+    rule_engine_parity: dict[str, Any] | None = None,
+    lookup_cache: dict[str, str | None] | None = None,
+    lookup_sources: dict[str, str | None] | None = None,
     month_over_month: dict[str, Any] | None = None,
+    review_history: dict[str, Any] | None = None,
+    what_if: list[dict[str, Any]] | None = None,
+    economy_baselines: dict[str, int] | None = None,
+    performance: dict[str, Any] | None = None,
 ) -> dict[str, Any]:
     review_litres = round(sum(float(row.get("litres") or 0) for row in review_queue), 2)
     return {
@@ -439,11 +469,16 @@ def build_summary_json(
         "review_queue_litres": review_litres,
         "flagged_exception_count": flagged_count,
         "avr_sync_count": avr_sync_count,
+        "avr_match_kinds": avr_match_kinds or {},
         "excluded_non_mining_count": excluded_non_mining,
         "possible_cause_groups": len(possible_causes),
         "summary_asset_count": len(summary_per_asset),
         "rule_profile": rule_profile,
         "rule_profile_label": rule_profile_label,
+        "rule_engine": rule_engine,
+        "rule_engine_parity": rule_engine_parity,
+        "lookup_cache": lookup_cache,
+        "lookup_sources": lookup_sources,
         "possible_causes": possible_causes,
         "summary_per_asset": summary_per_asset[:10],
         "review_sample": [
@@ -454,10 +489,15 @@ def build_summary_json(
                 "review_reason": row.get("review_reason"),
                 "exception_reason": row.get("exception_60"),
                 "suggested_abco_comment": row.get("suggested_abco_comment"),
+                "avr_match_key": row.get("avr_match_key"),
             }
             for row in review_queue[:10]
         ],
         "month_over_month": month_over_month,
+        "review_history": review_history,
+        "what_if": what_if,
+        "economy_baselines": economy_baselines,
+        "performance": performance,
         "has_errors": False,
     }
 
@@ -0,0 +1,250 @@
+"""Per-site review history written by every prep run.
+
+Each run stores its review queue under (site, period) in SQLite. Multi-month questions
+(repeat-offender assets, assets new to review, transactions dropped from review) are then
+answered from indexed rows and set operations instead of reopening prior prepared workbooks.
+Runs also store every mining dispense's litres and usage, from which per-asset 180-day
+average economy baselines are derived when no Asset Info Lookup average is available.
+"""
+from __future__ import annotations
+
+import sqlite3
+from collections import Counter
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any
+
+from economy import ECONOMY_BASELINE_DAYS, MIN_BASELINE_DISPENSES, baseline_economy, is_km_meter
+from enrichment import is_mining_eligible
+from lookup_cache import site_key
+from month_diff import diff_review_queue
+
+DEFAULT_HISTORY_MONTHS = 3
+
+
+def infer_period(transactions: list[dict[str, Any]]) -> str | None:
+    """Most common ``YYYY-MM`` among the workbook's dispense dates."""
+    months = Counter(
+        row["date_time"].strftime("%Y-%m")
+        for row in transactions
+        if isinstance(row.get("date_time"), datetime)
+    )
+    return months.most_common(1)[0][0] if months else None
+
+
+class ReviewHistory:
+    """SQLite-backed review queue history keyed on (site, period, transaction id)."""
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Batch workers record their sites into the same file.
+        self.conn = sqlite3.connect(str(self.path), timeout=30)
+        self.conn.executescript(
+            """
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            CREATE TABLE IF NOT EXISTS runs (
+                site TEXT NOT NULL,
+                period TEXT NOT NULL,
+                source TEXT,
+                review_count INTEGER NOT NULL,
+                recorded_at TEXT NOT NULL,
+                PRIMARY KEY (site, period)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS review_rows (
+                site TEXT NOT NULL,
+                period TEXT NOT NULL,
+                transaction_id TEXT NOT NULL,
+                asset_number TEXT NOT NULL,
+                litres REAL NOT NULL,
+                exception_reason TEXT,
+                PRIMARY KEY (site, period, transaction_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS review_rows_asset ON review_rows (site, asset_number);
+            CREATE TABLE IF NOT EXISTS dispenses (
+                site TEXT NOT NULL,
+                transaction_id TEXT NOT NULL,
+                asset_number TEXT NOT NULL,
+                date_time TEXT NOT NULL,
+                km INTEGER NOT NULL,
+                litres REAL NOT NULL,
+                usage REAL NOT NULL,
+                PRIMARY KEY (site, transaction_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS dispenses_window ON dispenses (site, date_time);
+            """
+        )
+
+    def record_run(
+        self,
+        site: str,
+        period: str,
+        review_queue: list[dict[str, Any]],
+        source: str | None = None,
+    ) -> int:
+        """Store a run's review queue, replacing any earlier run for the same site and period."""
+        rows: dict[str, list[Any]] = {}
+        for row in review_queue:
+            txn_id = str(row.get("transaction_id") or "")
+            if not txn_id:
+                continue
+            litres = float(row.get("litres") or 0)
+            if txn_id in rows:
+                rows[txn_id][4] += litres
+                continue
+            rows[txn_id] = [
+                site_key(site),
+                period,
+                txn_id,
+                str(row.get("asset_number") or "UNKNOWN"),
+                litres,
+                row.get("exception_60") or row.get("exception_120"),
+            ]
+        key = site_key(site)
+        with self.conn:
+            self.conn.execute("DELETE FROM review_rows WHERE site = ? AND period = ?", (key, period))
+            self.conn.executemany(
+                "INSERT INTO review_rows (site, period, transaction_id, asset_number, litres, exception_reason) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows.values(),
+            )
+            self.conn.execute(
+                "INSERT OR REPLACE INTO runs (site, period, source, review_count, recorded_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, period, source, len(rows), datetime.now().isoformat(timespec="seconds")),
+            )
+        return len(rows)
+
+    def record_dispenses(self, site: str, transactions: list[dict[str, Any]]) -> int:
+        """Store litres and usage of dated mining dispenses with positive usage for economy baselines."""
+        key = site_key(site)
+        rows = [
+            (
+                key,
+                str(row.get("transaction_id")),
+                str(row.get("asset_number") or "UNKNOWN"),
+                row["date_time"].isoformat(sep=" "),
+                int(is_km_meter(row.get("meter_type"))),
+                float(row["litres"]),
+                float(row["total_usage_num"]),
+            )
+            for row in transactions
+            if row.get("transaction_id")
+            and is_mining_eligible(row)
+            and isinstance(row.get("date_time"), datetime)
+            and (row.get("litres") or 0) > 0
+            and (row.get("total_usage_num") or 0) > 0
+        ]
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO dispenses (site, transaction_id, asset_number, date_time, km, litres, usage) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+        return len(rows)
+
+    def economy_baselines(
+        self,
+        site: str,
+        before: datetime,
+        days: int = ECONOMY_BASELINE_DAYS,
+    ) -> dict[tuple[str, bool], float]:
+        """Average economy per (asset, km meter) over the ``days`` before ``before``.
+
+        Computed from summed litres and usage like InsightWare's 180-day average; assets with
+        fewer than ``MIN_BASELINE_DISPENSES`` dispenses in the window are left out.
+        """
+        rows = self.conn.execute(
+            "SELECT asset_number, km, SUM(litres), SUM(usage) FROM dispenses "
+            "WHERE site = ? AND date_time >= ? AND date_time < ? "
+            "GROUP BY asset_number, km HAVING COUNT(*) >= ?",
+            (
+                site_key(site),
+                (before - timedelta(days=days)).isoformat(sep=" "),
+                before.isoformat(sep=" "),
+                MIN_BASELINE_DISPENSES,
+            ),
+        ).fetchall()
+        baselines = {}
+        for asset, km, litres, usage in rows:
+            value = baseline_economy(litres, usage, bool(km))
+            if value is not None:
+                baselines[(asset, bool(km))] = value
+        return baselines
+
+    def prior_periods(self, site: str, period: str, months: int = DEFAULT_HISTORY_MONTHS) -> list[str]:
+        """Up to ``months`` recorded periods before ``period``, most recent first."""
+        rows = self.conn.execute(
+            "SELECT period FROM runs WHERE site = ? AND period < ? ORDER BY period DESC LIMIT ?",
+            (site_key(site), period, months),
+        ).fetchall()
+        return [r[0] for r in rows]
+
+    def review_rows(self, site: str, periods: list[str]) -> list[tuple[str, str, str, float]]:
+        """(period, transaction id, asset number, litres) for the given periods."""
+        if not periods:
+            return []
+        marks = ", ".join("?" for _ in periods)
+        return self.conn.execute(
+            f"SELECT period, transaction_id, asset_number, litres FROM review_rows "
+            f"WHERE site = ? AND period IN ({marks})",
+            (site_key(site), *periods),
+        ).fetchall()
+
+    def compare(
+        self,
+        site: str,
+        period: str,
+        review_queue: list[dict[str, Any]],
+        months: int = DEFAULT_HISTORY_MONTHS,
+    ) -> dict[str, Any]:
+        """Diff the review queue against the last ``months`` recorded periods for the site.
+
+        New / repeat / dropped transactions and new assets are measured against everything in
+        review during those periods; repeat offenders are current review assets that were
+        also in review in at least one of them.
+        """
+        periods = self.prior_periods(site, period, months)
+        prior_ids: set[str] = set()
+        asset_periods: dict[str, set[str]] = {}
+        asset_litres: dict[str, float] = {}
+        for prior_period, txn_id, asset, litres in self.review_rows(site, periods):
+            prior_ids.add(txn_id)
+            asset_periods.setdefault(asset, set()).add(prior_period)
+            asset_litres[asset] = asset_litres.get(asset, 0.0) + litres
+
+        current_litres: dict[str, float] = {}
+        for row in review_queue:
+            asset = str(row.get("asset_number") or "UNKNOWN")
+            current_litres[asset] = current_litres.get(asset, 0.0) + float(row.get("litres") or 0)
+        offenders = [
+            {
+                "asset_number": asset,
+                "months_in_review": len(asset_periods[asset]) + 1,
+                "prior_periods": sorted(asset_periods[asset], reverse=True),
+                "current_litres": round(litres, 2),
+                "prior_litres": round(asset_litres[asset], 2),
+            }
+            for asset, litres in current_litres.items()
+            if asset in asset_periods
+        ]
+        offenders.sort(key=lambda o: (-o["months_in_review"], -o["current_litres"], o["asset_number"]))
+
+        return {
+            "period": period,
+            "months": months,
+            "prior_periods": periods,
+            **diff_review_queue(review_queue, prior_ids, set(asset_periods)),
+            "repeat_offender_count": len(offenders),
+            "repeat_offender_assets": offenders[:25],
+        }
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> ReviewHistory:
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
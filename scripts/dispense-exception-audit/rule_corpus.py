@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""Rule-parity regression run over a folder of historic InsightWare exception workbooks.
+
+Every workbook's mining dispenses go through the selected rule engine and ``match_rate``
+compares our 60 / 120-minute reasons with InsightWare's. Mismatches are grouped into
+categories (reason parts we miss / add) across the whole corpus, so a change to
+``compute_flags_for_asset`` or a faster engine can be checked against months of exports.
+
+Workbooks are evaluated in parallel worker processes. With ``--cache`` the rule inputs
+parsed from each workbook are kept in a ``LookupCache`` keyed on file content, so re-runs
+skip the Excel parse.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+if str(SCRIPT_DIR) not in sys.path:
+    sys.path.insert(0, str(SCRIPT_DIR))
+
+from enrichment import is_mining_eligible
+from exception_rules import match_rate
+from lookup_cache import LookupCache, file_digest
+from parse_workbook import load_workbook
+from vectorized_rules import RULE_ENGINES, compute_with_engine
+
+PARSED_DETAILS = "details"
+REASON_COLUMNS = ("exception_60", "exception_120")
+# Parsed fields the rule engines and match_rate read; the rest are not cached.
+RULE_FIELDS = (
+    "transaction_id",
+    "asset_number",
+    "date_time",
+    "litres",
+    "tank_size_l",
+    "meter_type",
+    "opening_odo_num",
+    "closing_odo_num",
+    "total_usage_num",
+    *REASON_COLUMNS,
+)
+EXAMPLES_PER_CATEGORY = 5
+
+
+def find_workbooks(corpus_dir: str | Path) -> list[Path]:
+    """Exception workbooks under ``corpus_dir``, skipping prepared copies and Excel lock files."""
+    return sorted(
+        path
+        for path in Path(corpus_dir).rglob("*.xlsx")
+        if not path.name.startswith("~$") and not path.stem.endswith("-prepared")
+    )
+
+
+def _parse_rule_inputs(path: Path) -> list[dict[str, Any]] | None:
+    parsed = load_workbook(str(path))
+    if not parsed["detection"]["valid"]:
+        return None
+    return [
+        {field: row.get(field) for field in RULE_FIELDS}
+        for row in parsed["transactions"]
+        if is_mining_eligible(row)
+    ]
+
+
+def load_rule_inputs(
+    path: Path, cache_path: str | None
+) -> tuple[list[dict[str, Any]] | None, str | None]:
+    """Mining rule inputs of a workbook (None if not an exception export) and cache ``hit`` / ``miss``."""
+    if not cache_path:
+        return _parse_rule_inputs(path), None
+    digest = file_digest(path)
+    with LookupCache(cache_path) as cache:
+        cached = cache.get(digest, PARSED_DETAILS)
+        if cached is not None:
+            return cached["rows"], "hit"
+        rows = _parse_rule_inputs(path)
+        # Non-exception workbooks are cached too, as None rows, so they are not reopened.
+        cache.put(digest, PARSED_DETAILS, {"rows": rows}, path.name)
+    return rows, "miss"
+
+
+def evaluate_workbook(
+    path: str | Path, rule_engine: str = "row", cache_path: str | None = None
+) -> dict[str, Any]:
+    """``match_rate`` for both reason columns of one workbook; errors are returned, not raised."""
+    path = Path(path)
+    result: dict[str, Any] = {"input": str(path), "cache": None, "skipped": False, "error": None}
+    try:
+        rows, result["cache"] = load_rule_inputs(path, cache_path)
+        if rows is None:
+            # Lookups and other workbooks kept alongside the exports.
+            result["skipped"] = True
+            return result
+        computed = compute_with_engine(rows, rule_engine)
+    except Exception as exc:  # noqa: BLE001 - one bad workbook must not stop the corpus
+        result["error"] = f"{type(exc).__name__}: {exc}"
+        return result
+    result["transaction_count"] = len(rows)
+    for column in REASON_COLUMNS:
+        result[column] = match_rate(rows, computed, column, limit=None)
+    return result
+
+
+def _reason_category(part: str) -> str:
+    # "cumulative litres > tank size ...; 1184.0 l into a 1100 l tank" -> text before the detail.
+    return part.split(";", 1)[0].strip()
+
+
+def mismatch_category(mismatch: dict[str, Any]) -> tuple[tuple[str, ...], tuple[str, ...]]:
+    """(reason parts InsightWare reports that we do not, parts we add) for one mismatch."""
+    return (
+        tuple(sorted({_reason_category(part) for part in mismatch["missing"]})),
+        tuple(sorted({_reason_category(part) for part in mismatch["extra"]})),
+    )
+
+
+def build_corpus_summary(results: list[dict[str, Any]], rule_engine: str) -> dict[str, Any]:
+    """Corpus match rates and mismatch categories per column, plus one row per workbook."""
+    columns: dict[str, dict[str, Any]] = {}
+    for column in REASON_COLUMNS:
+        total = matched = 0
+        categories: dict[tuple[tuple[str, ...], tuple[str, ...]], dict[str, Any]] = {}
+        for result in results:
+            rate = result.get(column)
+            if not rate:
+                continue
+            total += rate["total_flagged"]
+            matched += rate["matched"]
+            for mismatch in rate["mismatches"]:
+                key = mismatch_category(mismatch)
+                bucket = categories.setdefault(
+                    key,
+                    {
+                        "missing": list(key[0]),
+                        "extra": list(key[1]),
+                        "count": 0,
+                        "workbooks": set(),
+                        "examples": [],
+                    },
+                )
+                bucket["count"] += 1
+                bucket["workbooks"].add(result["input"])
+                if len(bucket["examples"]) < EXAMPLES_PER_CATEGORY:
+                    bucket["examples"].append(
+                        {
+                            "input": result["input"],
+                            "transaction_id": mismatch["transaction_id"],
+                            "reported": mismatch["reported"],
+                            "expected": mismatch["expected"],
+                        }
+                    )
+        ranked = sorted(categories.values(), key=lambda b: (-b["count"], b["missing"], b["extra"]))
+        for bucket in ranked:
+            bucket["workbooks"] = len(bucket["workbooks"])
+        columns[column] = {
+            "total_flagged": total,
+            "matched": matched,
+            "match_pct": 100.0 if total == 0 else round(100.0 * matched / total, 2),
+            "mismatch_categories": ranked,
+        }
+
+    workbooks = [
+        {
+            "input": result["input"],
+            "cache": result["cache"],
+            "skipped": result["skipped"],
+            "error": result["error"],
+            "transaction_count": result.get("transaction_count"),
+            **{
+                f"{column}_match_pct": (result.get(column) or {}).get("match_pct")
+                for column in REASON_COLUMNS
+            },
+        }
+        for result in results
+    ]
+    failed = [w for w in workbooks if w["error"]]
+    return {
+        "rule_engine": rule_engine,
+        "workbook_count": len(workbooks),
+        "skipped_count": sum(1 for w in workbooks if w["skipped"]),
+        "failed_count": len(failed),
+        "transaction_count": sum(w["transaction_count"] or 0 for w in workbooks),
+        **columns,
+        "workbooks": workbooks,
+        "has_errors": bool(failed),
+    }
+
+
+def run_corpus(
+    paths: list[Path],
+    rule_engine: str = "row",
+    cache_path: str | None = None,
+    workers: int | None = None,
+) -> dict[str, Any]:
+    """Evaluate every workbook; the summary lists them in ``paths`` order."""
+    if not paths:
+        return build_corpus_summary([], rule_engine)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(paths)))
+    if workers == 1:
+        results = [evaluate_workbook(path, rule_engine, cache_path) for path in paths]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(
+                pool.map(
+                    evaluate_workbook,
+                    paths,
+                    [rule_engine] * len(paths),
+                    [cache_path] * len(paths),
+                )
+            )
+    return build_corpus_summary(results, rule_engine)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Compare computed exception reasons with InsightWare's across a workbook corpus"
+    )
+    parser.add_argument(
+        "--corpus",
+        "-c",
+        required=True,
+        help="Folder of historic exception workbooks (searched recursively)",
+    )
+    parser.add_argument(
+        "--rule-engine",
+        choices=RULE_ENGINES,
+        default="row",
+        help="Exception rule engine (default: row)",
+    )
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--cache", help="SQLite cache of parsed rule inputs keyed on workbook content")
+    parser.add_argument(
+        "--fail-under",
+        type=float,
+        default=None,
+        help="Exit 1 when either column's corpus match %% is below this",
+    )
+    parser.add_argument("--json", "-j", help="Write the corpus summary to this path")
+    args = parser.parse_args(argv)
+
+    paths = find_workbooks(args.corpus)
+    if not paths:
+        print(f"No .xlsx workbooks under {args.corpus}", file=sys.stderr)
+        return 2
+    summary = run_corpus(paths, rule_engine=args.rule_engine, cache_path=args.cache, workers=args.workers)
+    if args.json:
+        Path(args.json).write_text(json.dumps(summary, indent=2, default=str), encoding="utf-8")
+
+    print(
+        f"{summary['workbook_count'] - summary['skipped_count']} workbooks, "
+        f"{summary['transaction_count']} mining transactions ({args.rule_engine} engine)"
+    )
+    below = False
+    for column in REASON_COLUMNS:
+        stats = summary[column]
+        print(f"{column}: {stats['matched']}/{stats['total_flagged']} matched ({stats['match_pct']}%)")
+        for bucket in stats["mismatch_categories"][:10]:
+            missing = ", ".join(bucket["missing"]) or "-"
+            extra = ", ".join(bucket["extra"]) or "-"
+            print(f"  {bucket['count']:>7}  missing: {missing} | extra: {extra} ({bucket['workbooks']} workbooks)")
+        if args.fail_under is not None and stats["match_pct"] < args.fail_under:
+            below = True
+    for workbook in summary["workbooks"]:
+        if workbook["error"]:
+            print(f"FAILED {workbook['input']}: {workbook['error']}", file=sys.stderr)
+    return 1 if below or summary["has_errors"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""Prepare many dispense exception workbooks from one manifest with shared lookups.
+
+Manifest (JSON; relative paths resolve against the manifest's folder)::
+
+    {
+      "asset_lookup": "lookups/asset-info.xlsx",
+      "avr_sync_lookup": "lookups/avr-sync.xlsx",
+      "output_dir": "prepared",
+      "rule_profile": "belfast",
+      "economy_threshold": 0.6,
+      "review_history": "history/reviews.sqlite",
+      "workbooks": [
+        {"input": "belfast-2026-04.xlsx", "site_name": "Belfast", "period": "2026-04"},
+        {"input": "grootegeluk-2026-04.xlsx", "rule_profile": "strict"}
+      ]
+    }
+
+The lookups are parsed once in the parent and handed to each pool worker at start-up.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import as_completed
+from pathlib import Path
+from typing import Any
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+if str(SCRIPT_DIR) not in sys.path:
+    sys.path.insert(0, str(SCRIPT_DIR))
+
+from enrichment import build_avr_match_index, possible_cause_sort_key
+from instrumentation import PhaseTimer
+from lookup_cache import LookupCache, load_lookups
+from parse_workbook import load_workbook, parse_asset_lookup, parse_avr_sync_lookup
+from prepare_workbook import infer_site_name
+from review_history import DEFAULT_HISTORY_MONTHS
+from run_prepare import prepare_one
+from site_rules import get_site_profile
+from vectorized_rules import RULE_ENGINES
+from worker_pool import init_worker, shared_state_pool, worker_state
+
+SITE_TOTAL_FIELDS = (
+    "transaction_count",
+    "review_queue_count",
+    "review_queue_litres",
+    "flagged_exception_count",
+    "avr_sync_count",
+    "excluded_non_mining_count",
+)
+
+
+def load_manifest(path: str | Path) -> dict[str, Any]:
+    """Read the manifest and resolve every path against its folder."""
+    manifest_path = Path(path)
+    base = manifest_path.resolve().parent
+    data = json.loads(manifest_path.read_text(encoding="utf-8"))
+
+    def resolve(value: str | None) -> str | None:
+        return str((base / value).resolve()) if value else None
+
+    workbooks = []
+    for entry in data.get("workbooks") or []:
+        entry = {"input": entry} if isinstance(entry, str) else dict(entry)
+        for key in ("input", "output", "prior_prepared"):
+            entry[key] = resolve(entry.get(key))
+        workbooks.append(entry)
+    if not workbooks:
+        raise ValueError(f"Manifest lists no workbooks: {manifest_path}")
+    return {
+        "asset_lookup": resolve(data.get("asset_lookup")),
+        "avr_sync_lookup": resolve(data.get("avr_sync_lookup")),
+        "output_dir": resolve(data.get("output_dir") or "prepared"),
+        "rule_profile": data.get("rule_profile"),
+        "economy_threshold": float(data.get("economy_threshold", 0.6)),
+        "rule_engine": data.get("rule_engine") or "row",
+        "review_history": resolve(data.get("review_history")),
+        "history_months": int(data.get("history_months", DEFAULT_HISTORY_MONTHS)),
+        "what_if": bool(data.get("what_if", False)),
+        "workbooks": workbooks,
+    }
+
+
+def _prepare_entry(entry: dict[str, Any], defaults: dict[str, Any]) -> dict[str, Any]:
+    """Run one manifest entry against the shared lookups; errors are returned, not raised."""
+    input_path = Path(entry["input"])
+    site_name = entry.get("site_name") or infer_site_name(str(input_path))
+    output_dir = Path(defaults["output_dir"])
+    output_path = Path(entry.get("output") or output_dir / f"{input_path.stem}-prepared.xlsx")
+    json_path = output_path.with_name(f"{output_path.stem}-summary.json")
+    result: dict[str, Any] = {
+        "input": str(input_path),
+        "site_name": site_name,
+        "output": str(output_path),
+        "summary_json": str(json_path),
+        "error": None,
+    }
+    try:
+        if not input_path.exists():
+            raise FileNotFoundError(f"Input not found: {input_path}")
+        shared = worker_state()
+        timer = PhaseTimer()
+        with timer.phase("load_workbook") as phase:
+            parsed = load_workbook(str(input_path))
+            phase["rows"] = len(parsed["transactions"])
+        if not parsed["detection"]["valid"]:
+            missing = ", ".join(parsed["detection"]["missing_sheets"])
+            raise ValueError(f"Invalid workbook: missing {missing}")
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        summary = prepare_one(
+            parsed,
+            input_path=input_path,
+            output_path=output_path,
+            asset_lookup=shared["asset_lookup"],
+            avr_rows=shared["avr_rows"],
+            avr_index=shared["avr_index"],
+            asset_lookup_path=defaults["asset_lookup"],
+            avr_sync_path=defaults["avr_sync_lookup"],
+            site_name=site_name,
+            profile=get_site_profile(entry.get("rule_profile") or defaults["rule_profile"]),
+            economy_threshold=float(entry.get("economy_threshold", defaults["economy_threshold"])),
+            rule_engine=defaults["rule_engine"],
+            prior_prepared=entry.get("prior_prepared"),
+            review_history=defaults["review_history"],
+            history_months=defaults["history_months"],
+            period=entry.get("period"),
+            what_if=defaults["what_if"],
+            timer=timer,
+        )
+    except Exception as exc:  # noqa: BLE001 - one bad workbook must not stop the batch
+        result["error"] = f"{type(exc).__name__}: {exc}"
+        return result
+    json_path.write_text(json.dumps(summary, indent=2), encoding="utf-8")
+    result["summary"] = summary
+    return result
+
+
+def build_batch_summary(results: list[dict[str, Any]]) -> dict[str, Any]:
+    """Per-site rows, cross-site totals and possible causes merged across sites."""
+    sites = []
+    totals = {field: 0 for field in SITE_TOTAL_FIELDS}
+    causes: dict[tuple[str, str], dict[str, Any]] = {}
+    for result in results:
+        summary = result.get("summary") or {}
+        site = {key: result[key] for key in ("site_name", "input", "output", "summary_json", "error")}
+        for field in SITE_TOTAL_FIELDS:
+            site[field] = summary.get(field)
+            totals[field] += summary.get(field) or 0
+        site["rule_profile"] = summary.get("rule_profile")
+        site["seconds"] = (summary.get("performance") or {}).get("total_seconds")
+        sites.append(site)
+        for cause in summary.get("possible_causes") or []:
+            key = (cause["exception_reason"], cause["possible_cause"])
+            bucket = causes.setdefault(
+                key,
+                {
+                    "exception_reason": key[0],
+                    "possible_cause": key[1],
+                    "transaction_count": 0,
+                    "litres": 0.0,
+                    "sites": [],
+                },
+            )
+            bucket["transaction_count"] += cause["transaction_count"]
+            bucket["litres"] += cause["litres"]
+            bucket["sites"].append(result["site_name"])
+    totals["review_queue_litres"] = round(totals["review_queue_litres"], 2)
+    merged = sorted(causes.values(), key=possible_cause_sort_key)
+    for bucket in merged:
+        bucket["litres"] = round(bucket["litres"], 2)
+    failed = [site for site in sites if site["error"]]
+    return {
+        "workbook_count": len(sites),
+        "failed_count": len(failed),
+        "totals": totals,
+        "possible_causes": merged,
+        "sites": sites,
+        "has_errors": bool(failed),
+    }
+
+
+def run_batch(
+    manifest: dict[str, Any],
+    workers: int | None = None,
+    lookup_cache: str | None = None,
+) -> dict[str, Any]:
+    """Prepare every manifest workbook; results keep manifest order whatever finishes first."""
+    if lookup_cache:
+        with LookupCache(lookup_cache) as cache:
+            lookups = load_lookups(cache, manifest["asset_lookup"], manifest["avr_sync_lookup"])
+        shared = {key: lookups[key] for key in ("asset_lookup", "avr_rows", "avr_index")}
+    else:
+        avr_rows = parse_avr_sync_lookup(manifest["avr_sync_lookup"])
+        shared = {
+            "asset_lookup": parse_asset_lookup(manifest["asset_lookup"]),
+            "avr_rows": avr_rows,
+            "avr_index": build_avr_match_index(avr_rows),
+        }
+    defaults = {key: value for key, value in manifest.items() if key != "workbooks"}
+    entries = manifest["workbooks"]
+    workers = max(1, min(workers or os.cpu_count() or 1, len(entries)))
+
+    results: list[dict[str, Any] | None] = [None] * len(entries)
+    if workers == 1:
+        init_worker(shared)
+        for idx, entry in enumerate(entries):
+            results[idx] = _prepare_entry(entry, defaults)
+    else:
+        with shared_state_pool(workers, shared) as pool:
+            futures = {pool.submit(_prepare_entry, entry, defaults): idx for idx, entry in enumerate(entries)}
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+    return build_batch_summary(results)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Prepare several InsightWare dispense exception workbooks from a manifest"
+    )
+    parser.add_argument("--manifest", "-m", required=True, help="Batch manifest .json")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Worker processes (default: CPU count, capped at the workbook count)",
+    )
+    parser.add_argument(
+        "--lookup-cache",
+        help="Optional SQLite cache of parsed asset / AVR lookups (see run_prepare.py)",
+    )
+    parser.add_argument(
+        "--rule-engine",
+        choices=RULE_ENGINES,
+        default=None,
+        help="Override the manifest's exception rule engine",
+    )
+    parser.add_argument(
+        "--json",
+        "-j",
+        help="Consolidated summary path (default: <output_dir>/batch-summary.json)",
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        manifest = load_manifest(args.manifest)
+    except (OSError, ValueError) as exc:
+        print(f"Invalid manifest: {exc}", file=sys.stderr)
+        return 2
+    if args.rule_engine:
+        manifest["rule_engine"] = args.rule_engine
+
+    summary = run_batch(manifest, workers=args.workers, lookup_cache=args.lookup_cache)
+    summary_path = Path(args.json or Path(manifest["output_dir"]) / "batch-summary.json")
+    summary_path.parent.mkdir(parents=True, exist_ok=True)
+    summary_path.write_text(json.dumps(summary, indent=2), encoding="utf-8")
+
+    for site in summary["sites"]:
+        status = f"FAILED {site['error']}" if site["error"] else site["output"]
+        print(f"{site['site_name']}: {status}")
+    print(f"Batch summary written to: {summary_path}")
+    return 1 if summary["has_errors"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
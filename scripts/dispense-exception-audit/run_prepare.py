@@ -3,9 +3,13 @@
 from __future__ import annotations
 
 import argparse
+import cProfile
 import json
+import pstats
 import sys
+from datetime import datetime
 from pathlib import Path
+from typing import Any
 
 SCRIPT_DIR = Path(__file__).resolve().parent
 if str(SCRIPT_DIR) not in sys.path:
@@ -15,11 +19,137 @@ from enrichment import (
     build_possible_cause_summary,
     build_summary_per_asset,
     enrich_transactions,
+    is_mining_eligible,
 )
+from instrumentation import PhaseTimer
+from lookup_cache import ASSET_LOOKUP, AVR_SYNC, LookupCache, load_lookups
 from month_diff import compare_month_over_month
 from parse_workbook import load_workbook, parse_asset_lookup, parse_avr_sync_lookup
 from prepare_workbook import build_summary_json, infer_site_name, write_prepared_workbook
-from site_rules import get_site_profile, list_site_profiles
+from review_history import DEFAULT_HISTORY_MONTHS, ReviewHistory, infer_period
+from site_rules import SiteRuleProfile, get_site_profile, list_site_profiles, load_site_profiles
+from vectorized_rules import RULE_ENGINES, rule_engine_parity
+
+PROFILE_TOP_FUNCTIONS = 30
+
+
+def prepare_one(
+    parsed: dict[str, Any],
+    *,
+    input_path: Path,
+    output_path: Path,
+    asset_lookup: dict[str, dict[str, Any]],
+    avr_rows: list[dict[str, Any]],
+    avr_index: dict[Any, set[str]] | None,
+    asset_lookup_path: str | None,
+    avr_sync_path: str | None,
+    site_name: str,
+    profile: SiteRuleProfile,
+    economy_threshold: float,
+    rule_engine: str = "row",
+    rule_parity: bool = False,
+    prior_prepared: str | None = None,
+    lookup_cache_status: dict[str, str | None] | None = None,
+    review_history: str | None = None,
+    history_months: int = DEFAULT_HISTORY_MONTHS,
+    period: str | None = None,
+    what_if: bool = False,
+    timer: PhaseTimer | None = None,
+    enrich_workers: int | None = None,
+) -> dict[str, Any]:
+    """Enrich one loaded workbook, write the prepared copy and return its summary JSON.
+
+    Phases are timed on ``timer`` (pass the one that already timed loading the inputs).
+    """
+    timer = timer or PhaseTimer()
+    source_rows = len(parsed["transactions"])
+    parity = None
+    if rule_parity:
+        # Before enrichment, which rewrites the workbook exception columns.
+        with timer.phase("rule_engine_parity", rows=source_rows):
+            parity = rule_engine_parity(
+                [t for t in parsed["transactions"] if is_mining_eligible(t)]
+            )
+
+    baselines = None
+    if review_history:
+        dates = [t["date_time"] for t in parsed["transactions"] if isinstance(t.get("date_time"), datetime)]
+        if dates:
+            with timer.phase("economy_baselines") as phase, ReviewHistory(review_history) as store:
+                baselines = store.economy_baselines(site_name, min(dates))
+                phase["rows"] = len(baselines)
+
+    with timer.phase("enrich_transactions", rows=source_rows):
+        enriched = enrich_transactions(
+            parsed["transactions"],
+            asset_lookup,
+            avr_rows,
+            economy_threshold=economy_threshold,
+            profile=profile,
+            rule_engine=rule_engine,
+            avr_index=avr_index,
+            what_if_profiles=load_site_profiles() if what_if else None,
+            economy_baselines=baselines,
+            workers=enrich_workers,
+        )
+
+    transactions = enriched["transactions"]
+    review_queue = enriched["review_queue"]
+    with timer.phase("review_summaries", rows=len(review_queue)):
+        possible_causes = build_possible_cause_summary(review_queue)
+        summary_per_asset = build_summary_per_asset(review_queue)
+    month_over_month = None
+    if prior_prepared:
+        with timer.phase("compare_month_over_month", rows=len(review_queue)):
+            month_over_month = compare_month_over_month(review_queue, prior_prepared)
+    history = None
+    period = period or (infer_period(parsed["transactions"]) if review_history else None)
+    if review_history and period:
+        with timer.phase("review_history", rows=len(transactions)), ReviewHistory(review_history) as store:
+            history = store.compare(site_name, period, review_queue, months=history_months)
+            store.record_run(site_name, period, review_queue, source=input_path.name)
+            store.record_dispenses(site_name, transactions)
+
+    with timer.phase("write_prepared_workbook", rows=len(transactions) + len(review_queue)):
+        write_prepared_workbook(
+            input_path=str(input_path),
+            output_path=str(output_path),
+            transactions=transactions,
+            review_queue=review_queue,
+            possible_causes=possible_causes,
+            summary_per_asset=summary_per_asset,
+            excluded_non_mining_rows=enriched["excluded_non_mining_rows"],
+            asset_lookup_path=asset_lookup_path,
+            avr_sync_path=avr_sync_path,
+            site_name=site_name,
+        )
+
+    return build_summary_json(
+        transactions=transactions,
+        review_queue=review_queue,
+        possible_causes=possible_causes,
+        summary_per_asset=summary_per_asset,
+        excluded_non_mining=enriched["excluded_non_mining"],
+        flagged_count=enriched["flagged_count"],
+        avr_sync_count=enriched["avr_sync_count"],
+        site_name=site_name,
+        avr_match_kinds=enriched.get("avr_match_kinds"),
+        rule_profile=enriched.get("rule_profile"),
+        rule_profile_label=enriched.get("rule_profile_label"),
+        rule_engine=enriched.get("rule_engine"),
+        rule_engine_parity=parity,
+        lookup_cache=lookup_cache_status,
+        # Workbooks the lookup sheets were copied from (None: sheet left out).
+        lookup_sources={
+            ASSET_LOOKUP: Path(asset_lookup_path).name if asset_lookup_path else None,
+            AVR_SYNC: Path(avr_sync_path).name if avr_sync_path else None,
+        },
+        month_over_month=month_over_month,
+        review_history=history,
+        what_if=enriched.get("what_if"),
+        economy_baselines=enriched.get("economy_baselines"),
+        performance=timer.report(),
+    )
 
 
 def main(argv: list[str] | None = None) -> int:
@@ -41,15 +171,44 @@ def main(argv: list[str] | None = None) -> int:
         "--avr-sync-lookup",
         help="Optional AVR Sync Lookup .xlsx",
     )
+    parser.add_argument(
+        "--lookup-cache",
+        help="SQLite cache of parsed asset / AVR lookups keyed on file content; "
+        "without an upload, the site's pinned lookup is used",
+    )
+    parser.add_argument(
+        "--pin-lookups",
+        action="store_true",
+        help="Pin this run's uploaded lookups as the site's current ones in --lookup-cache",
+    )
     parser.add_argument(
         "--prior-prepared",
         help="Optional prior-month prepared workbook for month-over-month diff",
     )
+    parser.add_argument(
+        "--review-history",
+        help="SQLite review history; this run is recorded and compared with the site's prior months",
+    )
+    parser.add_argument(
+        "--history-months",
+        type=int,
+        default=DEFAULT_HISTORY_MONTHS,
+        help=f"Prior months compared from --review-history (default: {DEFAULT_HISTORY_MONTHS})",
+    )
+    parser.add_argument(
+        "--period",
+        help="Review period YYYY-MM for --review-history (default: most common dispense month)",
+    )
     parser.add_argument(
         "--rule-profile",
         default=None,
         help="Site rule profile key (default from site_rules.json)",
     )
+    parser.add_argument(
+        "--what-if",
+        action="store_true",
+        help="Also evaluate every profile in site_rules.json and report review-queue diffs per profile",
+    )
     parser.add_argument(
         "--list-rule-profiles",
         action="store_true",
@@ -61,74 +220,120 @@ def main(argv: list[str] | None = None) -> int:
         default=0.6,
         help="Abs variance threshold when economy escalation is enabled (0.6 = 60%%)",
     )
+    parser.add_argument(
+        "--rule-engine",
+        choices=RULE_ENGINES,
+        default="row",
+        help="Exception rule engine: per-row loop or column-wise (default: row)",
+    )
+    parser.add_argument(
+        "--enrich-workers",
+        type=int,
+        default=None,
+        help="Enrich in this many worker processes, each taking whole assets (default: in-process)",
+    )
+    parser.add_argument(
+        "--rule-parity",
+        action="store_true",
+        help="Also run both rule engines and report flag / match-rate parity in the summary",
+    )
     parser.add_argument(
         "--site-name",
         help="Site title for summary sheets (default: inferred from filename)",
     )
+    parser.add_argument(
+        "--profile",
+        metavar="STATS_PATH",
+        help="Run under cProfile: dump stats to this path and print the top functions to stderr",
+    )
     args = parser.parse_args(argv)
 
     if args.list_rule_profiles:
         print(json.dumps(list_site_profiles(), indent=2))
         return 0
 
+    if not args.profile:
+        return _run(args)
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(_run, args)
+    finally:
+        profiler.dump_stats(args.profile)
+        pstats.Stats(profiler, stream=sys.stderr).sort_stats("cumulative").print_stats(PROFILE_TOP_FUNCTIONS)
+        print(f"cProfile stats written to: {args.profile}", file=sys.stderr)
+
+
+def _run(args: argparse.Namespace) -> int:
     input_path = Path(args.input)
     if not input_path.exists():
         print(f"Input not found: {input_path}", file=sys.stderr)
         return 2
 
-    parsed = load_workbook(str(input_path))
+    timer = PhaseTimer()
+    with timer.phase("load_workbook") as phase:
+        parsed = load_workbook(str(input_path))
+        phase["rows"] = len(parsed["transactions"])
     if not parsed["detection"]["valid"]:
         missing = ", ".join(parsed["detection"]["missing_sheets"])
         print(f"Invalid workbook: missing {missing}", file=sys.stderr)
         return 2
 
-    asset_lookup = parse_asset_lookup(args.asset_lookup)
-    avr_rows = parse_avr_sync_lookup(args.avr_sync_lookup)
-    profile = get_site_profile(args.rule_profile)
-
-    enriched = enrich_transactions(
-        parsed["transactions"],
-        asset_lookup,
-        avr_rows,
-        economy_threshold=args.economy_threshold,
-        profile=profile,
-    )
-
-    transactions = enriched["transactions"]
-    review_queue = enriched["review_queue"]
-    possible_causes = build_possible_cause_summary(review_queue)
-    summary_per_asset = build_summary_per_asset(review_queue)
     site_name = args.site_name or infer_site_name(str(input_path))
-    month_over_month = compare_month_over_month(review_queue, args.prior_prepared)
+    avr_index = None
+    lookup_cache_status = None
+    asset_lookup_path, avr_sync_path = args.asset_lookup, args.avr_sync_lookup
+    if args.lookup_cache:
+        with timer.phase("load_lookups") as phase, LookupCache(args.lookup_cache) as cache:
+            lookups = load_lookups(
+                cache, args.asset_lookup, args.avr_sync_lookup, site=site_name, pin=args.pin_lookups
+            )
+            phase["rows"] = len(lookups["asset_lookup"]) + len(lookups["avr_rows"])
+        asset_lookup = lookups["asset_lookup"]
+        avr_rows = lookups["avr_rows"]
+        avr_index = lookups["avr_index"]
+        lookup_cache_status = lookups["status"]
+        asset_lookup_path = lookups["sources"][ASSET_LOOKUP]
+        avr_sync_path = lookups["sources"][AVR_SYNC]
+        for kind, status in lookup_cache_status.items():
+            if status == "pinned" and not lookups["sources"][kind]:
+                print(
+                    f"Note: pinned {kind} workbook is missing or changed; its sheet is left out "
+                    "of the prepared workbook",
+                    file=sys.stderr,
+                )
+    else:
+        with timer.phase("parse_asset_lookup") as phase:
+            asset_lookup = parse_asset_lookup(args.asset_lookup)
+            phase["rows"] = len(asset_lookup)
+        with timer.phase("parse_avr_sync_lookup") as phase:
+            avr_rows = parse_avr_sync_lookup(args.avr_sync_lookup)
+            phase["rows"] = len(avr_rows)
 
     output_path = Path(
         args.output or str(input_path).replace(".xlsx", "-prepared.xlsx")
     )
-    write_prepared_workbook(
-        input_path=str(input_path),
-        output_path=str(output_path),
-        transactions=transactions,
-        review_queue=review_queue,
-        possible_causes=possible_causes,
-        summary_per_asset=summary_per_asset,
-        excluded_non_mining_rows=enriched["excluded_non_mining_rows"],
-        asset_lookup_path=args.asset_lookup,
-        avr_sync_path=args.avr_sync_lookup,
-        site_name=site_name,
-    )
-
-    summary = build_summary_json(
-        transactions=transactions,
-        review_queue=review_queue,
-        possible_causes=possible_causes,
-        summary_per_asset=summary_per_asset,
-        excluded_non_mining=enriched["excluded_non_mining"],
-        flagged_count=enriched["flagged_count"],
-        avr_sync_count=enriched["avr_sync_count"],
+    summary = prepare_one(
+        parsed,
+        input_path=input_path,
+        output_path=output_path,
+        asset_lookup=asset_lookup,
+        avr_rows=avr_rows,
+        avr_index=avr_index,
+        asset_lookup_path=asset_lookup_path,
+        avr_sync_path=avr_sync_path,
         site_name=site_name,
-        rule_profile=enriched.get("rule_profile"),
-        rule_profile_label=enriched.get("rule_profile_label"),
-        month_over_month=month_over_month,
+        profile=get_site_profile(args.rule_profile),
+        economy_threshold=args.economy_threshold,
+        rule_engine=args.rule_engine,
+        rule_parity=args.rule_parity,
+        prior_prepared=args.prior_prepared,
+        lookup_cache_status=lookup_cache_status,
+        review_history=args.review_history,
+        history_months=args.history_months,
+        period=args.period,
+        what_if=args.what_if,
+        timer=timer,
+        enrich_workers=args.enrich_workers,
     )
 
     if args.json:
@@ -52,6 +52,12 @@ def get_site_profile(profile_key: str | None = None, rules_path: str | None = No
     return SiteRuleProfile.from_dict(key, profiles.get(key, {}))
 
 
+def load_site_profiles(rules_path: str | None = None) -> list[SiteRuleProfile]:
+    """Every configured profile, in site_rules.json order."""
+    profiles = load_site_rules(rules_path).get("profiles") or {}
+    return [SiteRuleProfile.from_dict(key, value) for key, value in profiles.items()]
+
+
 def list_site_profiles(rules_path: str | None = None) -> list[dict[str, str]]:
     data = load_site_rules(rules_path)
     profiles = data.get("profiles") or {}
@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""Synthetic InsightWare exception exports for scale tests and the prep benchmark.
+
+Writes a "Details as Assets" workbook in the in-context layout (column-header row, then per
+asset a banner row, a repeated sub-header and the asset's dispenses) plus a matching Asset
+Info Lookup and AVR Sync Lookup. Dispenses include bowser-style split-fill chains (5 minutes
+apart, odo not advancing), non-mining assets and a share of transactions present in AVR
+Sync. Exception reasons are filled from ``compute_all`` the way InsightWare fills them, so
+the export agrees with our own rules. ``build_chain_transactions`` and
+``build_exception_export`` build parsed rows only, for the rule and enrichment benchmarks
+and tests.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any
+
+import openpyxl
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+if str(SCRIPT_DIR) not in sys.path:
+    sys.path.insert(0, str(SCRIPT_DIR))
+
+from exception_rules import REASON_CONSEC_60, REASON_FILL_OUTSIDE, REASON_ODO_GT_50, REASON_ODO_NON_POS, compute_all
+
+DETAILS_SHEET = "Details as Assets"
+
+# InsightWare column titles and the parse_workbook field each one maps to.
+DETAILS_COLUMNS = [
+    ("Date & Time", "date_time"),
+    ("Transaction ID", "transaction_id"),
+    ("Asset Description", "asset_description"),
+    ("Asset Number", "asset_number"),
+    ("Asset Tag", "asset_tag"),
+    ("Asset Group", "asset_group"),
+    ("Asset Tank Size (L)", "tank_size_l"),
+    ("Asset Meter Type (Hr/Km)", "meter_type"),
+    ("Storage Tank", "storage_tank"),
+    ("Fuel Pump", "fuel_pump"),
+    ("Litres", "litres"),
+    ("Opening Odo", "opening_odo"),
+    ("Closing Odo", "closing_odo"),
+    ("Total Usage Km/Hr", "total_usage"),
+    ("Exception Reason (120 mins)", "exception_120"),
+    ("Exception Reason (60 mins)", "exception_60"),
+    ("Abco Comment", "abco_comment"),
+    ("Operation Description / Comment", "operation_comment"),
+    ("Refund Eligibility", "refund_eligibility"),
+    ("Operator", "operator"),
+    ("Average Economy (180 Days)", "avg_economy_180d"),
+    ("Economy", "economy"),
+    ("% Variance", "pct_variance"),
+    ("Department", "department"),
+]
+EXCEPTION_FIELDS = {"exception_120", "exception_60"}
+
+# (asset prefix, description, meter, tank litres, litres per dispense, economy L/hr or km/L)
+FLEET = [
+    ("DT", "Dump Truck", "Hr", 1100.0, (250.0, 700.0), 38.0),
+    ("EX", "Excavator", "Hr", 1500.0, (300.0, 900.0), 55.0),
+    ("DZ", "Dozer", "Hr", 800.0, (200.0, 500.0), 30.0),
+    ("WB", "Water Bowser", "Km", 600.0, (120.0, 400.0), 2.2),
+    ("LDV", "Light Delivery Vehicle", "Km", 80.0, (30.0, 75.0), 9.0),
+]
+DEPARTMENTS = ["Load & Haul", "Drill & Blast", "Engineering", "Services"]
+STORAGE_TANKS = ["Main Diesel Tank", "Pit Satellite Tank"]
+FUEL_PUMPS = ["Pump 1", "Pump 2", "Bowser Pump"]
+# Minutes between a mining asset's ordinary dispenses.
+DISPENSE_GAPS = [45, 90, 240, 480, 720, 1440]
+SPLIT_FILL_GAP_MINUTES = 5
+
+
+def build_synthetic_transactions(
+    assets: int = 200,
+    dispenses_per_asset: int = 50,
+    *,
+    split_fill_rate: float = 0.05,
+    chain_length: int = 4,
+    non_mining_rate: float = 0.05,
+    start: datetime = datetime(2026, 5, 1, 6, 0),
+    seed: int = 7,
+) -> list[dict[str, Any]]:
+    """Parsed-record dicts for the export, grouped by asset and in date order within each.
+
+    ``split_fill_rate`` is the chance that a dispense starts a split-fill chain of
+    ``chain_length`` dispenses; chain members count towards ``dispenses_per_asset``.
+    """
+    rng = random.Random(seed)
+    rows: list[dict[str, Any]] = []
+    serial = 100_000
+    for a in range(assets):
+        prefix, description, meter, tank, litres_range, economy = FLEET[a % len(FLEET)]
+        asset = f"{prefix}{a:04d}"
+        non_mining = rng.random() < non_mining_rate
+        asset_info = {
+            "asset_description": f"{description} {a:04d}",
+            "asset_number": asset,
+            "asset_tag": f"TAG{700_000 + a}",
+            "asset_group": "Non Mining" if non_mining else "Mining- Eligible",
+            "tank_size_l": tank,
+            "meter_type": meter,
+            "refund_eligibility": "Non-Eligible" if non_mining else "Eligible",
+            "department": DEPARTMENTS[a % len(DEPARTMENTS)],
+        }
+        clock = start + timedelta(minutes=rng.randrange(0, 600))
+        odo = float(rng.randrange(1_000, 20_000))
+        chain_left = 0
+        for _ in range(dispenses_per_asset):
+            if chain_left:
+                chain_left -= 1
+                clock += timedelta(minutes=SPLIT_FILL_GAP_MINUTES)
+                litres = round(rng.uniform(20.0, tank / chain_length), 1)
+                usage = 0.0
+            else:
+                clock += timedelta(minutes=rng.choice(DISPENSE_GAPS))
+                litres = round(rng.uniform(*litres_range), 1)
+                if meter == "Km":
+                    usage = round(litres * economy * rng.uniform(0.7, 1.3), 1)
+                else:
+                    usage = round(litres / economy * rng.uniform(0.7, 1.3), 1)
+                if rng.random() < split_fill_rate:
+                    chain_left = chain_length - 1
+            opening = odo
+            odo += usage
+            serial += 1
+            rows.append(
+                {
+                    **asset_info,
+                    "date_time": clock,
+                    "transaction_id": f"59-{clock:%Y%m%d}-{serial}",
+                    "storage_tank": rng.choice(STORAGE_TANKS),
+                    "fuel_pump": rng.choice(FUEL_PUMPS),
+                    "litres": litres,
+                    "opening_odo": opening,
+                    "closing_odo": odo,
+                    "total_usage": usage,
+                    "opening_odo_num": opening,
+                    "closing_odo_num": odo,
+                    "total_usage_num": usage,
+                    "exception_120": None,
+                    "exception_60": None,
+                    "abco_comment": "Just OK" if rng.random() < 0.02 else None,
+                    "operation_comment": None,
+                    "operator": f"OP{rng.randrange(1, 60):03d}",
+                    "avg_economy_180d": economy,
+                    "economy": None,
+                    "pct_variance": None,
+                }
+            )
+
+    computed = compute_all(rows)
+    for row in rows:
+        comp = computed.get(row["transaction_id"])
+        if comp:
+            row["exception_60"] = comp.flags.reason_60()
+            row["exception_120"] = comp.flags.reason_120()
+    return rows
+
+
+EXPORT_EXCEPTIONS = [
+    None,
+    None,
+    REASON_ODO_NON_POS,
+    f"{REASON_ODO_NON_POS}, {REASON_CONSEC_60}",
+    f"{REASON_ODO_NON_POS}, {REASON_CONSEC_60}",
+    "Fill outside of 1 hour from start",
+    f"{REASON_FILL_OUTSIDE}, {REASON_CONSEC_60}",
+    REASON_ODO_GT_50,
+    REASON_CONSEC_60,
+]
+
+
+def build_chain_transactions(assets: int, chain_length: int) -> list[dict[str, Any]]:
+    """Bowser-style chains: every dispense 5 minutes after the last, odo never advancing."""
+    start = datetime(2026, 5, 1, 6, 0)
+    rows: list[dict[str, Any]] = []
+    for a in range(assets):
+        asset = f"BWS{a:03d}"
+        for k in range(chain_length):
+            rows.append(
+                {
+                    "transaction_id": f"{asset}-{k}",
+                    "asset_number": asset,
+                    "date_time": start + timedelta(minutes=5 * k),
+                    "litres": 40.0 + (k % 7),
+                    "tank_size_l": 1000.0,
+                    "meter_type": "hr",
+                    "opening_odo_num": 1200.0,
+                    "closing_odo_num": 1200.0,
+                    "total_usage_num": 0.0,
+                }
+            )
+    return rows
+
+
+def build_exception_export(transactions: int, assets: int = 400, seed: int = 7) -> list[dict[str, Any]]:
+    """Exception-export-like rows: mixed InsightWare reason strings, comments and meters."""
+    rng = random.Random(seed)
+    start = datetime(2026, 5, 1, 6, 0)
+    clocks = [start] * assets
+    rows: list[dict[str, Any]] = []
+    for k in range(transactions):
+        a = rng.randrange(assets)
+        clocks[a] += timedelta(minutes=rng.choice([5, 20, 45, 70, 180, 600]))
+        opening = rng.choice([0.0, 1200.0, 1200.0])
+        rows.append(
+            {
+                "transaction_id": f"59-20260501-{a}-{k}",
+                "asset_number": f"EX{a:04d}",
+                "date_time": clocks[a],
+                "litres": round(rng.uniform(20, 400), 1),
+                "tank_size_l": 800.0,
+                "meter_type": rng.choice(["hr", "km"]),
+                "opening_odo_num": opening,
+                "closing_odo_num": opening + rng.choice([0.0, 0.0, 4.0, 60.0]),
+                "exception_60": rng.choice(EXPORT_EXCEPTIONS),
+                "abco_comment": rng.choice([None, None, None, "Just OK", "Checked"]),
+                "refund_eligibility": "Eligible",
+            }
+        )
+    return rows
+
+
+def write_details_workbook(path: str | Path, transactions: list[dict[str, Any]]) -> dict[str, int]:
+    """Write the in-context layout; asset sub-headers leave the exception titles blank.
+
+    Returns row counts of the written sheet (banners, column headers, transactions).
+    """
+    titles = [title for title, _ in DETAILS_COLUMNS]
+    sub_header = [None if field in EXCEPTION_FIELDS else title for title, field in DETAILS_COLUMNS]
+    fields = [field for _, field in DETAILS_COLUMNS]
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet(DETAILS_SHEET)
+    ws.append(titles)
+    counts = {"banners": 0, "column_headers": 1, "transactions": 0}
+    current = None
+    for row in transactions:
+        if row["asset_number"] != current:
+            current = row["asset_number"]
+            ws.append([current])
+            ws.append(sub_header)
+            counts["banners"] += 1
+            counts["column_headers"] += 1
+        ws.append([row.get(field) for field in fields])
+        counts["transactions"] += 1
+    wb.save(str(path))
+    return counts
+
+
+def write_asset_lookup(path: str | Path, transactions: list[dict[str, Any]]) -> int:
+    """Asset Info Lookup workbook with one row per asset in the export."""
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("Asset Info Lookup")
+    ws.append(
+        ["Asset Number", "Asset Group", "Asset Tag", "Odometer Type", "Tank Size", "Average Economy", "Department"]
+    )
+    seen: set[str] = set()
+    for row in transactions:
+        if row["asset_number"] in seen:
+            continue
+        seen.add(row["asset_number"])
+        ws.append(
+            [
+                row["asset_number"],
+                row["asset_group"],
+                row["asset_tag"],
+                row["meter_type"],
+                row["tank_size_l"],
+                row["avg_economy_180d"],
+                row["department"],
+            ]
+        )
+    wb.save(str(path))
+    return len(seen)
+
+
+def write_avr_sync_lookup(
+    path: str | Path,
+    transactions: list[dict[str, Any]],
+    *,
+    avr_rate: float = 0.02,
+    seed: int = 7,
+) -> int:
+    """AVR Sync export whose Trans # matches ``avr_rate`` of the transactions."""
+    rng = random.Random(seed)
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("AVR Sync")
+    ws.append(["ID", "Trans #", "Code", "Date", "PAN"])
+    count = 0
+    for row in transactions:
+        if rng.random() >= avr_rate:
+            continue
+        count += 1
+        trans_num = int(row["transaction_id"].rsplit("-", 1)[1])
+        ws.append([900_000 + count, trans_num, row["asset_number"], row["date_time"], None])
+    wb.save(str(path))
+    return count
+
+
+def generate_synthetic_export(
+    output_dir: str | Path,
+    *,
+    assets: int = 200,
+    dispenses_per_asset: int = 50,
+    split_fill_rate: float = 0.05,
+    chain_length: int = 4,
+    non_mining_rate: float = 0.05,
+    avr_rate: float = 0.02,
+    seed: int = 7,
+) -> dict[str, Any]:
+    """Write the export and both lookups to ``output_dir``; returns their paths and counts."""
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    transactions = build_synthetic_transactions(
+        assets,
+        dispenses_per_asset,
+        split_fill_rate=split_fill_rate,
+        chain_length=chain_length,
+        non_mining_rate=non_mining_rate,
+        seed=seed,
+    )
+    stem = f"synthetic-{assets}x{dispenses_per_asset}"
+    paths = {
+        "input": output_dir / f"{stem}.xlsx",
+        "asset_lookup": output_dir / f"{stem}-asset-info.xlsx",
+        "avr_sync_lookup": output_dir / f"{stem}-avr-sync.xlsx",
+    }
+    layout = write_details_workbook(paths["input"], transactions)
+    return {
+        **{key: str(path) for key, path in paths.items()},
+        **layout,
+        "assets": write_asset_lookup(paths["asset_lookup"], transactions),
+        "avr_sync_rows": write_avr_sync_lookup(
+            paths["avr_sync_lookup"], transactions, avr_rate=avr_rate, seed=seed
+        ),
+        "split_fill_rows": sum(1 for row in transactions if row["total_usage_num"] == 0),
+        "flagged_exception_rows": sum(1 for row in transactions if row["exception_60"]),
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Write a synthetic InsightWare exception export")
+    parser.add_argument("--output-dir", "-o", required=True, help="Folder for the export and lookups")
+    parser.add_argument("--assets", type=int, default=200, help="Assets (default 200)")
+    parser.add_argument("--dispenses-per-asset", type=int, default=50, help="Dispenses per asset (default 50)")
+    parser.add_argument("--split-fill-rate", type=float, default=0.05, help="Chance a dispense starts a split fill")
+    parser.add_argument("--chain-length", type=int, default=4, help="Dispenses per split-fill chain (default 4)")
+    parser.add_argument("--non-mining-rate", type=float, default=0.05, help="Share of non-mining assets")
+    parser.add_argument("--avr-rate", type=float, default=0.02, help="Share of transactions in AVR Sync")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args(argv)
+
+    result = generate_synthetic_export(
+        args.output_dir,
+        assets=args.assets,
+        dispenses_per_asset=args.dispenses_per_asset,
+        split_fill_rate=args.split_fill_rate,
+        chain_length=args.chain_length,
+        non_mining_rate=args.non_mining_rate,
+        avr_rate=args.avr_rate,
+        seed=args.seed,
+    )
+    print(json.dumps(result, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
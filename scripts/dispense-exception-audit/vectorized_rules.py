@@ -0,0 +1,225 @@
+"""Column-wise exception rule engine (same RuleFlags as exception_rules.compute_all)."""
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+from exception_rules import (
+    REASON_CONSEC_60,
+    REASON_ODO_NON_POS,
+    ComputedTransaction,
+    RuleFlags,
+    compute_all,
+    match_rate,
+)
+
+RULE_ENGINES = ("row", "vectorized")
+
+
+def _float_or_nan(values: list[Any]) -> np.ndarray:
+    return np.array([np.nan if v is None else float(v) for v in values], dtype=float)
+
+
+def _minutes(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """``abs(b - a)`` in minutes for datetime64[us] arrays; NaN where either side is missing."""
+    out = np.abs((b - a).astype("int64").astype(float)) / 1e6 / 60.0
+    out[np.isnat(a) | np.isnat(b)] = np.nan
+    return out
+
+
+def _batch_cumsum(values: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """Running total restarting at each batch start, added left to right like ``sum()``."""
+    out = values.copy()
+    bounds = np.append(starts, len(values))
+    for start, end in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+        if end - start > 1:
+            out[start:end] = np.cumsum(values[start:end])
+    return out
+
+
+def _optional(values: np.ndarray) -> list[float | None]:
+    return [None if np.isnan(v) else v for v in values.tolist()]
+
+
+def compute_all_vectorized(transactions: list[dict[str, Any]]) -> dict[str, ComputedTransaction]:
+    """Sort once by (asset, datetime) and evaluate every rule with shifts and group ids.
+
+    Produces the same ``ComputedTransaction`` values as ``compute_all``: rows are ordered
+    by asset (first appearance), then ``date_time`` (missing first), then input order.
+    """
+    if not transactions:
+        return {}
+    n = len(transactions)
+    (
+        asset_raw, dt_raw, opening_raw, closing_raw, usage_raw, meter_raw, litres_raw, tank_raw, txn_raw,
+    ) = (
+        np.array(column, dtype=object)
+        for column in zip(
+            *[
+                (
+                    r.get("asset_number"),
+                    r.get("date_time"),
+                    r.get("opening_odo_num"),
+                    r.get("closing_odo_num"),
+                    r.get("total_usage_num"),
+                    r.get("meter_type"),
+                    r.get("litres"),
+                    r.get("tank_size_l"),
+                    r.get("transaction_id"),
+                )
+                for r in transactions
+            ]
+        )
+    )
+    assets, _ = pd.factorize(
+        pd.Series([str(a or "UNKNOWN") for a in asset_raw.tolist()], dtype=object)
+    )
+    dt_all = pd.to_datetime(
+        pd.Series([d if isinstance(d, datetime) else None for d in dt_raw.tolist()], dtype=object)
+    ).to_numpy(dtype="datetime64[us]")
+    order = np.lexsort((np.arange(n), dt_all.view("int64"), assets))
+    dt = dt_all[order]
+    group = assets[order]
+    dt_raw, asset_raw, txn_raw = dt_raw[order], asset_raw[order], txn_raw[order]
+
+    has_prev = np.ones(n, dtype=bool)
+    has_prev[0] = False
+    has_prev[1:] = group[1:] == group[:-1]
+    has_next = np.zeros(n, dtype=bool)
+    has_next[:-1] = has_prev[1:]
+
+    prev_dt = np.concatenate((np.array(["NaT"], dtype="datetime64[us]"), dt[:-1]))
+    next_dt = np.concatenate((dt[1:], np.array(["NaT"], dtype="datetime64[us]")))
+    since_prev = np.where(has_prev, _minutes(prev_dt, dt), np.nan)
+    to_next = np.where(has_next, _minutes(dt, next_dt), np.nan)
+
+    opening = _float_or_nan(opening_raw[order])
+    closing = _float_or_nan(closing_raw[order])
+    usage_raw = usage_raw[order]
+    total_usage = _float_or_nan(usage_raw)
+    usage = np.where(usage_raw != None, total_usage, closing - opening)  # noqa: E711
+    meter = pd.Series([str(m or "").lower() for m in meter_raw[order].tolist()], dtype=object)
+    hour_meter = (meter.str.contains("hr", regex=False) | (meter == "")).to_numpy(dtype=bool)
+
+    initial_dispense = opening == 0
+    odo_gt_50 = (usage > 50) & hour_meter
+    odo_non_positive = usage <= 0
+    meter_reset = ((opening > 0) & (closing == 0)) | (usage < -50)
+
+    consec_120 = since_prev <= 120
+    consec_60_base = since_prev <= 60
+    consec_60 = consec_60_base.copy()
+
+    # A batch starts on every row that is not within 60 minutes of the previous one.
+    batch_starts = np.flatnonzero(~consec_60_base)
+    batch_start = batch_starts[np.cumsum(~consec_60_base) - 1]
+    since_batch = _minutes(dt[batch_start], dt)
+
+    # Simultaneous follow-up dispense with positive usage marks a zero-odo row consecutive.
+    next_usage = np.zeros(n)
+    next_usage[:-1] = np.nan_to_num(np.where(usage_raw != None, total_usage, 0.0))[1:]  # noqa: E711
+    split_with_next = has_next & (to_next == 0) & odo_non_positive & (next_usage > 0)
+    consec_60 |= split_with_next
+    consec_120 |= split_with_next
+
+    gap_60_120 = (since_prev > 60) & (since_prev <= 120)
+    fill_outside_hour = gap_60_120 | (~np.isnan(since_prev) & consec_60 & (since_batch > 60))
+    odo_jump_50 = has_prev & consec_60 & (usage > 50) & (since_prev < usage * 60)
+
+    litres = np.array([float(v or 0) for v in litres_raw[order].tolist()])
+    batch_litres = _batch_cumsum(litres, batch_starts)
+    tank_raw = tank_raw[order].tolist()
+    in_tank_batch = np.array([bool(t) for t in tank_raw]) & consec_60
+    tank = np.array([float(t) if t else np.nan for t in tank_raw])
+    cumulative = np.where(in_tank_batch, batch_litres, np.nan)
+    over_tank = (cumulative > tank) & odo_non_positive
+
+    out: dict[str, ComputedTransaction] = {}
+    columns = zip(
+        txn_raw.tolist(),
+        asset_raw.tolist(),
+        dt_raw.tolist(),
+        initial_dispense.tolist(),
+        odo_gt_50.tolist(),
+        odo_non_positive.tolist(),
+        meter_reset.tolist(),
+        consec_60.tolist(),
+        consec_120.tolist(),
+        fill_outside_hour.tolist(),
+        odo_jump_50.tolist(),
+        over_tank.tolist(),
+        _optional(since_prev),
+        _optional(since_batch),
+        dt_raw[batch_start].tolist(),
+        [c if flagged else None for c, flagged in zip(cumulative.tolist(), in_tank_batch.tolist())],
+        tank.tolist(),
+    )
+    for (
+        txn, asset, when, initial, gt_50, non_pos, reset, c60, c120, outside, jump, over,
+        prev_min, batch_min, batch_time, cum, tank_l,
+    ) in columns:
+        flags = RuleFlags(
+            consec_60=c60,
+            consec_120=c120,
+            odo_non_positive=non_pos,
+            fill_outside_hour=outside,
+            odo_jump_50=jump,
+            odo_gt_50=gt_50,
+            over_tank_cumulative=over,
+            initial_dispense=initial,
+            meter_reset=reset,
+        )
+        if over:
+            flags.over_tank_detail = (
+                f"Cumulative litres > tank size during consecutive dispenses; "
+                f"{cum:.1f} L into a {tank_l:.0f} L tank, "
+                f"{REASON_ODO_NON_POS}, {REASON_CONSEC_60}"
+            )
+        txn_id = str(txn or "")
+        out[txn_id] = ComputedTransaction(
+            transaction_id=txn_id,
+            asset_number=asset,
+            date_time=when,
+            flags=flags,
+            minutes_since_previous=prev_min,
+            minutes_since_batch_start=batch_min,
+            batch_start_time=batch_time,
+            cumulative_litres_in_batch=cum,
+        )
+    return out
+
+
+def compute_with_engine(transactions: list[dict[str, Any]], engine: str = "row") -> dict[str, ComputedTransaction]:
+    if engine == "vectorized":
+        return compute_all_vectorized(transactions)
+    if engine != "row":
+        raise ValueError(f"Unknown rule engine: {engine}")
+    return compute_all(transactions)
+
+
+def rule_engine_parity(transactions: list[dict[str, Any]]) -> dict[str, Any]:
+    """Run both engines on the same rows and compare flags and workbook match rates."""
+    row = compute_all(transactions)
+    vectorized = compute_all_vectorized(transactions)
+    differing = sorted(
+        txn_id
+        for txn_id in set(row) | set(vectorized)
+        if row.get(txn_id) != vectorized.get(txn_id)
+    )
+    report: dict[str, Any] = {
+        "transaction_count": len(row),
+        "identical": not differing,
+        "differing_transactions": differing[:50],
+    }
+    for column in ("exception_60", "exception_120"):
+        row_rate = match_rate(transactions, row, column)
+        vec_rate = match_rate(transactions, vectorized, column)
+        report[column] = {
+            "row_match_pct": row_rate["match_pct"],
+            "vectorized_match_pct": vec_rate["match_pct"],
+            "same_mismatches": row_rate["mismatches"] == vec_rate["mismatches"],
+        }
+    return report
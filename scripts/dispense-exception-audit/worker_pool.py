@@ -0,0 +1,27 @@
+"""Process pools whose workers receive read-only state (lookups, options) once.
+
+The state is pickled to each worker through the pool initializer rather than with every
+task, and read back inside the task with ``worker_state``.
+"""
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any
+
+# State of the current worker process (set by init_worker).
+_STATE: dict[str, Any] = {}
+
+
+def init_worker(state: dict[str, Any]) -> None:
+    """Install ``state`` for this process; also used to run tasks in-process without a pool."""
+    _STATE.clear()
+    _STATE.update(state)
+
+
+def worker_state() -> dict[str, Any]:
+    return _STATE
+
+
+def shared_state_pool(max_workers: int, state: dict[str, Any]) -> ProcessPoolExecutor:
+    """ProcessPoolExecutor whose workers start with ``state`` installed."""
+    return ProcessPoolExecutor(max_workers=max_workers, initializer=init_worker, initargs=(state,))
@@ -0,0 +1,170 @@
+"""Export parsed DFRR transactions, receipts and findings as Parquet / Feather tables."""
+from __future__ import annotations
+
+import json
+from collections import defaultdict
+from pathlib import Path
+from typing import Any
+
+import pandas as pd
+
+from parse_workbook import ParsedWorkbook
+from report_writer import row_severity
+from rules import COMBINED_SHEET, Finding, datetime_column, numeric_column
+
+EXPORT_FORMATS = ("parquet", "feather")
+
+# (column, source header, kind) — column order and kinds are the published schema.
+TRANSACTION_COLUMNS: list[tuple[str, str, str]] = [
+    ("transaction_type", "Transaction Type", "str"),
+    ("date_time", "Date & Time", "datetime"),
+    ("transaction_id", "Transaction ID", "str"),
+    ("asset_description", "Asset Description", "str"),
+    ("asset_number", "Asset Number", "str"),
+    ("asset_group", "Asset Group", "str"),
+    ("asset_tank_size_l", "Asset Tank Size (L)", "float"),
+    ("meter_type", "Asset Meter Type (Hr/Km)", "str"),
+    ("storage_tank", "Storage Tank", "str"),
+    ("fuel_pump", "Fuel Pump", "str"),
+    ("litres", "Fuel Dispensed or Received (L)", "float"),
+    ("tank_litres_before", "≈ Tank Litres Before", "float"),
+    ("tank_litres_after", "≈ Tank Litres After", "float"),
+    ("pump_reading_before", "Pump Readings Before", "float"),
+    ("pump_reading_after", "Pump Readings After", "float"),
+    ("opening_odo", "Opening Odo", "float"),
+    ("closing_odo", "Closing Odo", "float"),
+    ("total_usage", "Total Usage Km/Hr", "float"),
+    ("total_fuel_used_l", "Total Fuel Used (L)", "float"),
+    ("operation_comment", "Operation Description / Comment", "str"),
+    ("refund_eligibility", "Refund Eligibility", "str"),
+    ("eligible_l", "Eligible L", "float"),
+    ("operator", "Operator", "str"),
+    ("location", "Location", "str"),
+    ("fuel_cost", "Fuel Cost (R)", "float"),
+    ("eligible_volume_l", "Eligible Volume (L) (Claimable % of Total)", "float"),
+    ("refund_price", "Refund Price", "float"),
+    ("refund_total", "Refund Total", "float"),
+    ("excel_row", "_excel_row", "int"),
+    ("sheet", "_sheet", "str"),
+]
+
+RECEIPT_COLUMNS: list[tuple[str, str, str]] = [
+    ("date_time", "Date & Time", "datetime"),
+    ("event_id", "Event ID", "str"),
+    ("storage_tank", "Storage Tank", "str"),
+    ("fuel_pump", "Fuel Pump", "str"),
+    ("order_ref", "Order Ref", "str"),
+    ("litres_received", "Litres Received", "float"),
+    ("fuel_cost", "Fuel Cost (R)", "float"),
+    ("price_per_l", "Price/L", "float"),
+    ("excel_row", "_excel_row", "int"),
+    ("sheet", "_sheet", "str"),
+]
+
+FINDING_COLUMNS: list[tuple[str, str, str]] = [
+    ("check_id", "check_id", "str"),
+    ("severity", "severity", "str"),
+    ("process_task", "process_task", "str"),
+    ("sheet", "sheet", "str"),
+    ("excel_row", "excel_row", "int"),
+    ("transaction_id", "transaction_id", "str"),
+    ("asset_number", "asset_number", "str"),
+    ("message", "message", "str"),
+    ("fields_json", "fields_json", "str"),
+]
+
+
+def _str_column(values: list[Any]) -> pd.Series:
+    return pd.Series(
+        [None if v is None or str(v).strip() == "" else str(v).strip() for v in values],
+        dtype="string",
+    )
+
+
+def _typed_frame(records: list[dict], columns: list[tuple[str, str, str]]) -> pd.DataFrame:
+    data: dict[str, pd.Series] = {}
+    for name, source, kind in columns:
+        values = [r.get(source) for r in records]
+        if kind == "float":
+            data[name] = numeric_column(values)
+        elif kind == "int":
+            data[name] = pd.array(numeric_column(values).round(), dtype="Int64")
+        elif kind == "datetime":
+            data[name] = datetime_column(values).astype("datetime64[ms]")
+        else:
+            data[name] = _str_column(values)
+    return pd.DataFrame(data, columns=[c[0] for c in columns])
+
+
+def transactions_frame(parsed: ParsedWorkbook, findings: list[Finding]) -> pd.DataFrame:
+    """Typed Combined Fuel Transactions with the per-row audit outcome."""
+    by_row: dict[int, list[Finding]] = defaultdict(list)
+    for f in findings:
+        if f.sheet == COMBINED_SHEET and f.excel_row:
+            by_row[f.excel_row].append(f)
+
+    df = _typed_frame(parsed.combined_rows, TRANSACTION_COLUMNS)
+    severities: list[str] = []
+    counts: list[int] = []
+    checks: list[str | None] = []
+    for row in parsed.combined_rows:
+        row_findings = by_row.get(row.get("_excel_row") or 0, [])
+        severities.append(row_severity(row_findings) or "pass")
+        counts.append(len(row_findings))
+        checks.append(", ".join(sorted({f.check_id for f in row_findings})) or None)
+    df["audit_severity"] = pd.Series(severities, dtype="string")
+    df["findings_count"] = pd.Series(counts, dtype="int64")
+    df["checks_failed"] = pd.Series(checks, dtype="string")
+    return df
+
+
+def receipts_frame(parsed: ParsedWorkbook) -> pd.DataFrame:
+    return _typed_frame(parsed.fuel_receipts, RECEIPT_COLUMNS)
+
+
+def findings_frame(findings: list[Finding]) -> pd.DataFrame:
+    records = [
+        {**f.to_dict(), "fields_json": json.dumps(f.fields, default=str)}
+        for f in findings
+    ]
+    return _typed_frame(records, FINDING_COLUMNS)
+
+
+def arrow_available() -> bool:
+    """Parquet and Feather writers need pyarrow, which is optional for the audit itself."""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def export_columnar(
+    export_dir: str | Path,
+    parsed: ParsedWorkbook,
+    findings: list[Finding],
+    fmt: str = "parquet",
+) -> dict[str, str]:
+    """Write transactions / receipts / findings tables. Returns table name → path."""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    export_dir = Path(export_dir)
+    export_dir.mkdir(parents=True, exist_ok=True)
+    stem = Path(parsed.source_path).stem
+    source_file = Path(parsed.source_path).name
+
+    tables = {
+        "transactions": transactions_frame(parsed, findings),
+        "receipts": receipts_frame(parsed),
+        "findings": findings_frame(findings),
+    }
+    written: dict[str, str] = {}
+    for name, df in tables.items():
+        df.insert(0, "source_file", pd.Series([source_file] * len(df), dtype="string"))
+        out = export_dir / f"{stem}-{name}.{fmt}"
+        if fmt == "parquet":
+            df.to_parquet(out, index=False)
+        else:
+            df.to_feather(out)
+        written[name] = str(out)
+    return written
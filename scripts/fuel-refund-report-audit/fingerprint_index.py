@@ -0,0 +1,244 @@
+"""Persistent dispense fingerprint index for cross-report duplicate claims.
+
+Fingerprints live in a SQLite table keyed on a 64-bit hash of (Transaction ID, datetime,
+asset, pump, litres). A Bloom filter over the same hashes is kept in the database so most
+probes for unseen rows never touch the table.
+"""
+from __future__ import annotations
+
+import hashlib
+import math
+import re
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Iterable
+
+DEFAULT_CAPACITY = 1_000_000
+DEFAULT_ERROR_RATE = 0.01
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over pre-hashed 64-bit keys (double hashing)."""
+
+    def __init__(self, bit_count: int, hash_count: int, bits: bytearray | None = None) -> None:
+        self.bit_count = bit_count
+        self.hash_count = hash_count
+        self.bits = bits if bits is not None else bytearray((bit_count + 7) // 8)
+
+    @classmethod
+    def for_capacity(cls, capacity: int, error_rate: float = DEFAULT_ERROR_RATE) -> BloomFilter:
+        capacity = max(capacity, 1)
+        bit_count = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        hash_count = max(1, round(bit_count / capacity * math.log(2)))
+        return cls(bit_count, hash_count)
+
+    def _positions(self, key: int) -> Iterable[int]:
+        key = (key * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
+        key ^= key >> 29
+        h1 = key & 0xFFFFFFFF
+        h2 = (key >> 32) | 1
+        for i in range(self.hash_count):
+            yield (h1 + i * h2) % self.bit_count
+
+    def add(self, key: int) -> None:
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key: int) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+def _fp_part(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    return str(value).strip().upper()
+
+
+def fingerprint(
+    transaction_id: Any,
+    date_time: datetime | None,
+    asset: Any,
+    pump: Any,
+    litres: float | None,
+) -> int:
+    """Signed 64-bit hash (fits an SQLite INTEGER) of the dispense identity."""
+    litres_part = f"{abs(litres):.2f}" if litres is not None else ""
+    key = "|".join(
+        (_fp_part(transaction_id), _fp_part(date_time), _fp_part(asset), _fp_part(pump), litres_part)
+    )
+    digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+_MONTH_NAMES = (
+    "january|february|march|april|may|june|july|august|september|october|november|december"
+    "|jan|feb|mar|apr|jun|jul|aug|sep|sept|oct|nov|dec"
+)
+_PERIOD_TOKEN = re.compile(
+    rf"(?<![a-z0-9])(?:(?:{_MONTH_NAMES})[\s_-]*\d{{4}}|\d{{4}}[-_]\d{{2}}(?:[-_]\d{{2}})?)(?![a-z0-9])",
+    re.IGNORECASE,
+)
+
+
+def site_from_file_name(name: str | Path) -> str:
+    """Site label from an uploaded workbook's file name.
+
+    Drops the extension, copy suffixes such as ``(1)`` and month/date tokens, so a corrected
+    upload of the same site's report maps to the same label as the original.
+    """
+    stem = Path(str(name)).stem
+    stem = re.sub(r"\s*\(\d+\)\s*$", "", stem)
+    stem = _PERIOD_TOKEN.sub(" ", stem)
+    return re.sub(r"[\s_-]+", " ", stem).strip(" .") or "site"
+
+
+def report_key_for(dates: Iterable[datetime | None], site: str | None = None) -> str:
+    """Index identity of a report: site and months covered.
+
+    The key does not depend on the workbook bytes, so a corrected re-upload of the same site
+    and period replaces the earlier version's entries instead of duplicating them.
+    """
+    months = sorted({d.strftime("%Y-%m") for d in dates if d})
+    if not months:
+        period = "undated"
+    elif len(months) == 1:
+        period = months[0]
+    else:
+        period = f"{months[0]}..{months[-1]}"
+    return "/".join(part for part in ((site or "").strip(), period) if part)
+
+
+class FingerprintIndex:
+    """SQLite-backed fingerprint store shared by every audited workbook.
+
+    The Bloom filter row is updated in the same write transaction as the fingerprints, merged
+    with whatever other audits stored meanwhile, so concurrent audits never drop each other's
+    bits and ``entry_count`` stays exact without counting the table.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        capacity: int = DEFAULT_CAPACITY,
+        error_rate: float = DEFAULT_ERROR_RATE,
+    ) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.error_rate = error_rate
+        self.conn = sqlite3.connect(str(self.path), timeout=30)
+        self.conn.executescript(
+            """
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            CREATE TABLE IF NOT EXISTS fingerprints (
+                fp INTEGER NOT NULL,
+                report_key TEXT NOT NULL,
+                transaction_id TEXT,
+                excel_row INTEGER,
+                recorded_at TEXT NOT NULL,
+                PRIMARY KEY (fp, report_key)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS fingerprints_report ON fingerprints (report_key);
+            CREATE TABLE IF NOT EXISTS bloom (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                bit_count INTEGER NOT NULL,
+                hash_count INTEGER NOT NULL,
+                capacity INTEGER NOT NULL,
+                entry_count INTEGER NOT NULL,
+                bits BLOB NOT NULL
+            );
+            """
+        )
+        self.capacity = capacity
+        self.entry_count = 0
+        self.bloom = self._load_bloom()
+
+    def _stored_bloom(self) -> tuple[BloomFilter, int, int] | None:
+        row = self.conn.execute(
+            "SELECT bit_count, hash_count, capacity, entry_count, bits FROM bloom WHERE id = 1"
+        ).fetchone()
+        if not row:
+            return None
+        bit_count, hash_count, capacity, entry_count, bits = row
+        return BloomFilter(bit_count, hash_count, bytearray(bits)), capacity, entry_count
+
+    def _load_bloom(self) -> BloomFilter:
+        # Filters written before the bloom row was kept in step with the table may have lost
+        # another audit's bits; user_version 1 marks a filter rebuilt since.
+        stored = self._stored_bloom()
+        if stored and self.conn.execute("PRAGMA user_version").fetchone()[0] >= 1:
+            bloom, self.capacity, self.entry_count = stored
+            return bloom
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            self.entry_count = self.conn.execute("SELECT COUNT(*) FROM fingerprints").fetchone()[0]
+            bloom = self._rebuild_bloom()
+            self._save_bloom(bloom)
+            self.conn.execute("PRAGMA user_version = 1")
+        return bloom
+
+    def _rebuild_bloom(self) -> BloomFilter:
+        """Size for at least twice the stored entries and re-add every fingerprint."""
+        self.capacity = max(self.capacity, self.entry_count * 2)
+        bloom = BloomFilter.for_capacity(self.capacity, self.error_rate)
+        for (fp,) in self.conn.execute("SELECT fp FROM fingerprints"):
+            bloom.add(fp)
+        return bloom
+
+    def _save_bloom(self, bloom: BloomFilter) -> None:
+        self.conn.execute(
+            "INSERT OR REPLACE INTO bloom (id, bit_count, hash_count, capacity, entry_count, bits) "
+            "VALUES (1, ?, ?, ?, ?, ?)",
+            (bloom.bit_count, bloom.hash_count, self.capacity, self.entry_count, bytes(bloom.bits)),
+        )
+
+    def lookup(self, fp: int, exclude_report: str | None = None) -> list[str]:
+        """Report keys holding this fingerprint (Bloom filter first, table only on a hit)."""
+        if fp not in self.bloom:
+            return []
+        rows = self.conn.execute(
+            "SELECT report_key FROM fingerprints WHERE fp = ? AND report_key != ?",
+            (fp, exclude_report or ""),
+        ).fetchall()
+        return [r[0] for r in rows]
+
+    def replace_report(self, report_key: str, entries: Iterable[tuple[int, str | None, int | None]]) -> int:
+        """Store (fp, transaction_id, excel_row) for a report, replacing its previous audit."""
+        recorded_at = datetime.now().isoformat(timespec="seconds")
+        rows = [(fp, report_key, tid, excel_row, recorded_at) for fp, tid, excel_row in entries]
+        with self.conn:
+            # Take the write lock first so the stored filter and count cannot change under us.
+            self.conn.execute("BEGIN IMMEDIATE")
+            stored = self._stored_bloom()
+            if stored:
+                bloom, self.capacity, self.entry_count = stored
+                if (bloom.bit_count, bloom.hash_count) == (self.bloom.bit_count, self.bloom.hash_count):
+                    merged = int.from_bytes(bloom.bits, "little") | int.from_bytes(self.bloom.bits, "little")
+                    bloom.bits = bytearray(merged.to_bytes(len(bloom.bits), "little"))
+                self.bloom = bloom
+            deleted = self.conn.execute("DELETE FROM fingerprints WHERE report_key = ?", (report_key,)).rowcount
+            inserted = self.conn.executemany(
+                "INSERT OR IGNORE INTO fingerprints (fp, report_key, transaction_id, excel_row, recorded_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows,
+            ).rowcount
+            self.entry_count += inserted - deleted
+            if self.entry_count > self.capacity:
+                self.bloom = self._rebuild_bloom()
+            else:
+                for fp, *_ in rows:
+                    self.bloom.add(fp)
+            self._save_bloom(self.bloom)
+        return len(rows)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> FingerprintIndex:
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
@@ -3,6 +3,7 @@ from __future__ import annotations
 
 import re
 from dataclasses import dataclass, field
+from datetime import datetime
 from pathlib import Path
 from typing import Any
 
@@ -114,6 +115,33 @@ def _parse_eligible_review(ws) -> list[dict]:
     return rows
 
 
+_LABEL_DATE_PATTERNS = (
+    (re.compile(r"\b(\d{4})[-/](\d{1,2})[-/](\d{1,2})\b"), ("y", "m", "d")),
+    (re.compile(r"\b(\d{1,2})[-/](\d{1,2})[-/](\d{4})\b"), ("d", "m", "y")),
+)
+_LABEL_MONTH_DATE = re.compile(r"\b(\d{1,2})\s+([A-Za-z]{3,9})\s+(\d{4})\b")
+
+
+def _label_dates(label: str) -> list[datetime]:
+    """Dates in a 'Rate from …' label, in the order they appear."""
+    found: list[tuple[int, datetime]] = []
+    for pattern, order in _LABEL_DATE_PATTERNS:
+        for m in pattern.finditer(label):
+            parts = dict(zip(order, (int(g) for g in m.groups())))
+            try:
+                found.append((m.start(), datetime(parts["y"], parts["m"], parts["d"])))
+            except ValueError:
+                continue
+    for m in _LABEL_MONTH_DATE.finditer(label):
+        for fmt in ("%d %B %Y", "%d %b %Y"):
+            try:
+                found.append((m.start(), datetime.strptime(" ".join(m.groups()), fmt)))
+                break
+            except ValueError:
+                continue
+    return [dt for _, dt in sorted(found, key=lambda item: item[0])]
+
+
 def _parse_refund_rates(ws) -> list[dict]:
     rates: list[dict] = []
     for ri, row in enumerate(ws.iter_rows(min_row=1, max_row=40, values_only=True), 1):
@@ -125,10 +153,31 @@ def _parse_refund_rates(ws) -> list[dict]:
                 val = float(row[1])
             except (TypeError, ValueError):
                 continue
-            rates.append({"label": label, "rate": val, "excel_row": ri})
+            dates = _label_dates(label) or [c for c in row[2:] if isinstance(c, datetime)]
+            rates.append(
+                {
+                    "label": label,
+                    "rate": val,
+                    "excel_row": ri,
+                    "effective_from": dates[0] if dates else None,
+                    "effective_to": dates[1] if len(dates) > 1 else None,
+                    "tank": None,
+                }
+            )
     return rates
 
 
+def _assign_rate_tanks(rates: list[dict], tank_names: list[str]) -> None:
+    """Tie a rate to a storage tank when its label names one from the usage table."""
+    for rate in rates:
+        label = re.sub(r"[^a-z0-9]+", " ", rate["label"].lower())
+        for tank in sorted(tank_names, key=len, reverse=True):
+            token = re.sub(r"[^a-z0-9]+", " ", tank.lower()).strip()
+            if token and f" {token} " in f" {label} ":
+                rate["tank"] = tank
+                break
+
+
 def _parse_tank_summary(ws) -> dict[str, Any]:
     summary: dict[str, Any] = {"rates": _parse_refund_rates(ws), "tanks": []}
     in_usage = False
@@ -155,6 +204,7 @@ def _parse_tank_summary(ws) -> dict[str, Any]:
                 pass
         if label == "Total" and in_usage:
             break
+    _assign_rate_tanks(summary["rates"], [t["tank"] for t in summary["tanks"]])
     return summary
 
 
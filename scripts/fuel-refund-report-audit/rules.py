@@ -3,6 +3,7 @@ from __future__ import annotations
 
 import json
 import re
+from bisect import bisect_right
 from collections import defaultdict
 from dataclasses import asdict, dataclass, field
 from datetime import datetime, timedelta
@@ -11,6 +12,9 @@ from pathlib import Path
 from statistics import median
 from typing import Any
 
+import pandas as pd
+
+from fingerprint_index import FingerprintIndex, fingerprint
 from parse_workbook import ParsedWorkbook, normalize_tx_type, sheet_has_tank_litre_columns
 
 CONFIG_PATH = Path(__file__).resolve().parent / "rules_config.json"
@@ -171,17 +175,23 @@ def check_initial_dispense_no_claim(rows: list[dict], cfg: dict[str, Any]) -> li
     return findings
 
 
+def _duplicate_key(row: dict) -> tuple | None:
+    """(datetime, asset, pump, abs litres) identity shared by every exact duplicate."""
+    dt = row.get("Date & Time")
+    asset = str(row.get("Asset Number") or "").strip()
+    pump = str(row.get("Fuel Pump") or "").strip()
+    litres = litres_abs(row.get("Fuel Dispensed or Received (L)"))
+    if not dt or not asset or litres is None:
+        return None
+    return (str(dt).strip(), asset, pump, round(litres, 4))
+
+
 def check_duplicate_transaction(rows: list[dict], cfg: dict[str, Any]) -> list[Finding]:
     groups: dict[tuple, list[dict]] = defaultdict(list)
     for row in rows:
-        dt = row.get("Date & Time")
-        asset = str(row.get("Asset Number") or "").strip()
-        pump = str(row.get("Fuel Pump") or "").strip()
-        litres = litres_abs(row.get("Fuel Dispensed or Received (L)"))
-        if not dt or not asset or litres is None:
-            continue
-        key = (str(dt).strip(), asset, pump, round(litres, 4))
-        groups[key].append(row)
+        key = _duplicate_key(row)
+        if key is not None:
+            groups[key].append(row)
     findings: list[Finding] = []
     for key, members in groups.items():
         if len(members) < 2:
@@ -200,6 +210,131 @@ def check_duplicate_transaction(rows: list[dict], cfg: dict[str, Any]) -> list[F
     return findings
 
 
+def check_near_duplicate_transaction(rows: list[dict], cfg: dict[str, Any]) -> list[Finding]:
+    """Same asset and pump, litres and time within tolerance (re-import clock skew).
+
+    Rows are sorted by (asset, timestamp) and each is compared with the following rows of
+    the asset inside the time window, on the actual litre and time differences. Pairs that
+    check_duplicate_transaction reports are skipped, and rows it already flags get no
+    near-duplicate finding of their own: they show up as partners on the skewed copies.
+    """
+    tolerance = timedelta(seconds=float(cfg.get("near_duplicate_tolerance_seconds", 120)))
+    litres_tolerance = float(cfg.get("near_duplicate_litres_tolerance", 0.1)) + 1e-9
+
+    keyed: list[tuple[str, datetime, int, str, float, tuple | None]] = []
+    for idx, row in enumerate(rows):
+        asset = str(row.get("Asset Number") or "").strip()
+        dt = parse_dt(row.get("Date & Time"))
+        litres = litres_abs(row.get("Fuel Dispensed or Received (L)"))
+        if not asset or not dt or litres is None:
+            continue
+        pump = str(row.get("Fuel Pump") or "").strip()
+        keyed.append((asset, dt, idx, pump, litres, _duplicate_key(row)))
+    keyed.sort(key=lambda item: item[:3])
+
+    exact_counts: dict[tuple, int] = defaultdict(int)
+    for item in keyed:
+        exact_counts[item[5]] += 1
+    partners: dict[int, list[tuple[int, float]]] = defaultdict(list)
+    for i, (asset, dt, idx, pump, litres, exact) in enumerate(keyed):
+        for other in keyed[i + 1 :]:
+            if other[0] != asset or other[1] - dt > tolerance:
+                break
+            if other[3] != pump or abs(other[4] - litres) > litres_tolerance:
+                continue
+            if exact is not None and other[5] == exact:
+                continue
+            gap = (other[1] - dt).total_seconds()
+            partners[idx].append((other[2], gap))
+            partners[other[2]].append((idx, gap))
+
+    findings: list[Finding] = []
+    for _, _, idx, _, _, exact in keyed:
+        matches = partners.get(idx)
+        if not matches or (exact is not None and exact_counts[exact] > 1):
+            continue
+        spread = max(gap for _, gap in matches)
+        findings.append(
+            _row_meta(
+                rows[idx],
+                "near_duplicate_transaction",
+                "warning",
+                f"Possible duplicate of {len(matches)} row(s): same asset, pump, litres within "
+                f"{spread:.0f}s (tolerance {tolerance.total_seconds():.0f}s)",
+                cfg,
+                near_rows=[rows[other].get("_excel_row") for other, _ in sorted(matches)],
+                spread_seconds=spread,
+            )
+        )
+    return findings
+
+
+_FINGERPRINT_TX_TYPES = frozenset({"DISPENSE", "INITIAL-DISPENSE", "MOBILE-BOWSER-TRANSFER"})
+
+
+def row_fingerprint(row: dict) -> int | None:
+    """Cross-report identity of a dispense row; None for rows that cannot be claimed twice."""
+    if normalize_tx_type(row.get("Transaction Type")) not in _FINGERPRINT_TX_TYPES:
+        return None
+    if is_zero_or_no_dispense_litres(row):
+        return None
+    dt = parse_dt(row.get("Date & Time"))
+    asset = str(row.get("Asset Number") or "").strip()
+    if not dt or not asset:
+        return None
+    return fingerprint(
+        row.get("Transaction ID"),
+        dt,
+        asset,
+        row.get("Fuel Pump"),
+        litres_abs(row.get("Fuel Dispensed or Received (L)")),
+    )
+
+
+def fingerprint_entries(rows: list[dict]) -> list[tuple[int, str | None, int | None]]:
+    entries: list[tuple[int, str | None, int | None]] = []
+    for row in rows:
+        fp = row_fingerprint(row)
+        if fp is not None:
+            entries.append((fp, str(row.get("Transaction ID") or "") or None, row.get("_excel_row")))
+    return entries
+
+
+def check_cross_report_duplicate(
+    rows: list[dict],
+    index: FingerprintIndex,
+    report_key: str,
+    cfg: dict[str, Any],
+) -> list[Finding]:
+    """Dispenses already recorded by another audited workbook (other month or site)."""
+    findings: list[Finding] = []
+    for row in rows:
+        fp = row_fingerprint(row)
+        if fp is None:
+            continue
+        other_reports = index.lookup(fp, exclude_report=report_key)
+        if not other_reports:
+            continue
+        claimed = (
+            (parse_num(row.get("Refund Total")) or 0) > 0
+            or (parse_num(row.get("Eligible Volume (L) (Claimable % of Total)")) or 0) > 0
+            or (parse_num(row.get("Eligible L")) or 0) > 0
+        )
+        findings.append(
+            _row_meta(
+                row,
+                "cross_report_duplicate",
+                "error" if claimed else "warning",
+                f"Same dispense already in {len(other_reports)} other audited report(s): "
+                + ", ".join(sorted(other_reports)[:3]),
+                cfg,
+                other_reports=sorted(other_reports),
+                claimed=claimed,
+            )
+        )
+    return findings
+
+
 def _refund_marked_non_eligible(row: dict) -> bool:
     re = str(row.get("Refund Eligibility") or "").strip().lower()
     return "non-eligible" in re or re == "non eligible"
@@ -756,6 +891,52 @@ def _row_has_refund_rate_claim_context(row: dict) -> bool:
     return el > 0 or ev > 0 or rt > 0
 
 
+class RefundRateIndex:
+    """Refund rates from Combined Tank Summary, indexed by tank and effective date.
+
+    Built once per audit; ``rate_for`` is a bisect over the sorted effective-from dates of the
+    row's tank (falling back to the site-wide rates), so each row costs O(log n).
+    """
+
+    def __init__(self, rates: list[dict]) -> None:
+        self.primary = rates[0] if rates else None
+        dated = [r for r in rates if isinstance(r.get("effective_from"), datetime)]
+        by_tank: dict[str, list[dict]] = defaultdict(list)
+        site_wide: list[dict] = []
+        for rate in dated:
+            tank = norm_token(rate.get("tank"))
+            (by_tank[tank] if tank else site_wide).append(rate)
+        self._intervals: dict[str, tuple[list[datetime], list[dict]]] = {}
+        for key, group in [("", site_wide), *by_tank.items()]:
+            group = sorted(group, key=lambda r: (r["effective_from"], r.get("excel_row") or 0))
+            self._intervals[key] = ([r["effective_from"] for r in group], group)
+
+    def _lookup(self, key: str, dt: datetime, clamp: bool = False) -> dict | None:
+        """Rate whose period covers ``dt``; ``clamp`` maps dates before the first period onto it."""
+        starts, group = self._intervals.get(key, ([], []))
+        if not group:
+            return None
+        i = bisect_right(starts, dt) - 1
+        if i < 0:
+            return group[0] if clamp else None
+        rate = group[i]
+        end = rate.get("effective_to")
+        if isinstance(end, datetime) and dt.date() > end.date():
+            return None
+        return rate
+
+    def rate_for(self, row: dict) -> dict | None:
+        dt = parse_dt(row.get("Date & Time"))
+        if dt is None:
+            return self.primary
+        tank = norm_token(row.get("Storage Tank"))
+        if tank:
+            rate = self._lookup(tank, dt)
+            if rate:
+                return rate
+        return self._lookup("", dt, clamp=True) or self.primary
+
+
 def check_refund_rate_summary(rows: list[dict], parsed: ParsedWorkbook, cfg: dict[str, Any]) -> list[Finding]:
     findings: list[Finding] = []
     rates = parsed.refund_rates
@@ -772,7 +953,7 @@ def check_refund_rate_summary(rows: list[dict], parsed: ParsedWorkbook, cfg: dic
         )
         return findings
 
-    primary_rate = rates[0]["rate"]
+    index = RefundRateIndex(rates)
     tol = float(cfg.get("refund_rate_tolerance", 0.001))
     for row in rows:
         if not _row_has_refund_rate_claim_context(row):
@@ -780,15 +961,19 @@ def check_refund_rate_summary(rows: list[dict], parsed: ParsedWorkbook, cfg: dic
         rp = parse_num(row.get("Refund Price"))
         if rp is None:
             continue
-        if abs(rp - primary_rate) > tol:
+        applicable = index.rate_for(row)
+        summary_rate = applicable["rate"]
+        if abs(rp - summary_rate) > tol:
             findings.append(
                 _row_meta(
                     row,
                     "refund_rate_summary",
                     "warning",
-                    f"Refund Price {rp} differs from summary rate {primary_rate}",
+                    f"Refund Price {rp} differs from summary rate {summary_rate} ({applicable['label']})",
                     cfg,
-                    summary_rate=primary_rate,
+                    summary_rate=summary_rate,
+                    summary_rate_label=applicable["label"],
+                    summary_rate_row=applicable.get("excel_row"),
                 )
             )
     return findings
@@ -916,6 +1101,115 @@ def check_tank_summary_imbalance(parsed: ParsedWorkbook, cfg: dict[str, Any]) ->
     return findings
 
 
+def numeric_column(values: list[Any]) -> pd.Series:
+    """Vectorized parse_num for a column: numbers pass through, '1,234.5' strings are cleaned."""
+    raw = pd.Series(values, dtype=object)
+    out = pd.to_numeric(raw, errors="coerce")
+    text_mask = out.isna() & raw.map(lambda v: isinstance(v, str))
+    if text_mask.any():
+        cleaned = raw[text_mask].str.replace(",", "", regex=False).str.extract(r"(-?\d+(?:\.\d+)?)")[0]
+        out[text_mask] = pd.to_numeric(cleaned, errors="coerce")
+    return out.astype(float)
+
+
+def datetime_column(values: list[Any]) -> pd.Series:
+    """Vectorized parse_dt: ISO strings / datetimes first, then day-first d/m/Y strings."""
+    raw = pd.Series(values, dtype=object)
+    out = pd.to_datetime(raw, errors="coerce", format="mixed")
+    slash_mask = raw.map(lambda v: isinstance(v, str) and "/" in v).astype(bool)
+    if slash_mask.any():
+        out[slash_mask] = pd.to_datetime(raw[slash_mask], errors="coerce", format="mixed", dayfirst=True)
+    return out
+
+
+def _tank_litre_before_after(headers: list[str]) -> tuple[str | None, str | None]:
+    before = after = None
+    for h in sheet_has_tank_litre_columns(headers):
+        hl = h.lower()
+        if before is None and "before" in hl:
+            before = h
+        elif after is None and "after" in hl:
+            after = h
+    return before, after
+
+
+def check_tank_stock_reconciliation(rows: list[dict], cfg: dict[str, Any]) -> list[Finding]:
+    """Running stock per storage tank from signed receipts, transfers and dispenses.
+
+    Balances are a grouped cumulative sum over the Combined sheet columns, anchored on the
+    first ≈ Tank Litres Before reading of each tank. Only the first row of a negative-stock
+    run and rows where drift vs ≈ Tank Litres After changes are reported, so one missing
+    receipt does not flag every later row.
+    """
+    if not rows:
+        return []
+    tol = float(cfg.get("tank_stock_drift_tolerance_litres", 5.0))
+    before_col, after_col = _tank_litre_before_after(list(rows[0].keys()))
+
+    df = pd.DataFrame(
+        {
+            "tank": [str(r.get("Storage Tank") or "").strip() for r in rows],
+            "dt": datetime_column([r.get("Date & Time") for r in rows]),
+            "litres": numeric_column([r.get("Fuel Dispensed or Received (L)") for r in rows]).fillna(0.0),
+            "before": numeric_column([r.get(before_col) for r in rows]) if before_col else float("nan"),
+            "after": numeric_column([r.get(after_col) for r in rows]) if after_col else float("nan"),
+        }
+    )
+    df = df[(df["tank"] != "") & df["dt"].notna()]
+    if df.empty:
+        return []
+    df = df.sort_values(["tank", "dt"], kind="mergesort")
+
+    grouped = df.groupby("tank", sort=False)
+    df["flow"] = grouped["litres"].cumsum()
+    # Stock before the first movement of the tank, implied by each row's Before reading.
+    df["opening"] = (df["before"] - (df["flow"] - df["litres"])).groupby(df["tank"], sort=False).transform("first")
+    df["expected_after"] = df["opening"] + df["flow"]
+
+    negative = df["expected_after"] < -tol
+    prev_negative = negative.groupby(df["tank"], sort=False).shift(1, fill_value=False).astype(bool)
+    df["negative_start"] = negative & ~prev_negative
+
+    df["drift"] = df["after"] - df["expected_after"]
+    last_drift = df["drift"].groupby(df["tank"], sort=False).ffill()
+    prev_drift = last_drift.groupby(df["tank"], sort=False).shift(1).fillna(0.0)
+    df["drift_step"] = (df["drift"] - prev_drift).abs() > tol
+
+    findings: list[Finding] = []
+    flagged = df[df["negative_start"] | df["drift_step"]]
+    for idx, rec in zip(flagged.index, flagged.itertuples(index=False)):
+        row = rows[idx]
+        if rec.negative_start:
+            findings.append(
+                _row_meta(
+                    row,
+                    "tank_stock_reconciliation",
+                    "warning",
+                    f"Storage tank {rec.tank} running stock goes negative ({rec.expected_after:.2f} L) "
+                    "— missing receipt or transfer-in?",
+                    cfg,
+                    storage_tank=rec.tank,
+                    expected_after=round(rec.expected_after, 2),
+                )
+            )
+        if rec.drift_step:
+            findings.append(
+                _row_meta(
+                    row,
+                    "tank_stock_reconciliation",
+                    "warning",
+                    f"Storage tank {rec.tank}: {after_col} {rec.after:.2f} L vs running stock "
+                    f"{rec.expected_after:.2f} L (drift {rec.drift:+.2f} L)",
+                    cfg,
+                    storage_tank=rec.tank,
+                    expected_after=round(rec.expected_after, 2),
+                    reported_after=rec.after,
+                    drift=round(rec.drift, 2),
+                )
+            )
+    return findings
+
+
 def check_auto_created_asset_suspect(rows: list[dict], cfg: dict[str, Any]) -> list[Finding]:
     patterns = [re.compile(p, re.I) for p in cfg.get("auto_created_asset_patterns", [])]
     findings: list[Finding] = []
@@ -1041,10 +1335,12 @@ def run_all_rules(
     require_pump_readings: bool = False,
     require_tank_readings: bool = False,
     require_consumption_assessment: bool = False,
-    require_refund_rate_check: bool = False,
+    require_refund_rate_check: bool = True,
     require_operator_check: bool = False,
     require_location_check: bool = False,
     config: dict[str, Any] | None = None,
+    fingerprint_index: FingerprintIndex | None = None,
+    report_key: str | None = None,
 ) -> tuple[list[Finding], list[str]]:
     cfg = config or load_config()
     rows = parsed.combined_rows
@@ -1053,6 +1349,11 @@ def run_all_rules(
 
     findings.extend(check_initial_dispense_no_claim(rows, cfg))
     findings.extend(check_duplicate_transaction(rows, cfg))
+    findings.extend(check_near_duplicate_transaction(rows, cfg))
+    if fingerprint_index is not None and report_key:
+        findings.extend(check_cross_report_duplicate(rows, fingerprint_index, report_key, cfg))
+    else:
+        checks_skipped.append("cross_report_duplicate")
     findings.extend(check_mining_eligible_missing_claim(rows, cfg))
     if require_operator_check:
         findings.extend(check_mining_eligible_missing_operator(rows, cfg))
@@ -1098,6 +1399,7 @@ def run_all_rules(
         all_rows.extend(asset_rows)
     findings.extend(check_receipt_duplicate(parsed.fuel_receipts, cfg))
     findings.extend(check_tank_summary_imbalance(parsed, cfg))
+    findings.extend(check_tank_stock_reconciliation(rows, cfg))
     findings.extend(check_auto_created_asset_suspect(all_rows, cfg))
     findings.extend(check_eligible_review_unmarked_consecutive(parsed.eligible_review_dispenses, cfg))
     findings.extend(check_bowser_low_litre(all_rows, cfg))
@@ -1220,8 +1522,8 @@ def _build_interpretation_hints(
         )
     if rate_n > 1000 and "refund_rate_summary" not in checks_skipped:
         hints.append(
-            f"Refund rate vs summary: {rate_n} warning(s). Enable “Check refund rate vs summary” only "
-            "when validating rates on rows with claims."
+            f"Refund rate vs summary: {rate_n} warning(s). Check the dated rates on Combined Tank Summary, "
+            "or turn off “Check refund rate vs summary” for workbooks without them."
         )
     if optional_noise > rows_audited * 0.4 and pass_rate_pct < 50:
         hints.append(
@@ -11,9 +11,11 @@ SCRIPT_DIR = Path(__file__).resolve().parent
 if str(SCRIPT_DIR) not in sys.path:
     sys.path.insert(0, str(SCRIPT_DIR))
 
+from columnar_export import EXPORT_FORMATS, arrow_available, export_columnar
+from fingerprint_index import FingerprintIndex, report_key_for, site_from_file_name
 from parse_workbook import parse_workbook
 from report_writer import build_summary_json, write_audit_workbook
-from rules import run_all_rules
+from rules import fingerprint_entries, parse_dt, run_all_rules
 from workbook_normalize import prepare_output_workbook
 
 
@@ -44,7 +46,14 @@ def main(argv: list[str] | None = None) -> int:
     parser.add_argument(
         "--require-refund-rate-check",
         action="store_true",
-        help="Compare Refund Price to Combined Tank Summary on rows with claims",
+        default=True,
+        help="Compare Refund Price to Combined Tank Summary on rows with claims (default)",
+    )
+    parser.add_argument(
+        "--skip-refund-rate-check",
+        dest="require_refund_rate_check",
+        action="store_false",
+        help="Do not compare Refund Price to Combined Tank Summary",
     )
     parser.add_argument(
         "--require-operator-check",
@@ -56,6 +65,31 @@ def main(argv: list[str] | None = None) -> int:
         action="store_true",
         help="Flag mining-eligible dispense rows missing Location",
     )
+    parser.add_argument(
+        "--fingerprint-index",
+        metavar="PATH",
+        help="SQLite fingerprint index shared across audits; flags dispenses seen in other reports",
+    )
+    parser.add_argument(
+        "--report-key",
+        help="Identity of this report in the fingerprint index (default: site and period)",
+    )
+    parser.add_argument("--site", help="Site name for the default --report-key (default: from the file name)")
+    parser.add_argument(
+        "--source-name",
+        help="Original file name of the upload, used to infer --site (default: the input file name)",
+    )
+    parser.add_argument(
+        "--export-parquet",
+        metavar="DIR",
+        help="Write typed transactions, receipts and findings tables to DIR (requires pyarrow)",
+    )
+    parser.add_argument(
+        "--export-format",
+        choices=EXPORT_FORMATS,
+        default="parquet",
+        help="Table format for --export-parquet (default: parquet)",
+    )
     parser.add_argument(
         "--fail-on-warnings",
         action="store_true",
@@ -67,6 +101,9 @@ def main(argv: list[str] | None = None) -> int:
     if not input_path.exists():
         print(f"Input not found: {input_path}", file=sys.stderr)
         return 2
+    if args.export_parquet and not arrow_available():
+        print("--export-parquet requires pyarrow (pip install pyarrow)", file=sys.stderr)
+        return 2
 
     output_path = (
         Path(args.output).expanduser().resolve()
@@ -88,20 +125,40 @@ def main(argv: list[str] | None = None) -> int:
         f"Asset sheets: {len(parsed.asset_sheets)}"
     )
 
-    findings, checks_skipped = run_all_rules(
-        parsed,
-        require_pump_readings=args.require_pump_readings,
-        require_tank_readings=args.require_tank_readings,
-        require_consumption_assessment=args.require_consumption_assessment,
-        require_refund_rate_check=args.require_refund_rate_check,
-        require_operator_check=args.require_operator_check,
-        require_location_check=args.require_location_check,
+    fp_index = FingerprintIndex(args.fingerprint_index) if args.fingerprint_index else None
+    report_key = args.report_key or report_key_for(
+        (parse_dt(row.get("Date & Time")) for row in parsed.combined_rows),
+        site=args.site or site_from_file_name(args.source_name or input_path.name),
     )
+    try:
+        findings, checks_skipped = run_all_rules(
+            parsed,
+            require_pump_readings=args.require_pump_readings,
+            require_tank_readings=args.require_tank_readings,
+            require_consumption_assessment=args.require_consumption_assessment,
+            require_refund_rate_check=args.require_refund_rate_check,
+            require_operator_check=args.require_operator_check,
+            require_location_check=args.require_location_check,
+            fingerprint_index=fp_index,
+            report_key=report_key,
+        )
+        if fp_index is not None:
+            recorded = fp_index.replace_report(report_key, fingerprint_entries(parsed.combined_rows))
+            print(f"  Fingerprint index: {recorded} dispense(s) recorded as '{report_key}'")
+    finally:
+        if fp_index is not None:
+            fp_index.close()
     summary = build_summary_json(findings, parsed, checks_skipped=checks_skipped)
 
     print(f"Writing audit results → {output_path}")
     write_audit_workbook(output_path, findings, parsed)
 
+    if args.export_parquet:
+        exports = export_columnar(args.export_parquet, parsed, findings, fmt=args.export_format)
+        summary["exports"] = exports
+        for name, path in exports.items():
+            print(f"Exported {name} → {path}")
+
     if args.json:
         json_path = Path(args.json).expanduser().resolve()
         json_path.parent.mkdir(parents=True, exist_ok=True)
@@ -36,7 +36,7 @@ fi
 
 echo "Installing POA Review Python dependencies..."
 "$PIP" install --upgrade pip
-"$PIP" install pandas openpyxl
+"$PIP" install pandas openpyxl pyarrow
 
 echo "Verifying imports..."
 "$PY" -c "import pandas; import openpyxl; print('OK: pandas', pandas.__version__, 'openpyxl', openpyxl.__version__)"
@@ -43,7 +43,7 @@ const DFRRCheck = () => {
         !!saved?.requireConsumptionAssessment
     );
     const [requireRefundRateCheck, setRequireRefundRateCheck] = useState(
-        !!saved?.requireRefundRateCheck
+        saved?.requireRefundRateCheck ?? true
     );
     const [requireOperatorCheck, setRequireOperatorCheck] = useState(!!saved?.requireOperatorCheck);
     const [requireLocationCheck, setRequireLocationCheck] = useState(!!saved?.requireLocationCheck);
@@ -139,7 +139,7 @@ const DFRRCheck = () => {
         if (requirePumpReadings) form.append('requirePumpReadings', 'true');
         if (requireTankReadings) form.append('requireTankReadings', 'true');
         if (requireConsumptionAssessment) form.append('requireConsumptionAssessment', 'true');
-        if (requireRefundRateCheck) form.append('requireRefundRateCheck', 'true');
+        form.append('requireRefundRateCheck', requireRefundRateCheck ? 'true' : 'false');
         if (requireOperatorCheck) form.append('requireOperatorCheck', 'true');
         if (requireLocationCheck) form.append('requireLocationCheck', 'true');
 
@@ -349,8 +349,8 @@ const DFRRCheck = () => {
                             <span>
                                 <span className="font-medium">Check refund rate vs summary</span>
                                 <span className={`block text-xs ${muted}`}>
-                                    Compare Refund Price to Combined Tank Summary on rows with a claim only
-                                    (optional; off by default — avoids thousands of historical rate warnings).
+                                    Compare Refund Price to the Combined Tank Summary rate in effect on the
+                                    dispense date, on rows with a claim only (on by default).
                                 </span>
                             </span>
                         </label>
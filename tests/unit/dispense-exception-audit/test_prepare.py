@@ -15,16 +15,25 @@ FIXTURES = ROOT / "tests" / "fixtures" / "dispense-exception-audit"
 sys.path.insert(0, str(ROOT / "scripts" / "dispense-exception-audit"))
 
 from enrichment import (
+    EXC_CONSEC_60,
+    EXC_FILL_OUTSIDE,
+    EXC_ODO_LE_ZERO,
+    EXC_ODO_LE_ZERO_ONLY,
+    EXC_ROUTINE_SPLIT,
+    avr_match_key,
+    build_avr_match_index,
     enrich_transactions,
+    exception_descriptor,
     is_mining_eligible,
     review_reason,
     should_escalate,
     suggested_abco_comment,
 )
-from exception_rules import RuleFlags, compute_flags_for_asset
+from exception_rules import RuleFlags, compute_all, compute_flags_for_asset
 from month_diff import compare_month_over_month
 from parse_workbook import parse_details_sheet
 from site_rules import get_site_profile
+from vectorized_rules import compute_all_vectorized, rule_engine_parity
 
 
 def test_is_mining_eligible_excludes_non_mining():
@@ -62,6 +71,54 @@ def test_consecutive_dispense_flags():
     assert computed[0].flags.odo_non_positive
 
 
+def test_long_split_fill_chain_cumulative_litres():
+    from synthetic_workbook import build_chain_transactions
+
+    rows = build_chain_transactions(assets=1, chain_length=500)
+    computed = compute_flags_for_asset(rows)
+    expected = 0.0
+    for row, comp in zip(rows, computed):
+        expected += row["litres"]
+        if comp.flags.consec_60:
+            assert comp.cumulative_litres_in_batch == expected
+        assert comp.flags.over_tank_cumulative == (comp.flags.consec_60 and expected > 1000)
+    assert computed[-1].minutes_since_batch_start == 499 * 5
+
+
+def test_vectorized_engine_matches_row_engine():
+    from synthetic_workbook import build_chain_transactions
+
+    rows = build_chain_transactions(assets=3, chain_length=40)
+    rows += [
+        {"transaction_id": "n1", "asset_number": None, "date_time": None, "litres": 80.0},
+        {
+            "transaction_id": "r1",
+            "asset_number": "RESET",
+            "date_time": datetime(2026, 5, 2, 8, 0),
+            "opening_odo_num": 900.0,
+            "closing_odo_num": 0.0,
+            "meter_type": "km",
+            "litres": 300.0,
+            "tank_size_l": 250.0,
+        },
+        {
+            "transaction_id": "r2",
+            "asset_number": "RESET",
+            "date_time": datetime(2026, 5, 2, 9, 30),
+            "total_usage_num": 75.0,
+            "meter_type": "Hr",
+            "litres": 120.0,
+            "tank_size_l": 250.0,
+            "exception_60": "Consecutive dispenses within 60 minutes",
+        },
+    ]
+    rows.reverse()
+    assert compute_all_vectorized(rows) == compute_all(rows)
+    parity = rule_engine_parity(rows)
+    assert parity["identical"] and parity["differing_transactions"] == []
+    assert parity["exception_60"]["same_mismatches"]
+
+
 def test_fill_outside_exception_escalates():
     row = {
         "transaction_id": "x1",
@@ -84,6 +141,90 @@ def test_routine_split_escalates_after_zero_odo_starter():
     assert not should_escalate(second, None)
 
 
+def test_what_if_evaluates_every_profile_in_one_pass():
+    from site_rules import load_site_profiles
+
+    rows = [
+        {
+            "transaction_id": "x1",
+            "asset_number": "BD110",
+            "date_time": datetime(2026, 5, 1, 10, 0),
+            "litres": 100.0,
+            "exception_60": "Odo difference <= 0",
+        },
+        {
+            "transaction_id": "x2",
+            "asset_number": "BD110",
+            "date_time": datetime(2026, 5, 1, 10, 20),
+            "litres": 60.0,
+            "exception_60": "Odo difference <= 0, Consecutive dispenses within 60 minutes",
+        },
+    ]
+    enriched = enrich_transactions(
+        rows, {}, [], profile=get_site_profile("belfast"), what_if_profiles=load_site_profiles()
+    )
+    assert [row["transaction_id"] for row in enriched["review_queue"]] == ["x1", "x2"]
+    what_if = {entry["rule_profile"]: entry for entry in enriched["what_if"]}
+    assert what_if["belfast"]["review_queue_count"] == 2
+    assert what_if["belfast"]["added_vs_selected_count"] == what_if["belfast"]["removed_vs_selected_count"] == 0
+    strict = what_if["strict"]
+    assert (strict["review_queue_count"], strict["review_queue_litres"]) == (1, 100.0)
+    assert strict["removed_vs_selected_ids"] == ["x2"]
+    assert strict["removed_vs_selected_litres"] == 60.0
+    assert strict["review_reasons"] == {"Odo difference <= 0": 1}
+
+
+def test_review_queue_and_non_mining_are_views_over_the_parsed_rows():
+    rows = [
+        {"transaction_id": "m1", "asset_number": "DT01", "exception_60": "Odo difference <= 0"},
+        {"transaction_id": "n1", "asset_group": "Non Mining - Non Eligible", "refund_eligibility": "Non-Eligible"},
+        {"transaction_id": "m2", "asset_number": "DT02", "exception_60": None},
+    ]
+    enriched = enrich_transactions(rows, {}, [])
+    assert enriched["review_queue"][0] is rows[0]
+    assert [row["transaction_id"] for row in enriched["review_queue"][:5]] == ["m1"]
+    assert list(enriched["excluded_non_mining_rows"]) == [rows[1]]
+    assert enriched["transactions"] == [rows[0], rows[2]]
+
+
+def test_asset_sharded_enrichment_matches_serial_run():
+    import copy
+
+    from synthetic_workbook import build_exception_export
+    from enrichment import shard_assets
+    from site_rules import load_site_profiles
+
+    rows = build_exception_export(1500, assets=30, seed=4)
+    for row in rows[::9]:
+        row["asset_group"] = "Non Mining - Non Eligible"
+    avr_rows = [
+        {"avr_id": str(900 + i), "trans_num": str(i * 7), "asset_code": None, "date": None, "pan": None}
+        for i in range(40)
+    ]
+    shards = shard_assets(rows, 4)
+    assert len(shards) == 4 and sorted(i for shard in shards for i in shard) == list(range(len(rows)))
+    assert not set.intersection(*({rows[i]["asset_number"] for i in shard} for shard in shards))
+
+    serial_rows, parallel_rows = copy.deepcopy(rows), copy.deepcopy(rows)
+    options = {"profile": get_site_profile("strict"), "what_if_profiles": load_site_profiles()}
+    serial = enrich_transactions(serial_rows, {}, avr_rows, **options)
+    parallel = enrich_transactions(parallel_rows, {}, avr_rows, workers=3, **options)
+
+    def ids(group):
+        return [row["transaction_id"] for row in group]
+
+    assert ids(parallel["review_queue"]) == ids(serial["review_queue"])
+    # Results are written back into the caller's row dicts.
+    by_id = {row["transaction_id"]: row for row in parallel_rows}
+    assert all(row is by_id[row["transaction_id"]] for row in parallel["review_queue"])
+    assert parallel["computed"] == serial["computed"]
+    assert [{k: v for k, v in r.items() if k != "_computed"} for r in parallel_rows] == [
+        {k: v for k, v in r.items() if k != "_computed"} for r in serial_rows
+    ]
+    for key in ("what_if", "flagged_count", "avr_sync_count", "avr_match_kinds", "excluded_non_mining"):
+        assert parallel[key] == serial[key]
+
+
 def test_odo_gt_50_respects_just_ok_comment():
     row = {
         "transaction_id": "x1",
@@ -113,6 +254,33 @@ def test_review_reason_fill_outside():
     assert review_reason(row, None) == "Fill outside one hour"
 
 
+def test_exception_descriptor_categories_are_memoized():
+    split = exception_descriptor("Odo difference <= 0, Consecutive dispenses within 60 min")
+    assert split.mask == EXC_ODO_LE_ZERO | EXC_CONSEC_60 | EXC_ROUTINE_SPLIT
+    assert exception_descriptor(" odo difference <= 0 ,").mask == EXC_ODO_LE_ZERO | EXC_ODO_LE_ZERO_ONLY
+    outside = exception_descriptor("Odo difference <= 0, Consecutive dispenses within 60, Fill outside of 1 hour")
+    assert outside.mask & EXC_FILL_OUTSIDE and not outside.mask & EXC_ROUTINE_SPLIT
+    assert not exception_descriptor(None) and not exception_descriptor(" , ")
+    assert exception_descriptor("Odo difference <= 0, Consecutive dispenses within 60 min") is split
+
+
+def test_avr_match_reports_matched_key():
+    index = build_avr_match_index(
+        [
+            {"avr_id": "5501", "trans_num": None, "asset_code": "DT01", "date": datetime(2026, 4, 2, 7), "pan": None},
+            {"avr_id": None, "trans_num": "7700", "asset_code": None, "date": None, "pan": "TAG-0042"},
+        ]
+    )
+    by_id = {"transaction_id": "TX-5501", "asset_number": "DT99", "date_time": datetime(2026, 4, 2)}
+    by_tag = {"transaction_id": "TX-1", "asset_tag": "0042"}
+    by_date = {"transaction_id": "TX-2", "asset_number": "DT01", "date_time": datetime(2026, 4, 2, 18)}
+    other_day = {"transaction_id": "TX-3", "asset_number": "DT01", "date_time": datetime(2026, 4, 3)}
+    assert avr_match_key(by_id, index) == "transaction_id:5501"
+    assert avr_match_key(by_tag, index) == "asset_tag:0042"
+    assert avr_match_key(by_date, index) == "asset_date:DT01@2026-04-02"
+    assert avr_match_key(other_day, index) is None
+
+
 def test_repeated_asset_header_preserves_exception_columns():
     rows = [
         ["Date & Time", "Transaction ID", None, "Asset Number", None, None, None, None, None, None, "Litres", None, None, "Total Usage Km/Hr", "Exception Reason (120 min)", "Exception Reason (60 min)"],
@@ -127,6 +295,375 @@ def test_repeated_asset_header_preserves_exception_columns():
     assert parsed[0]["exception_120"] == "Odo difference > 50 hrs"
 
 
+def test_parser_and_writer_share_the_header_alias_resolver():
+    from parse_workbook import map_header_row, resolve_header_row
+    from prepare_workbook import _map_header_row
+
+    header = ["Date & Time", " TRANSACTION  ID ", None, "Asset Number", "% Varinace", "Unknown", "Litres", "litres"]
+    resolve_header_row.cache_clear()
+    parsed = map_header_row(header)
+    assert parsed == {
+        0: "date_time",
+        1: "transaction_id",
+        3: "asset_number",
+        4: "pct_variance",
+        6: "litres",
+        7: "litres",
+    }
+    assert _map_header_row(header) == {field: idx + 1 for idx, field in parsed.items() if idx != 6}
+    for _ in range(3):
+        map_header_row(header)
+    assert resolve_header_row.cache_info().hits == 4
+
+
+def test_details_parser_fills_banner_asset_and_coerces_columns():
+    header = ["Date & Time", "Transaction ID", "Asset Number", "Litres", "Opening Odo", "Closing Odo", "Exception Reason"]
+    rows = [
+        ["Exported 2026-05-31", None, None, None, None, None, None],
+        header,
+        ["BD110", None, None, None, None, None, None],
+        ["2026-05-09 09:04", "TX-1", None, "1,307.5", "1,234.5 hr", 1240, "Odo difference <= 0"],
+        [datetime(2026, 5, 9, 10, 0), "Transaction ID", None, None, None, None, None],
+        ["CBK304", None, None, None, None, None, None],
+        [datetime(2026, 5, 9, 11, 0), "TX-2", " CBK999 ", 12, None, "n/a", None],
+    ]
+    parsed = parse_details_sheet(pd.DataFrame(rows))
+    assert [r["transaction_id"] for r in parsed] == ["TX-1", "TX-2"]
+    first, second = parsed
+    assert first["asset_number"] == "BD110"
+    assert first["date_time"] == datetime(2026, 5, 9, 9, 4)
+    assert first["litres"] == 1307.5
+    assert (first["opening_odo_num"], first["closing_odo_num"]) == (1234.5, 1240.0)
+    assert first["exception_120"] == "Odo difference <= 0"
+    assert second["asset_number"] == "CBK999"
+    assert second["closing_odo_num"] is None and second["opening_odo_num"] is None
+
+
+def test_load_workbook_opens_source_once(tmp_path, monkeypatch):
+    import openpyxl
+
+    import parse_workbook
+
+    source = tmp_path / "site.xlsx"
+    wb = openpyxl.Workbook()
+    details = wb.active
+    details.title = "Details as Assets"
+    details.append(["Date & Time", "Transaction ID", "Asset Number", "Litres"])
+    details.append(["BD110", None, None, None])
+    details.append([datetime(2026, 5, 9, 9, 4), "TX-1", "BD110", 120.5])
+    spa = wb.create_sheet("Summary Per Asset")
+    spa.append(["Asset Number", "Asset Description", "Department", "Transactions", "Litres"])
+    spa.append(["BD110", "Dozer", "Mining", 1, 120.5])
+    wb.save(source)
+
+    opened = []
+
+    class CountingExcelFile(pd.ExcelFile):
+        def __init__(self, path_or_buffer, *args, **kwargs):
+            opened.append(path_or_buffer)
+            super().__init__(path_or_buffer, *args, **kwargs)
+
+    def no_read_excel(*args, **kwargs):
+        raise AssertionError("sheet re-read from path")
+
+    monkeypatch.setattr(parse_workbook.pd, "ExcelFile", CountingExcelFile)
+    monkeypatch.setattr(parse_workbook.pd, "read_excel", no_read_excel)
+    parsed = parse_workbook.load_workbook(str(source))
+
+    assert opened == [str(source)]
+    assert [t["transaction_id"] for t in parsed["transactions"]] == ["TX-1"]
+    assert parsed["summary_per_asset"][0]["asset_number"] == "BD110"
+
+
+def test_asset_lookup_picks_sheet_by_header_probe(tmp_path):
+    import openpyxl
+
+    from parse_workbook import parse_asset_lookup
+
+    path = tmp_path / "asset-lookup.xlsx"
+    wb = openpyxl.Workbook()
+    notes = wb.active
+    notes.title = "Notes"
+    notes.append(["Exported by", "InsightWare"])
+    assets = wb.create_sheet("Assets")
+    assets.append(["Asset Number", "Asset Group", "Tank Size"])
+    assets.append(["BD110", "Mining Dozers", 800])
+    wb.save(path)
+
+    lookup = parse_asset_lookup(str(path))
+    assert lookup["BD110"]["asset_group"] == "Mining Dozers"
+    assert lookup["BD110"]["tank_size_l"] == 800
+
+
+def test_lookup_cache_reuses_parse_and_keeps_pinned_site_lookup(tmp_path, monkeypatch):
+    import openpyxl
+
+    import lookup_cache
+    from lookup_cache import ASSET_LOOKUP, AVR_SYNC, LookupCache, load_lookups
+
+    asset_path = tmp_path / "asset-lookup.xlsx"
+    wb = openpyxl.Workbook()
+    wb.active.append(["Asset Number", "Asset Group", "Tank Size"])
+    wb.active.append(["BD110", "Mining Dozers", 800])
+    wb.save(asset_path)
+    avr_path = tmp_path / "avr.xlsx"
+    wb = openpyxl.Workbook()
+    wb.active.append(["ID", "Trans #", "Code", "Date", "PAN"])
+    wb.active.append([12345, 678, "BD110", datetime(2026, 5, 1, 9, 0), "TAG 0042"])
+    wb.save(avr_path)
+
+    db = tmp_path / "lookups.sqlite"
+    with LookupCache(db) as cache:
+        first = load_lookups(cache, str(asset_path), str(avr_path), site="Belfast", pin=True)
+    assert first["status"] == {ASSET_LOOKUP: "miss", AVR_SYNC: "miss"}
+
+    def no_parse(*_args):
+        raise AssertionError("cached lookup was re-parsed")
+
+    monkeypatch.setattr(lookup_cache, "_parse", no_parse)
+    with LookupCache(db) as cache:
+        again = load_lookups(cache, str(asset_path), str(avr_path))
+        pinned = load_lookups(cache, None, None, site="belfast")
+    assert again["status"] == {ASSET_LOOKUP: "hit", AVR_SYNC: "hit"}
+    assert pinned["status"] == {ASSET_LOOKUP: "pinned", AVR_SYNC: "pinned"}
+    assert pinned["asset_lookup"]["BD110"]["tank_size_l"] == 800
+    assert pinned["avr_rows"] == first["avr_rows"]
+    assert avr_match_key({"transaction_id": "59-20260501-12345"}, pinned["avr_index"]) == "transaction_id:12345"
+    # The pin remembers its workbook so the lookup sheets can still be copied, until it changes.
+    assert pinned["sources"] == {ASSET_LOOKUP: str(asset_path.resolve()), AVR_SYNC: str(avr_path.resolve())}
+    avr_path.write_bytes(b"replaced")
+    with LookupCache(db) as cache:
+        stale = load_lookups(cache, None, None, site="Belfast")
+    assert stale["status"][AVR_SYNC] == "pinned"
+    assert stale["sources"] == {ASSET_LOOKUP: str(asset_path.resolve()), AVR_SYNC: None}
+
+    # Past max_bytes the least recently used unpinned entry goes; pinned ones stay.
+    with LookupCache(db, max_bytes=0) as cache:
+        cache.put("other", ASSET_LOOKUP, {"X1": {}})
+        assert cache.get("other", ASSET_LOOKUP) is None
+        assert cache.get(lookup_cache.file_digest(asset_path), ASSET_LOOKUP) is not None
+
+
+def _write_details_workbook(path, site_txn_prefix, litres):
+    import openpyxl
+
+    wb = openpyxl.Workbook()
+    details = wb.active
+    details.title = "Details as Assets"
+    header = ["Date & Time", "Transaction ID", "Asset Number", "Litres", "Exception Reason (60 min)"]
+    details.append(header)
+    details.append(["BD110"])
+    details.append(header)
+    details.append([datetime(2026, 5, 9, 9, 4), f"{site_txn_prefix}-1", "BD110", litres, "Fill outside of one hour from start"])
+    details.append([datetime(2026, 5, 9, 15, 0), f"{site_txn_prefix}-2", "BD110", 50.0, None])
+    wb.save(path)
+
+
+def test_batch_prepares_each_site_and_merges_review_summary(tmp_path):
+    from run_batch import load_manifest, run_batch
+
+    _write_details_workbook(tmp_path / "belfast-may.xlsx", "BF", 100.0)
+    _write_details_workbook(tmp_path / "leeuwpan-may.xlsx", "LP", 40.25)
+    manifest_path = tmp_path / "manifest.json"
+    manifest_path.write_text(
+        json.dumps(
+            {
+                "output_dir": "out",
+                "workbooks": [
+                    {"input": "belfast-may.xlsx", "site_name": "Belfast"},
+                    {"input": "leeuwpan-may.xlsx", "site_name": "Leeuwpan"},
+                    {"input": "missing.xlsx", "site_name": "Missing"},
+                ],
+            }
+        ),
+        encoding="utf-8",
+    )
+
+    summary = run_batch(load_manifest(manifest_path), workers=1)
+
+    assert [site["site_name"] for site in summary["sites"]] == ["Belfast", "Leeuwpan", "Missing"]
+    assert summary["failed_count"] == 1 and summary["has_errors"]
+    assert summary["sites"][2]["error"].startswith("FileNotFoundError")
+    for site in summary["sites"][:2]:
+        assert Path(site["output"]).exists()
+        assert json.loads(Path(site["summary_json"]).read_text())["site_name"] == site["site_name"]
+    assert summary["totals"]["transaction_count"] == 4
+    assert summary["totals"]["review_queue_count"] == 2
+    assert summary["totals"]["review_queue_litres"] == 140.25
+    fill_outside = summary["possible_causes"][0]
+    assert fill_outside["exception_reason"] == "Fill outside of one hour from start"
+    assert fill_outside["transaction_count"] == 2
+    assert fill_outside["sites"] == ["Belfast", "Leeuwpan"]
+
+
+def test_run_prepare_reports_phase_timings_and_profile(tmp_path, capsys):
+    import pstats
+
+    from run_prepare import main
+
+    _write_details_workbook(tmp_path / "belfast-may.xlsx", "BF", 100.0)
+    json_path = tmp_path / "summary.json"
+    stats_path = tmp_path / "prep.prof"
+    assert main(
+        ["-i", str(tmp_path / "belfast-may.xlsx"), "-j", str(json_path), "--profile", str(stats_path)]
+    ) == 0
+
+    performance = json.loads(json_path.read_text())["performance"]
+    phases = {p["phase"]: p for p in performance["phases"]}
+    assert list(phases) == [
+        "load_workbook",
+        "parse_asset_lookup",
+        "parse_avr_sync_lookup",
+        "enrich_transactions",
+        "review_summaries",
+        "write_prepared_workbook",
+    ]
+    assert phases["load_workbook"]["rows"] == 2
+    assert phases["review_summaries"]["rows"] == 1
+    assert performance["total_seconds"] >= sum(p["seconds"] for p in phases.values()) - 0.01
+    assert performance["slowest_phase"] in phases
+    assert performance["peak_rss_mb"] > 0
+    assert pstats.Stats(str(stats_path)).total_calls > 0
+    assert "cProfile stats written to" in capsys.readouterr().err
+
+
+def test_synthetic_export_round_trips(tmp_path):
+    from parse_workbook import load_workbook
+    from synthetic_workbook import generate_synthetic_export
+
+    export = generate_synthetic_export(
+        tmp_path, assets=6, dispenses_per_asset=15, split_fill_rate=0.3, avr_rate=0.2, seed=3
+    )
+    assert (export["transactions"], export["banners"], export["column_headers"]) == (90, 6, 7)
+    transactions = load_workbook(export["input"])["transactions"]
+    assert len(transactions) == 90
+    assert [t["asset_number"] for t in transactions[:15]] == ["DT0000"] * 15
+    # Split-fill followers keep the exception columns that sub-headers leave untitled.
+    assert any(t["total_usage_num"] == 0 and "Consecutive" in (t["exception_60"] or "") for t in transactions)
+
+
+def test_prep_benchmark_reports_phase_regressions(tmp_path):
+    from bench_prep import compare_to_baseline, run_benchmark
+    from synthetic_workbook import generate_synthetic_export
+
+    export = generate_synthetic_export(tmp_path, assets=6, dispenses_per_asset=15, avr_rate=0.2, seed=3)
+    result = run_benchmark(export, tmp_path)
+    phases = {p["phase"]: p for p in result["phases"]}
+    assert phases["load_workbook"]["rows"] == 90
+    assert phases["write_prepared_workbook"]["peak_rss_mb"] > 0
+    assert result["avr_sync_count"] > 0
+    assert compare_to_baseline(result, result) == []
+    faster = {"phases": [{**p, "rows_per_second": (p["rows_per_second"] or 0) * 10} for p in result["phases"]]}
+    assert any(r.startswith("enrich_transactions") for r in compare_to_baseline(result, faster))
+
+
+def test_rule_corpus_aggregates_mismatch_categories_with_cached_inputs(tmp_path):
+    import openpyxl
+
+    from rule_corpus import find_workbooks, run_corpus
+    from synthetic_workbook import generate_synthetic_export
+
+    for seed, month in enumerate(("2026-04", "2026-05")):
+        generate_synthetic_export(tmp_path / month, assets=4, dispenses_per_asset=12, split_fill_rate=0.3, seed=seed)
+    edited = tmp_path / "2026-05" / "synthetic-4x12.xlsx"
+    wb = openpyxl.load_workbook(edited)
+    cleared = 0
+    for row in wb["Details as Assets"].iter_rows(min_row=2):
+        if row[15].value == "Consecutive dispenses within 60 minutes" and cleared < 2:
+            row[15].value = None
+            cleared += 1
+    wb.save(edited)
+    assert cleared == 2
+
+    paths = find_workbooks(tmp_path)
+    assert len(paths) == 6
+    cache = str(tmp_path / "corpus.sqlite")
+    first = run_corpus(paths, cache_path=cache, workers=1)
+    second = run_corpus(paths, rule_engine="vectorized", cache_path=cache, workers=1)
+
+    # Both months share an identical Asset Info Lookup, parsed once.
+    assert [w["cache"] for w in first["workbooks"]].count("miss") == 5
+    assert [w["cache"] for w in second["workbooks"]] == ["hit"] * 6
+    assert first["skipped_count"] == 4 and not first["has_errors"]
+    assert first["exception_120"]["match_pct"] == 100.0
+    for summary in (first, second):
+        categories = summary["exception_60"]["mismatch_categories"]
+        assert [(c["missing"], c["extra"], c["count"]) for c in categories] == [
+            (["consecutive dispenses within 60 minutes"], [], 2)
+        ]
+        assert {e["input"] for e in categories[0]["examples"]} == {str(edited)}
+
+
+def test_light_touch_details_updates_only_exception_cells_and_fills():
+    import openpyxl
+    from openpyxl.styles import Border, Side
+
+    from prepare_workbook import FILL_ORANGE, _apply_light_touch_details
+
+    header = ["Date & Time", "Transaction ID", "Litres", "Exception Reason (60 min)", "Abco Comment", "% Variance"]
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append(header)
+    ws.append(["BD110"])
+    ws.append(header)
+    ws.append([datetime(2026, 5, 1, 10, 0), "T1", 120.0, None, None, 0.1])
+    ws.append([datetime(2026, 5, 1, 12, 0), "T2", 80.0, None, "Checked", 0.2])
+    ws.cell(4, 3).border = Border(bottom=Side(style="thin"))
+
+    _apply_light_touch_details(
+        ws,
+        {
+            "T1": {"_review": True, "exception_60": "Fill outside of one hour from start", "suggested_abco_comment": "Split fill"},
+            "T2": {},
+        },
+    )
+
+    assert ws.cell(1, 4).value == "Exception Reason"
+    assert [c.value for c in ws[4]][3:5] == ["Fill outside of one hour from start", "Split fill"]
+    assert all(c.fill == FILL_ORANGE for c in ws[4])
+    assert ws.cell(4, 3).border.bottom.style == "thin"
+    assert ws.cell(4, 3).value == 120.0
+    assert ws.cell(5, 5).value == "Checked"
+    assert ws.cell(5, 1).fill.fill_type is None
+    assert ws.cell(2, 1).value == "BD110"
+    assert len(ws.conditional_formatting) == 2
+
+
+def test_copy_lookup_sheet_finds_header_sheet_and_keeps_styles(tmp_path):
+    import openpyxl
+    from openpyxl.styles import Font, PatternFill
+
+    from prepare_workbook import _copy_lookup_sheet
+
+    source = tmp_path / "assets.xlsx"
+    src = openpyxl.Workbook()
+    src.active.title = "Notes"
+    src.active.append(["Exported by InsightWare"])
+    ws = src.create_sheet("Assets")
+    ws.append(["Asset Number", "Asset Group", "Economy"])
+    for i in range(3):
+        ws.append([f"A{i}", "Mining- Eligible", 1.5 + i])
+    for cell in ws[1]:
+        cell.font = Font(bold=True)
+    ws.cell(3, 3).fill = PatternFill("solid", fgColor="FFFF00")
+    ws.cell(3, 3).number_format = "0.00"
+    src.save(source)
+
+    wb = openpyxl.Workbook()
+    _copy_lookup_sheet(str(source), wb, "Asset Info Lookup", {"asset number", "asset group"})
+    tgt = wb["Asset Info Lookup"]
+    assert [[c.value for c in row] for row in tgt.iter_rows()] == [
+        ["Asset Number", "Asset Group", "Economy"],
+        ["A0", "Mining- Eligible", 1.5],
+        ["A1", "Mining- Eligible", 2.5],
+        ["A2", "Mining- Eligible", 3.5],
+    ]
+    assert all(cell.font.bold for cell in tgt[1])
+    assert tgt.cell(3, 3).fill.fgColor.rgb == "00FFFF00"
+    assert tgt.cell(3, 3).number_format == "0.00"
+    assert tgt.cell(4, 3).fill.fill_type is None
+
+
 def test_month_over_month_diff(tmp_path):
     import openpyxl
 
@@ -134,8 +671,8 @@ def test_month_over_month_diff(tmp_path):
     wb = openpyxl.Workbook()
     ws = wb.active
     ws.title = "Transactions deemed ineligible"
-    ws.append(["Transaction ID", "Litres"])
-    ws.append(["a", 5])
+    ws.append(["Transaction ID", "Asset Number", "Litres"])
+    ws.append(["a", "BD110", 5])
     wb.save(prior_path)
 
     current = [
@@ -147,6 +684,95 @@ def test_month_over_month_diff(tmp_path):
     assert diff["prior_review_count"] == 1
     assert diff["new_in_review_count"] == 1
     assert diff["repeat_in_review_count"] == 1
+    assert diff["new_assets_in_review"] == ["BD119"]
+    assert (diff["new_review_litres"], diff["repeat_review_litres"]) == (20, 10)
+
+
+def test_review_history_multi_month_repeat_offenders(tmp_path):
+    from review_history import ReviewHistory, infer_period
+
+    db = tmp_path / "reviews.sqlite"
+    with ReviewHistory(db) as store:
+        store.record_run("Belfast", "2026-02", [{"transaction_id": "f1", "asset_number": "BD110", "litres": 7}])
+        store.record_run("Belfast", "2026-03", [{"transaction_id": "m1", "asset_number": "BD110", "litres": 5}])
+        store.record_run(
+            "Belfast",
+            "2026-04",
+            [
+                {"transaction_id": "a1", "asset_number": "BD110", "litres": 10},
+                {"transaction_id": "a2", "asset_number": "CBK304", "litres": 30},
+            ],
+        )
+        store.record_run("Leeuwpan", "2026-04", [{"transaction_id": "x1", "asset_number": "BD119", "litres": 1}])
+
+    may = [
+        {"transaction_id": "a2", "asset_number": "CBK304", "litres": 30, "date_time": datetime(2026, 5, 2, 8, 0)},
+        {"transaction_id": "b1", "asset_number": "BD110", "litres": 12, "date_time": datetime(2026, 5, 3, 8, 0)},
+        {"transaction_id": "b2", "asset_number": "BD119", "litres": 4, "date_time": datetime(2026, 4, 30, 23, 0)},
+    ]
+    assert infer_period(may) == "2026-05"
+    with ReviewHistory(db) as store:
+        history = store.compare(" belfast ", "2026-05", may, months=2)
+        store.record_run("Belfast", "2026-05", may)
+        assert store.prior_periods("Belfast", "2026-06", months=1) == ["2026-05"]
+
+    assert history["prior_periods"] == ["2026-04", "2026-03"]
+    assert history["prior_review_count"] == 3
+    assert history["repeat_in_review_ids"] == ["a2"]
+    assert history["dropped_from_review_ids"] == ["a1", "m1"]
+    assert history["new_assets_in_review"] == ["BD119"]
+    assert [(o["asset_number"], o["months_in_review"]) for o in history["repeat_offender_assets"]] == [
+        ("BD110", 3),
+        ("CBK304", 2),
+    ]
+    assert history["repeat_offender_assets"][0]["prior_litres"] == 15
+
+
+def test_history_economy_baseline_fills_missing_average(tmp_path):
+    from dataclasses import replace
+
+    from review_history import ReviewHistory
+
+    def dispense(txn_id, asset, when, litres, usage, meter="hr"):
+        return {
+            "transaction_id": txn_id,
+            "asset_number": asset,
+            "date_time": when,
+            "litres": litres,
+            "total_usage_num": usage,
+            "meter_type": meter,
+            "refund_eligibility": "Eligible",
+        }
+
+    prior = [dispense(f"p{k}", "DT01", datetime(2026, 3, 1 + k, 8), 100.0, 10.0) for k in range(5)]
+    prior.append(dispense("old", "DT01", datetime(2025, 6, 1, 8), 500.0, 1.0))
+    prior += [dispense(f"h{k}", "LV02", datetime(2026, 3, 1 + k, 8), 10.0, 80.0, "km") for k in range(4)]
+    prior += [dispense(f"e{k}", "EX09", datetime(2026, 3, 1 + k, 8), 50.0, 10.0) for k in range(5)]
+    non_mining = [dispense(f"n{k}", "DT01", datetime(2026, 3, 10 + k, 8), 900.0, 1.0) for k in range(5)]
+    for row in non_mining:
+        row["refund_eligibility"] = "Non-Eligible"
+    with ReviewHistory(tmp_path / "reviews.sqlite") as store:
+        assert store.record_dispenses("Belfast", prior + non_mining) == 15
+        baselines = store.economy_baselines("belfast", datetime(2026, 5, 1))
+    assert baselines == {("DT01", False): 10.0, ("EX09", False): 5.0}
+
+    rows = [
+        dispense("c1", "DT01", datetime(2026, 5, 2, 8), 200.0, 10.0),
+        dispense("c2", "DT01", datetime(2026, 5, 3, 8), 100.0, 10.0),
+        dispense("c3", "LV02", datetime(2026, 5, 3, 9), 10.0, 80.0, "km"),
+    ]
+    rows[1]["avg_economy_180d"] = "12.5 L/hr"
+    enriched = enrich_transactions(
+        rows,
+        {},
+        [],
+        profile=replace(get_site_profile("strict"), economy_escalation=True),
+        economy_baselines=baselines,
+    )
+    assert [row.get("avg_economy_180d") for row in rows] == [10.0, 12.5, None]
+    assert [row["pct_variance"] for row in rows] == [1.0, -0.2, None]
+    assert enriched["economy_baselines"] == {"history_baseline_rows": 1, "history_baseline_assets": 1}
+    assert [row["transaction_id"] for row in enriched["review_queue"]] == ["c1"]
 
 
 @pytest.mark.integration
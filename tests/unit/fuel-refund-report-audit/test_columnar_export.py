@@ -0,0 +1,44 @@
+"""Tests for Parquet / Feather export of audit tables."""
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "..", "scripts", "fuel-refund-report-audit"))
+
+pytest.importorskip("pyarrow")
+
+from columnar_export import TRANSACTION_COLUMNS, export_columnar  # noqa: E402
+from parse_workbook import ParsedWorkbook  # noqa: E402
+from rules import run_all_rules  # noqa: E402
+
+from test_rules import _row  # noqa: E402
+
+
+@pytest.mark.parametrize("fmt", ["parquet", "feather"])
+def test_export_tables_have_stable_schema(tmp_path, fmt):
+    dup = _row(**{"Transaction ID": "EXP-1", "Fuel Dispensed or Received (L)": "-1,200.5"})
+    parsed = ParsedWorkbook(
+        source_path=str(tmp_path / "site-april.xlsx"),
+        combined_rows=[dup, dict(dup, _excel_row=11, **{"Transaction ID": "EXP-2"})],
+    )
+    findings, _ = run_all_rules(parsed)
+    written = export_columnar(tmp_path / "out", parsed, findings, fmt=fmt)
+    assert set(written) == {"transactions", "receipts", "findings"}
+
+    read = pd.read_parquet if fmt == "parquet" else pd.read_feather
+    tx = read(written["transactions"])
+    assert list(tx.columns[1 : len(TRANSACTION_COLUMNS) + 1]) == [c[0] for c in TRANSACTION_COLUMNS]
+    assert tx["litres"].tolist() == [-1200.5, -1200.5]
+    assert str(tx["date_time"].dtype).startswith("datetime64")
+    assert set(tx["audit_severity"]) == {"error"}
+    assert tx["source_file"].iloc[0] == "site-april.xlsx"
+
+    receipts = read(written["receipts"])
+    assert len(receipts) == 0
+    assert "litres_received" in receipts.columns
+
+    fx = read(written["findings"])
+    assert "duplicate_transaction" in set(fx["check_id"])
+    assert fx["excel_row"].dtype.name == "Int64"
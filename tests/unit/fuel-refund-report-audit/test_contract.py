@@ -72,7 +72,23 @@ def test_contract_mining_operator_flags_dispense(cfg):
     assert "mining_eligible_missing_operator" in ids
 
 
-def test_contract_refund_rate_skipped_by_default():
+def test_contract_refund_rate_runs_by_default():
+    row = _row(
+        **{
+            "Transaction ID": "CONTRACT-RATE",
+            "Refund Price": 9.99,
+            "Eligible L": 100,
+            "Refund Total": 100,
+        }
+    )
+    parsed = _parsed([row])
+    parsed.refund_rates = [{"label": "Rate", "rate": 3.66, "excel_row": 1}]
+    findings, skipped = run_all_rules(parsed)
+    assert "refund_rate_summary" not in skipped
+    assert any(f.check_id == "refund_rate_summary" for f in findings)
+
+
+def test_contract_refund_rate_skipped_when_disabled():
     row = _row(
         **{
             "Transaction ID": "CONTRACT-RATE",
@@ -116,6 +132,47 @@ def test_contract_refund_rate_only_with_claim(cfg):
     assert "CONTRACT-RATE-NO-CLAIM" not in tids
 
 
+def test_contract_refund_rate_uses_rate_in_effect(cfg):
+    from datetime import datetime
+
+    from openpyxl import Workbook
+    from parse_workbook import _parse_tank_summary
+
+    ws = Workbook().active
+    ws.append(["Rate from 01/03/2026", 3.50])
+    ws.append(["Rate from 2026-04-01", 3.66])
+    ws.append(["Rate from 15 April 2026 TANK 2", 3.80])
+    ws.append(["Tank", "Eligible Usage (L)"])
+    ws.append(["TANK 2", 100, 0, 100, 380])
+    ws.append(["Total", 100, 0, 100, 380])
+    rates = _parse_tank_summary(ws)["rates"]
+    assert rates[0]["effective_from"] == datetime(2026, 3, 1)
+    assert rates[2]["tank"] == "TANK 2"
+
+    def claim(tid, when, tank, price):
+        return _row(
+            **{
+                "Transaction ID": tid,
+                "Date & Time": when,
+                "Storage Tank": tank,
+                "Refund Price": price,
+                "Eligible L": 100,
+            }
+        )
+
+    rows = [
+        claim("RATE-MARCH", "2026-03-20 08:00:00", "TANK 1", 3.50),
+        claim("RATE-APRIL", "2026-04-20 08:00:00", "TANK 1", 3.66),
+        claim("RATE-TANK2", "2026-04-20 08:00:00", "TANK 2", 3.80),
+        claim("RATE-TANK2-EARLY", "2026-04-02 08:00:00", "TANK 2", 3.80),
+    ]
+    parsed = _parsed(rows)
+    parsed.refund_rates = rates
+    findings = check_refund_rate_summary(rows, parsed, cfg)
+    assert [f.transaction_id for f in findings] == ["RATE-TANK2-EARLY"]
+    assert findings[0].fields["summary_rate"] == 3.66
+
+
 def test_contract_bowser_low_litre(cfg):
     rows = [
         _row(
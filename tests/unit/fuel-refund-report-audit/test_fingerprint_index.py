@@ -0,0 +1,125 @@
+"""Tests for the cross-report dispense fingerprint index."""
+import json
+import os
+import sys
+from datetime import datetime
+
+import openpyxl
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "..", "scripts", "fuel-refund-report-audit"))
+
+import run_audit  # noqa: E402
+from fingerprint_index import BloomFilter, FingerprintIndex, report_key_for, site_from_file_name  # noqa: E402
+from parse_workbook import ParsedWorkbook  # noqa: E402
+from rules import check_cross_report_duplicate, fingerprint_entries, load_config, run_all_rules  # noqa: E402
+
+from test_rules import _row  # noqa: E402
+
+
+@pytest.fixture
+def cfg():
+    return load_config()
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter.for_capacity(1000)
+    keys = [i * 7919 - 500_000 for i in range(1000)]
+    for key in keys:
+        bloom.add(key)
+    assert all(key in bloom for key in keys)
+    false_hits = sum(1 for key in range(10_000_000, 10_010_000) if key in bloom)
+    assert false_hits < 300
+
+
+def test_cross_report_duplicate_between_reports(tmp_path, cfg):
+    claimed = _row(**{"Transaction ID": "TX-1", "Eligible L": 100})
+    unclaimed = _row(**{"Transaction ID": "TX-2", "Date & Time": "2026-04-02 10:00:00", "_excel_row": 11})
+    db = tmp_path / "fingerprints.sqlite"
+
+    with FingerprintIndex(db) as index:
+        assert check_cross_report_duplicate([claimed, unclaimed], index, "april.xlsx", cfg) == []
+        index.replace_report("april.xlsx", fingerprint_entries([claimed, unclaimed]))
+
+    with FingerprintIndex(db) as index:
+        assert check_cross_report_duplicate([claimed], index, "april.xlsx", cfg) == []
+        findings = check_cross_report_duplicate([claimed, unclaimed], index, "may.xlsx", cfg)
+    severities = {f.transaction_id: f.severity for f in findings}
+    assert severities == {"TX-1": "error", "TX-2": "warning"}
+    assert findings[0].fields["other_reports"] == ["april.xlsx"]
+
+
+def test_replace_report_drops_previous_entries(tmp_path):
+    rows = [_row(**{"Transaction ID": "TX-1"})]
+    with FingerprintIndex(tmp_path / "fp.sqlite") as index:
+        index.replace_report("a.xlsx", fingerprint_entries(rows))
+        index.replace_report("a.xlsx", [])
+        fp = fingerprint_entries(rows)[0][0]
+        assert index.lookup(fp, exclude_report="b.xlsx") == []
+
+
+def test_cross_report_check_skipped_without_index():
+    parsed = ParsedWorkbook(source_path="test.xlsx", combined_rows=[_row()])
+    _, skipped = run_all_rules(parsed)
+    assert "cross_report_duplicate" in skipped
+
+
+def test_concurrent_writers_keep_each_others_fingerprints(tmp_path):
+    db = tmp_path / "fp.sqlite"
+    first, second = FingerprintIndex(db), FingerprintIndex(db)
+    second.replace_report("b", [(123, "TX-B", 10)])
+    second.close()
+    first.replace_report("a", [(456, "TX-A", 10)])
+    first.close()
+
+    with FingerprintIndex(db) as index:
+        assert index.lookup(123) == ["b"]
+        assert index.lookup(456) == ["a"]
+        assert index.entry_count == 2
+
+
+def test_report_key_is_site_and_period():
+    dates = [datetime(2026, 4, 1), None, datetime(2026, 5, 2)]
+    assert report_key_for(dates, site="Belfast") == "Belfast/2026-04..2026-05"
+    assert report_key_for([datetime(2026, 4, 9)]) == "2026-04"
+    assert report_key_for([]) == "undated"
+    assert site_from_file_name("Belfast DFRR April 2026 (1).xlsx") == "Belfast DFRR"
+    assert site_from_file_name("Belfast_DFRR_2026-04.xlsx") == "Belfast DFRR"
+
+
+def _write_report(path, litres):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "Combined Fuel Transactions"
+    ws.cell(1, 1, "Banner")
+    headers = ["Transaction Type", "Date & Time", "Transaction ID", "Asset Number", "Fuel Pump", "Asset Group"]
+    for col, h in enumerate(headers + ["Fuel Dispensed or Received (L)"], 1):
+        ws.cell(2, col, h)
+    for row, (tid, amount) in enumerate(litres, 3):
+        values = ["DISPENSE", f"2026-04-0{row} 10:00:00", tid, "A1", "P1", "Mining - Eligible", amount]
+        for col, value in enumerate(values, 1):
+            ws.cell(row, col, value)
+    wb.save(path)
+    wb.close()
+
+
+def test_corrected_reupload_replaces_its_own_entries(tmp_path):
+    db = tmp_path / "fingerprints.sqlite"
+    original = tmp_path / "upload_1.xlsx"
+    corrected = tmp_path / "upload_2.xlsx"
+    _write_report(original, [("TX-1", -100), ("TX-2", -50)])
+    _write_report(corrected, [("TX-1", -100), ("TX-2", -55)])
+
+    for path in (original, corrected):
+        out = tmp_path / f"{path.stem}-audit.xlsx"
+        report_json = tmp_path / f"{path.stem}.json"
+        run_audit.main(
+            [
+                "--input", str(path), "--output", str(out), "--json", str(report_json),
+                "--fingerprint-index", str(db), "--source-name", "Belfast DFRR April 2026.xlsx",
+            ]
+        )
+    findings = json.loads(report_json.read_text())["findings"]
+    assert not [f for f in findings if f["check_id"] == "cross_report_duplicate"]
+    with FingerprintIndex(db) as index:
+        assert index.entry_count == 2
@@ -14,11 +14,17 @@ from rules import (  # noqa: E402
     check_high_odo_eligible,
     check_initial_dispense_no_claim,
     check_mining_eligible_missing_claim,
+    check_near_duplicate_transaction,
     check_negative_odo_eligible,
     check_refund_total_math,
+    check_tank_stock_reconciliation,
+    datetime_column,
     has_non_eligible_reason,
     is_mining_eligible_row as rules_is_mining,
     load_config,
+    numeric_column,
+    parse_dt,
+    parse_num,
     run_all_rules,
     summarize_findings,
 )
@@ -88,6 +94,47 @@ def test_duplicate_transaction(cfg):
     assert all(f.check_id == "duplicate_transaction" for f in findings)
 
 
+def test_near_duplicate_within_tolerance(cfg):
+    first = _row(**{"Transaction ID": "T1", "Date & Time": "2026-04-01 10:00:00"})
+    skewed = _row(**{"Transaction ID": "T2", "Date & Time": "2026-04-01 10:00:07", "_excel_row": 11})
+    later = _row(**{"Transaction ID": "T3", "Date & Time": "2026-04-01 11:00:00", "_excel_row": 12})
+    findings = check_near_duplicate_transaction([first, skewed, later], cfg)
+    assert {f.transaction_id for f in findings} == {"T1", "T2"}
+    assert all(f.severity == "warning" for f in findings)
+    assert check_duplicate_transaction([first, skewed, later], cfg) == []
+
+
+def test_near_duplicate_leaves_exact_duplicates_to_exact_check(cfg):
+    dup = _row()
+    rows = [dup, dict(dup, _excel_row=11)]
+    assert check_near_duplicate_transaction(rows, cfg) == []
+
+
+def test_near_duplicate_compares_litres_across_bucket_edges(cfg):
+    first = _row(**{"Transaction ID": "T1", "Fuel Dispensed or Received (L)": -100.04})
+    skewed = _row(
+        **{
+            "Transaction ID": "T2",
+            "Date & Time": "2026-04-01 10:00:30",
+            "Fuel Dispensed or Received (L)": -100.06,
+            "_excel_row": 11,
+        }
+    )
+    assert {f.transaction_id for f in check_near_duplicate_transaction([first, skewed], cfg)} == {"T1", "T2"}
+
+
+def test_near_duplicate_skips_rows_reported_as_exact_duplicates(cfg):
+    dup = _row(**{"Transaction ID": "T1"})
+    rows = [
+        dup,
+        dict(dup, _excel_row=11, **{"Transaction ID": "T2"}),
+        _row(**{"Transaction ID": "T3", "Date & Time": "2026-04-01 10:00:07", "_excel_row": 12}),
+    ]
+    near = check_near_duplicate_transaction(rows, cfg)
+    assert [(f.transaction_id, f.fields["near_rows"]) for f in near] == [("T3", [10, 11])]
+    assert {f.transaction_id for f in check_duplicate_transaction(rows, cfg)} == {"T1", "T2"}
+
+
 def test_mining_eligible_missing_claim_with_exception(cfg):
     rows = [
         _row(
@@ -276,6 +323,43 @@ def test_refund_total_math_ok(cfg):
     assert len(findings) == 0
 
 
+def _tank_row(excel_row, dt, litres, before, after, tx="DISPENSE"):
+    return _row(
+        _excel_row=excel_row,
+        **{
+            "Transaction ID": f"TK-{excel_row}",
+            "Transaction Type": tx,
+            "Date & Time": dt,
+            "Storage Tank": "TANK1",
+            "Fuel Dispensed or Received (L)": litres,
+            "≈ Tank Litres Before": before,
+            "≈ Tank Litres After": after,
+        },
+    )
+
+
+def test_tank_stock_reconciliation_balanced(cfg):
+    rows = [
+        _tank_row(10, "2026-04-01 08:00:00", -100, 1000, 900),
+        _tank_row(11, "2026-04-01 09:00:00", 500, 900, 1400, tx="FUEL-RECEIPT"),
+        _tank_row(12, "2026-04-01 10:00:00", -400, 1400, 1000),
+    ]
+    assert check_tank_stock_reconciliation(rows, cfg) == []
+
+
+def test_tank_stock_reconciliation_drift_and_negative(cfg):
+    rows = [
+        _tank_row(12, "2026-04-01 10:00:00", -400, 600, 150),
+        _tank_row(10, "2026-04-01 08:00:00", -100, 1000, 900),
+        _tank_row(13, "2026-04-01 11:00:00", -800, 150, -650),
+    ]
+    findings = check_tank_stock_reconciliation(rows, cfg)
+    by_tid = {f.transaction_id: f for f in findings}
+    assert set(by_tid) == {"TK-12", "TK-13"}
+    assert by_tid["TK-12"].fields["drift"] == -350.0
+    assert "negative" in by_tid["TK-13"].message
+
+
 def test_parsed_workbook_empty_combined():
     parsed = ParsedWorkbook(source_path="test.xlsx", combined_rows=[])
     assert parsed.combined_rows == []
@@ -322,3 +406,17 @@ def test_audit_result_label():
         )
         == "Error"
     )
+
+
+def test_column_parsers_match_scalar_parsers():
+    rows = [
+        _row(),
+        _row(**{"Fuel Dispensed or Received (L)": "-1,200.5", "Date & Time": "02/04/2026 08:30"}),
+        _row(**{"Fuel Dispensed or Received (L)": None, "Date & Time": None}),
+    ]
+    litres = numeric_column([r["Fuel Dispensed or Received (L)"] for r in rows])
+    dates = datetime_column([r["Date & Time"] for r in rows])
+    assert litres.tolist()[:2] == [parse_num(r["Fuel Dispensed or Received (L)"]) for r in rows[:2]]
+    assert litres.isna().tolist() == [False, False, True]
+    assert [d.to_pydatetime() for d in dates[:2]] == [parse_dt(r["Date & Time"]) for r in rows[:2]]
+    assert dates.isna().tolist() == [False, False, True]